@@ -1,16 +1,60 @@
 import dash
+import flask
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import dash_bootstrap_components as dbc
 from pages.sub_page3a import layout as sub_page3a_layout, register_callbacks as register_sub_page3a_callbacks
 from pages.sub_page3b import layout as sub_page3b_layout, register_callbacks as register_sub_page3b_callbacks
+from pages.sub_page3c import layout as sub_page3c_layout, register_callbacks as register_sub_page3c_callbacks
+from pages.sub_page3d import layout as sub_page3d_layout, register_callbacks as register_sub_page3d_callbacks
+from pages.sub_page3e import layout as sub_page3e_layout, register_callbacks as register_sub_page3e_callbacks
+from pages.sub_page3f import layout as sub_page3f_layout, register_callbacks as register_sub_page3f_callbacks
+from pages.sub_page3g import layout as sub_page3g_layout, register_callbacks as register_sub_page3g_callbacks
 from pages.page3 import index_layout as page3_layout
+from pages.live import layout as live_layout, register_callbacks as register_live_callbacks
+from pages.weather import WEATHER_PAGES, page_layout as weather_layout, register_callbacks as register_weather_callbacks
+from utils.route_cache import route_cache
+from utils.metrics import instrument_callback, register_collector, register_payload_metrics, render_metrics
+from utils.serialization import register_compression
+from utils.fire_export import register_export
+from utils.live_feed import register_live_feed
+from utils.profiler import register_profiler
 # from pages.page1 import layout as page1_layout
 
 # Create the Dash app
 app = dash.Dash(__name__, suppress_callback_exceptions=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
 
 server = app.server
+register_compression(server)
+register_payload_metrics(server)
+register_export(server)
+register_profiler(server)
+register_live_feed(server)
+
+
+# Route cache effectiveness (hits, misses, evictions, hit ratio)
+@server.route('/route-cache/stats')
+def route_cache_stats():
+    return flask.jsonify(route_cache.snapshot())
+
+
+def route_cache_metrics():
+    stats = route_cache.snapshot()
+    samples = [(f'route_cache_{name}_total', 'counter', f'Route cache {name.replace("_", " ")}.', stats[name])
+               for name in ('hits', 'persistent_hits', 'misses', 'evictions', 'expirations', 'sets')]
+    samples.append(('route_cache_entries', 'gauge', 'Routes held in the in-memory tier.', stats['entries']))
+    samples.append(('route_cache_hit_ratio', 'gauge', 'Share of route lookups served from cache.', stats['hit_ratio']))
+    return samples
+
+
+register_collector(route_cache_metrics)
+
+
+# Prometheus scrape endpoint (per-process; each gunicorn worker keeps its own counters)
+@server.route('/metrics')
+def metrics():
+    return flask.Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
 
 # Define the main layout of the app
 app.layout = dbc.Container(
@@ -100,6 +144,7 @@ home_layout = dbc.Container(
 
 # Define a callback to update the content based on the URL
 @app.callback(Output('page-content', 'children'), [Input('url', 'pathname')])
+@instrument_callback('app.display_page')
 def display_page(pathname):
     if pathname == "/page3":
         return page3_layout
@@ -107,6 +152,20 @@ def display_page(pathname):
         return sub_page3a_layout
     elif pathname == "/sub_page3b":
         return sub_page3b_layout
+    elif pathname == "/sub_page3c":
+        return sub_page3c_layout
+    elif pathname == "/sub_page3d":
+        return sub_page3d_layout
+    elif pathname == "/sub_page3e":
+        return sub_page3e_layout
+    elif pathname == "/sub_page3f":
+        return sub_page3f_layout
+    elif pathname == "/sub_page3g":
+        return sub_page3g_layout
+    elif pathname == "/live":
+        return live_layout
+    elif pathname in WEATHER_PAGES:
+        return weather_layout(pathname)
     # elif pathname == "/page1":
         # pass
         # return page1_layout
@@ -119,6 +178,13 @@ def display_page(pathname):
 # Register callbacks for the sub-pages
 register_sub_page3a_callbacks(app)
 register_sub_page3b_callbacks(app)
+register_sub_page3c_callbacks(app)
+register_sub_page3d_callbacks(app)
+register_sub_page3e_callbacks(app)
+register_sub_page3f_callbacks(app)
+register_sub_page3g_callbacks(app)
+register_live_callbacks(app)
+register_weather_callbacks(app)
 
 if __name__ == "__main__":
     app.run_server(debug=True)
@@ -0,0 +1,79 @@
+"""Latency benchmark for address suggestions served from the local prefix index (utils/address_index.py).
+
+Builds an index over synthetic US-style addresses, then times suggestions for prefixes typed one
+character at a time, the way the debounced inputs send them, plus inserting newly geocoded addresses:
+    python benchmarks/bench_address_index.py --addresses 200k
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.address_index import AddressIndex  # noqa: E402
+
+STREETS = ['Main', 'Oak', 'Pine', 'Maple', 'Cedar', 'Elm', 'Washington', 'Lake', 'Hill', 'Park', 'Sunset', 'Ridge',
+           'Canyon', 'Mesa', 'Juniper', 'Aspen', 'Willow', 'Madrone', 'Sierra', 'Valley']
+SUFFIXES = ['St', 'Ave', 'Rd', 'Dr', 'Ln', 'Blvd', 'Way', 'Ct']
+CITIES = ['Redding, CA', 'Paradise, CA', 'Santa Rosa, CA', 'Bend, OR', 'Medford, OR', 'Boise, ID', 'Flagstaff, AZ',
+          'Missoula, MT', 'Durango, CO', 'Chico, CA', 'Ventura, CA', 'Napa, CA']
+
+
+def synthetic_addresses(n, seed=0):
+    rng = np.random.default_rng(seed)
+    numbers = rng.integers(1, 20_000, n)
+    streets = rng.integers(0, len(STREETS), n)
+    suffixes = rng.integers(0, len(SUFFIXES), n)
+    cities = rng.integers(0, len(CITIES), n)
+    addresses = [f"{number} {STREETS[s]} {SUFFIXES[x]}, {CITIES[c]}"
+                 for number, s, x, c in zip(numbers, streets, suffixes, cities)]
+    return pd.DataFrame({'address': addresses, 'lat': rng.uniform(32, 48, n), 'lon': rng.uniform(-124, -104, n)})
+
+
+def main():
+    from bench_scaling import parse_size
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--addresses', default='200k')
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args()
+
+    n = parse_size(args.addresses)
+    with tempfile.TemporaryDirectory() as directory:
+        bulk_path = os.path.join(directory, 'addresses.csv')
+        synthetic_addresses(n).drop_duplicates('address').to_csv(bulk_path, index=False)
+        index = AddressIndex(path=os.path.join(directory, 'addresses.sqlite'), bulk_path=bulk_path)
+        start_time = time.perf_counter()
+        print(f"addresses: {len(index):,}  keys: {len(index.keys):,}  build: {time.perf_counter() - start_time:.2f}s")
+
+        rng = np.random.default_rng(1)
+        targets = [index.addresses[i] for i in rng.integers(0, len(index.addresses), args.queries)]
+        timings = {}
+        for target in targets:
+            # Each keystroke from the third character on, from the start and from the street name
+            street = target.split(' ', 1)[1]
+            for text in [target[:end] for end in range(3, len(target) + 1)] + [street[:end] for end in (3, 6, 10)]:
+                start_time = time.perf_counter()
+                index.suggest(text)
+                timings.setdefault(len(text) if len(text) < 8 else 8, []).append(time.perf_counter() - start_time)
+        for length, values in sorted(timings.items()):
+            values = np.array(values) * 1000
+            label = f"{length}+" if length == 8 else str(length)
+            print(f"prefix {label:>2} chars: p50 {np.percentile(values, 50):.3f} ms  p99 {np.percentile(values, 99):.3f} ms"
+                  f"  max {values.max():.3f} ms  ({len(values)} lookups)")
+
+        new = synthetic_addresses(200, seed=2)
+        start_time = time.perf_counter()
+        for address, lat, lon in new.itertuples(index=False):
+            index.add(f"{address} (new)", lat, lon)
+        print(f"insert (incl. SQLite commit): {(time.perf_counter() - start_time) / len(new) * 1000:.3f} ms per address")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""Memory and latency benchmark for the FIRMS attribute bitmaps (utils/bitmap_index.py).
+
+Builds the bitmaps over a synthetic archive and compares, for a month, a year and the whole archive,
+resolving attribute filters through the bitmaps and the date index with scanning boolean masks:
+    python benchmarks/bench_bitmap_index.py --rows 10M
+    python benchmarks/bench_bitmap_index.py --rows 1M --repeats 20
+
+Memory is reported against the raw attribute columns and against one boolean mask per value.
+Every bitmap result is checked against the scan.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.bitmap_index import CONFIDENCE_BINS, FIRE_ATTRIBUTE_COLUMNS, FireAttributeIndex  # noqa: E402
+from utils.fire_data import DateIndex  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+FILTERS = {
+    'high confidence': {'CONFIDENCE': ['high']},
+    'night, high conf.': {'CONFIDENCE': ['high'], 'DAYNIGHT': ['N']},
+    'terra, day, veg.': {'SATELLITE': ['Terra'], 'DAYNIGHT': ['D'], 'TYPE': [0]},
+    'rare types': {'TYPE': [1, 3]},
+    'all five': {'CONFIDENCE': ['nominal', 'high'], 'SATELLITE': ['Aqua'], 'DAYNIGHT': ['D'],
+                 'INSTRUMENT': ['MODIS'], 'TYPE': [0, 2]},
+}
+
+
+def median_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    from bench_export import load_archive
+    from bench_scaling import parse_size
+    from generate_firms import generate
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10M')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = parse_size(args.rows)
+    path = os.path.join(args.data_dir, f'firms_{rows}.parquet')
+    if not os.path.exists(path):
+        print(f"Generating {rows} rows -> {path}")
+        generate(rows, path)
+    df = load_archive(path)
+    date_index = DateIndex(df['ACQ_DATE'].values)
+
+    start_time = time.perf_counter()
+    index = FireAttributeIndex(df, date_index)
+    build_seconds = time.perf_counter() - start_time
+    column_bytes = df[FIRE_ATTRIBUTE_COLUMNS].memory_usage(index=False, deep=True).sum()
+    mask_bytes = sum(len(values) for values in index.bitmaps.values()) * len(df)
+    print(f"{len(df):,} rows: bitmaps {index.nbytes / 1e6:.1f} MB built in {build_seconds:.2f}s; "
+          f"attribute columns {column_bytes / 1e6:.0f} MB, one bool mask per value {mask_bytes / 1e6:.0f} MB")
+
+    year, month = (int(value) for value in df.groupby(['Year', df['ACQ_DATE'].dt.month]).size().idxmax())
+    month_start = pd.Timestamp(year, month, 1)
+    ranges = {
+        'month': (month_start, month_start + pd.offsets.MonthEnd(1)),
+        'year': (pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31)),
+        'all': (None, None),
+    }
+    print(f"{'filter':20}{'range':7}{'rows':>11}{'count ms':>10}{'rows ms':>9}{'scan ms':>9}{'speedup':>9}")
+    for name, filters in FILTERS.items():
+        for range_name, (start_date, end_date) in ranges.items():
+            count_ms, count = median_ms(lambda: index.count(filters, start_date, end_date), args.repeats)
+            rows_ms, positions = median_ms(lambda: index.rows(filters, start_date, end_date), args.repeats)
+
+            def scan():
+                # What a page would do without the index: one comparison per filtered column
+                mask = np.ones(len(df), dtype=bool)
+                for column, values in filters.items():
+                    if column == 'CONFIDENCE':
+                        mask &= np.logical_or.reduce([(df[column].values >= low) & (df[column].values < high)
+                                                      for label, low, high in CONFIDENCE_BINS if label in values])
+                    else:
+                        mask &= df[column].isin(values).values
+                if start_date is not None:
+                    dates = df['ACQ_DATE'].values
+                    next_day = end_date + pd.Timedelta(days=1)
+                    mask &= (dates >= np.datetime64(start_date)) & (dates < np.datetime64(next_day))
+                return np.flatnonzero(mask)
+
+            scan_ms, expected = median_ms(scan, args.repeats)
+            assert count == len(expected) and np.array_equal(positions, expected), (name, range_name)
+            print(f"{name:20}{range_name:7}{count:11,}{count_ms:10.2f}{rows_ms:9.2f}{scan_ms:9.1f}"
+                  f"{scan_ms / rows_ms:8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
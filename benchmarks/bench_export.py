@@ -0,0 +1,117 @@
+"""Throughput and memory benchmark for the streaming fire export (/export/fires).
+
+Streams each format for a month, a year and the whole archive through the Flask route and reports
+rows/s, MB/s, time to first byte and how far peak RSS rose above the loaded archive:
+    python benchmarks/bench_export.py --rows 10M
+    python benchmarks/bench_export.py --rows 1M --formats csv --compare-in-memory
+
+The archive is generated with generate_firms.py if needed and loaded without its geometry column
+(the export never reads it), so 10M rows fit on a small machine.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+
+import flask
+import pandas as pd
+import pyarrow.parquet as pq
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.fire_data import DateIndex  # noqa: E402
+from utils.fire_export import register_export  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def load_archive(path):
+    columns = [name for name in pq.read_schema(path).names if name != 'geometry']
+    df = pd.read_parquet(path, columns=columns)
+    df['ACQ_DATE'] = pd.to_datetime(df['ACQ_DATE'])
+    df['Year'] = df['ACQ_DATE'].dt.year
+    return df
+
+
+def stream(client, query):
+    start_time = time.perf_counter()
+    response = client.get(f'/export/fires?{query}', buffered=False)
+    first_byte = None
+    size = 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start_time
+        size += len(chunk)
+    response.close()
+    return size, time.perf_counter() - start_time, first_byte or 0.0
+
+
+def main():
+    from bench_scaling import parse_size
+    from generate_firms import generate
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10M')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--formats', default='csv,parquet,geojson')
+    parser.add_argument('--ranges', default='month,year,all')
+    parser.add_argument('--compare-in-memory', action='store_true',
+                        help='also build each CSV as one string to show the RSS the stream avoids')
+    args = parser.parse_args()
+
+    rows = parse_size(args.rows)
+    path = os.path.join(args.data_dir, f'firms_{rows}.parquet')
+    if not os.path.exists(path):
+        print(f"Generating {rows} rows -> {path}")
+        generate(rows, path)
+
+    start_time = time.perf_counter()
+    df = load_archive(path)
+    index = DateIndex(df['ACQ_DATE'].values)
+    print(f"Loaded {len(df):,} rows in {time.perf_counter() - start_time:.1f}s, peak RSS {peak_rss_mb():.0f} MB")
+
+    year, month = (int(value) for value in df.groupby(['Year', df['ACQ_DATE'].dt.month]).size().idxmax())
+    month_start = pd.Timestamp(year, month, 1)
+    # name -> (query string, start_date, end_date)
+    ranges = {
+        'month': (f'year={year}&month={month}', month_start, month_start + pd.offsets.MonthEnd(1)),
+        'year': (f'year={year}', pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31)),
+        'all': ('', None, None),
+    }
+    server = flask.Flask(__name__)
+    register_export(server, load=lambda: (df, index))
+    client = server.test_client()
+
+    print(f"{'format':10}{'range':8}{'rows':>12}{'MB':>10}{'seconds':>10}{'rows/s':>12}{'MB/s':>8}"
+          f"{'TTFB ms':>10}{'RSS +MB':>10}")
+    for fmt in args.formats.split(','):
+        for name in args.ranges.split(','):
+            query, start_date, end_date = ranges[name]
+            count = index.count(start_date, end_date)
+            baseline = peak_rss_mb()
+            size, seconds, first_byte = stream(client, f'format={fmt}&{query}')
+            print(f"{fmt:10}{name:8}{count:12,}{size / 1e6:10.1f}{seconds:10.2f}{count / seconds:12,.0f}"
+                  f"{size / 1e6 / seconds:8.1f}{first_byte * 1000:10.1f}{peak_rss_mb() - baseline:10.0f}")
+
+    if args.compare_in_memory:
+        # Runs last: ru_maxrss only grows, so it would mask the streaming numbers if run first
+        for name in args.ranges.split(','):
+            _, start_date, end_date = ranges[name]
+            baseline = peak_rss_mb()
+            start_time = time.perf_counter()
+            text = df.iloc[index.rows(start_date, end_date)].to_csv(index=False)
+            print(f"in-memory csv {name:6}{len(text) / 1e6:10.1f} MB in {time.perf_counter() - start_time:6.2f}s, "
+                  f"RSS +{peak_rss_mb() - baseline:.0f} MB")
+            del text
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Offline routing vs. a replayed API baseline.
+
+Record a baseline once (needs the TomTom key in config/secrets.json):
+    python benchmarks/bench_offline_routing.py record pairs.json baseline.jsonl
+
+Replay it against the local road network:
+    OFFLINE_ROUTING_GRAPH=data/road_network.npz python benchmarks/bench_offline_routing.py replay baseline.jsonl
+
+pairs.json is a list of [[start_lat, start_lon], [end_lat, end_lon]] pairs.
+"""
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def record(pairs_path, baseline_path):
+    from pages import page1
+    page1.route_cache.enabled = False
+
+    with open(pairs_path) as f:
+        pairs = json.load(f)
+    with open(baseline_path, 'w') as out:
+        for start, end in pairs:
+            start_time = time.perf_counter()
+            # No avoid option: the offline provider cannot honour one, so it would skew the comparison
+            routes = page1.calculate_routes(f"{start[0]},{start[1]}", f"{end[0]},{end[1]}", 'fastest', 'historical',
+                                            'car', None, '2024-01-01', [])
+            latency_ms = (time.perf_counter() - start_time) * 1000
+            travel_time_s = routes[0][1] * 3600 if routes else None
+            out.write(json.dumps({'start': start, 'end': end, 'latency_ms': latency_ms,
+                                  'travel_time_s': travel_time_s}) + '\n')
+    print(f"Recorded {len(pairs)} API routes to {baseline_path}")
+
+
+def replay(baseline_path):
+    from utils.offline_routing import get_offline_router
+
+    with open(baseline_path) as f:
+        baseline = [json.loads(line) for line in f if line.strip()]
+
+    router = get_offline_router()
+    latencies, deviations, failures = [], [], 0
+    for entry in baseline:
+        start_time = time.perf_counter()
+        result = router.route(tuple(entry['start']), tuple(entry['end']))
+        latencies.append((time.perf_counter() - start_time) * 1000)
+        if result is None:
+            failures += 1
+        elif entry.get('travel_time_s'):
+            deviations.append(abs(result[1] - entry['travel_time_s']) / entry['travel_time_s'])
+
+    api = np.array([entry['latency_ms'] for entry in baseline])
+    local = np.array(latencies)
+    print(f"Queries: {len(baseline)}, unroutable offline: {failures}")
+    print(f"{'':8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in (('api', api), ('offline', local)):
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        print(f"{name:8}{p50:10.2f}{p95:10.2f}{p99:10.2f}")
+    print(f"Median speedup: {np.median(api) / np.median(local):.0f}x")
+    if deviations:
+        print(f"Median travel-time deviation from API: {np.median(deviations) * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 4 and sys.argv[1] == 'record':
+        record(sys.argv[2], sys.argv[3])
+    elif len(sys.argv) >= 3 and sys.argv[1] == 'replay':
+        replay(sys.argv[2])
+    else:
+        print(__doc__)
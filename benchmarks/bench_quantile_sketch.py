@@ -0,0 +1,100 @@
+"""Accuracy and latency check for the brightness/FRP distribution sketches (utils/quantile_sketch.py).
+
+Builds the sketches over a synthetic archive and compares sketch percentiles with exact ones computed over
+the same rows, for the selections the distribution page offers (all years, a year, a month of one year, a
+calendar month across all years), with and without a region filter:
+    python benchmarks/bench_quantile_sketch.py --rows 1M
+    python benchmarks/bench_quantile_sketch.py --rows 10M --repeats 20
+
+Every sketch percentile above the column's smallest distinguished value is checked to be within the
+configured relative accuracy of the exact one.
+"""
+import argparse
+import calendar
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.quantile_sketch import SKETCH_COLUMNS, SKETCH_RELATIVE_ACCURACY, DistributionSketches  # noqa: E402
+from utils.regions import assign_regions  # noqa: E402
+
+DEFAULT_DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+PERCENTILES = [0.1, 0.5, 0.9, 0.99]
+
+
+def median_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    from bench_export import load_archive
+    from bench_scaling import parse_size
+    from generate_firms import generate
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='1M')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = parse_size(args.rows)
+    path = os.path.join(args.data_dir, f'firms_{rows}.parquet')
+    if not os.path.exists(path):
+        print(f"Generating {rows} rows -> {path}")
+        generate(rows, path)
+    df = load_archive(path)
+    codes, names = assign_regions(df['LATITUDE'].values, df['LONGITUDE'].values)
+
+    start_time = time.perf_counter()
+    sketches = DistributionSketches.from_frame(df, codes, names)
+    print(f"{len(df):,} rows: sketches built in {time.perf_counter() - start_time:.2f}s")
+
+    dates = df['ACQ_DATE']
+    year, month = (int(value) for value in df.groupby(['Year', dates.dt.month]).size().idxmax())
+    month_start = f'{year}-{month:02d}-01'
+    month_end = f'{year}-{month:02d}-{calendar.monthrange(year, month)[1]}'
+    busiest_region = names[int(np.bincount(codes).argmax())]
+    selections = {
+        'all years': (lambda column, regions: sketches.histogram(column, None, None, regions),
+                      np.ones(len(df), dtype=bool)),
+        f'{year}': (lambda column, regions: sketches.histogram(column, f'{year}-01-01', f'{year}-12-31', regions),
+                    (df['Year'] == year).values),
+        f'{year}-{month:02d}': (lambda column, regions: sketches.histogram(column, month_start, month_end, regions),
+                                ((df['Year'] == year) & (dates.dt.month == month)).values),
+        f'month {month}, all years': (lambda column, regions: sketches.month_histogram(column, month, regions),
+                                      (dates.dt.month == month).values),
+    }
+
+    print(f"{'selection':22}{'column':12}{'region':>14}{'rows':>11}{'ms':>8}{'max rel. error':>16}")
+    for name, (histogram, mask) in selections.items():
+        for regions in (None, [busiest_region]):
+            rows_mask = mask if regions is None else mask & (codes == names.index(busiest_region))
+            for column, min_value in SKETCH_COLUMNS.items():
+                buckets = sketches.buckets[column]
+                elapsed_ms, counts = median_ms(lambda: histogram(column, regions), args.repeats)
+                estimates = buckets.quantiles(counts, PERCENTILES)
+                values = df[column].values[rows_mask]
+                values = np.sort(values[~np.isnan(values)])
+                assert counts.sum() == len(values), (name, column, regions)
+                # The sketch answers the value at rank floor(q * (n - 1)), i.e. the 'lower' quantile
+                exact = values[np.floor(np.asarray(PERCENTILES) * (len(values) - 1)).astype(np.int64)]
+                checked = exact > min_value
+                errors = np.abs(estimates[checked] - exact[checked]) / exact[checked]
+                assert (errors <= SKETCH_RELATIVE_ACCURACY + 1e-9).all(), (name, column, regions, estimates, exact)
+                print(f"{name:22}{column:12}{regions[0] if regions else 'all':>14}{len(values):11,}"
+                      f"{elapsed_ms:8.2f}{errors.max() if len(errors) else 0:16.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Scaling benchmark for the fire archive pages.
+
+For each archive size, generates a synthetic FIRMS parquet (see generate_firms.py) if needed and
+measures, in a fresh process, load time, peak RSS and per-callback latency:
+    python benchmarks/bench_scaling.py --sizes 1M,10M,100M
+    python benchmarks/bench_scaling.py --sizes 1M --update-baseline
+
+Results are compared with the stored baseline and any metric more than --tolerance slower
+(or larger) is flagged; the exit status is 1 when a regression is found.
+Run from the repository root (the pages read config/secrets.json at import).
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline_scaling.json')
+DEFAULT_DATA_DIR = os.path.join(ROOT, 'benchmarks', 'data')
+
+
+def parse_size(text):
+    multipliers = {'k': 1_000, 'm': 1_000_000, 'b': 1_000_000_000}
+    text = text.strip().lower()
+    if text[-1] in multipliers:
+        return int(float(text[:-1]) * multipliers[text[-1]])
+    return int(text)
+
+
+def time_call(func, repeats, *args):
+    timings = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start_time)
+    return statistics.median(timings)
+
+
+def run_child(path, repeats):
+    # Runs inside a fresh interpreter so peak RSS belongs to this archive size only
+    os.environ['FIRE_PARQUET_PATH'] = path
+    from utils.fire_data import load_fire_data
+
+    start_time = time.perf_counter()
+    df = load_fire_data()
+    load_seconds = time.perf_counter() - start_time
+
+    from pages import sub_page3a, sub_page3b
+    from utils.fire_events import FireEvents
+
+    busiest = df.groupby(['Year', df['ACQ_DATE'].dt.month]).size().idxmax()
+    year, month = int(busiest[0]), int(busiest[1])
+    result = {
+        'rows': len(df),
+        'load_seconds': load_seconds,
+        'update_summary_seconds': time_call(sub_page3a.update_summary, repeats, '/sub_page3a'),
+        'update_specific_analysis_seconds': time_call(sub_page3b.update_specific_analysis, repeats, 1, year, month),
+        'year_month_counts_seconds': time_call(sub_page3b.build_year_month_counts, repeats, df),
+        'fire_events_seconds': time_call(FireEvents.from_frame, repeats, df),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(json.dumps(result))
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(size, data_dir, repeats):
+    from generate_firms import generate
+
+    path = os.path.join(data_dir, f'firms_{size}.parquet')
+    if not os.path.exists(path):
+        print(f"Generating {size} rows -> {path}")
+        generate(size, path)
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path, '--repeats', str(repeats)],
+                            cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for size, metrics in results.items():
+        previous = baseline.get(size)
+        if not previous:
+            continue
+        for name, value in metrics.items():
+            if name == 'rows' or name not in previous:
+                continue
+            if value > previous[name] * (1 + tolerance):
+                regressions.append(f"{size} rows: {name} {previous[name]:.3f} -> {value:.3f} "
+                                   f"(+{100 * (value / previous[name] - 1):.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1M,10M,100M')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--update-baseline', action='store_true')
+    parser.add_argument('--child')
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.repeats)
+        return 0
+
+    results = {}
+    for size in (parse_size(text) for text in args.sizes.split(',')):
+        results[str(size)] = measure(size, args.data_dir, args.repeats)
+        metrics = results[str(size)]
+        print(f"{size:>12,} rows  load {metrics['load_seconds']:8.2f}s  rss {metrics['peak_rss_mb']:9.0f}MB  "
+              f"summary {metrics['update_summary_seconds']:8.2f}s  "
+              f"specific {metrics['update_specific_analysis_seconds']:7.3f}s  "
+              f"year x month {metrics['year_month_counts_seconds']:7.3f}s  "
+              f"events {metrics.get('fire_events_seconds', 0):7.2f}s")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+    return 1 if regressions and not args.update_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
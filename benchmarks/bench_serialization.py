@@ -0,0 +1,67 @@
+"""Payload bytes and serialization time for the fire dashboard figures.
+
+Compares the built-in json engine with orjson, and raw bytes with gzip/brotli:
+    python benchmarks/bench_serialization.py [repeats]
+
+Run from the repository root (the pages read config/secrets.json and the fire archive at import).
+"""
+import os
+import sys
+import time
+
+import plotly.io as pio
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.serialization import brotli, compress, orjson  # noqa: E402
+
+FIGURE_IDS = ['fires_per_year', 'spatial_distribution', 'hexbin_plot', 'monthly_fires', 'time_series',
+              'trend_analysis', 'yearly_fires', 'seasonal_fires', 'forecast_fires']
+
+
+def time_encoding(figure, engine, repeats):
+    best, payload = float('inf'), None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        payload = pio.to_json(figure, validate=False, engine=engine)
+        best = min(best, time.perf_counter() - start_time)
+    return best, payload.encode()
+
+
+def main(repeats=3):
+    from pages.sub_page3a import update_summary
+
+    figures = update_summary('/sub_page3a')
+    engines = ['json'] + (['orjson'] if orjson is not None else [])
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+
+    header = f"{'figure':22}" + ''.join(f"{engine + ' ms':>12}" for engine in engines) + f"{'raw KB':>10}"
+    header += ''.join(f"{encoding + ' KB':>10}" for encoding in encodings)
+    print(header)
+    totals = {name: 0.0 for name in engines + ['raw'] + encodings}
+    for figure_id, figure in zip(FIGURE_IDS, figures):
+        row = f"{figure_id:22}"
+        payload = None
+        for engine in engines:
+            seconds, payload = time_encoding(figure, engine, repeats)
+            totals[engine] += seconds
+            row += f"{seconds * 1000:12.1f}"
+        totals['raw'] += len(payload)
+        row += f"{len(payload) / 1024:10.1f}"
+        for encoding in encodings:
+            size = len(compress(payload, encoding))
+            totals[encoding] += size
+            row += f"{size / 1024:10.1f}"
+        print(row)
+
+    row = f"{'total':22}" + ''.join(f"{totals[engine] * 1000:12.1f}" for engine in engines)
+    row += f"{totals['raw'] / 1024:10.1f}" + ''.join(f"{totals[encoding] / 1024:10.1f}" for encoding in encodings)
+    print(row)
+    if 'orjson' in totals:
+        print(f"orjson speedup: {totals['json'] / totals['orjson']:.1f}x")
+    for encoding in encodings:
+        print(f"{encoding} reduces payload by {100 * (1 - totals[encoding] / totals['raw']):.0f}%")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
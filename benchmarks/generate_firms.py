@@ -0,0 +1,127 @@
+"""Synthetic FIRMS (MODIS) fire archive generator.
+
+Writes a parquet file with the columns of fire_archive_M-C61_*.parquet, including a WKB point
+`geometry` column, streamed in row groups so 100M rows never sit in memory at once:
+    python benchmarks/generate_firms.py 10000000 benchmarks/data/firms_10M.parquet
+
+Detections are sorted by ACQ_DATE, follow a summer-peaked seasonal cycle and cluster around
+a fixed set of fire-prone hotspots across the contiguous US.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+START_DATE = '2014-01-01'
+END_DATE = '2024-06-30'
+ROW_GROUP_SIZE = 1_000_000
+HOTSPOT_COUNT = 400
+
+# Fixed-width little-endian WKB point: byte order, geometry type, x, y
+WKB_POINT = np.dtype([('byte_order', 'u1'), ('geometry_type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+
+SCHEMA = pa.schema([
+    ('LATITUDE', pa.float64()),
+    ('LONGITUDE', pa.float64()),
+    ('BRIGHTNESS', pa.float64()),
+    ('SCAN', pa.float64()),
+    ('TRACK', pa.float64()),
+    ('ACQ_DATE', pa.timestamp('ms')),
+    ('ACQ_TIME', pa.int32()),
+    ('SATELLITE', pa.string()),
+    ('INSTRUMENT', pa.string()),
+    ('CONFIDENCE', pa.int32()),
+    ('VERSION', pa.string()),
+    ('BRIGHT_T31', pa.float64()),
+    ('FRP', pa.float64()),
+    ('DAYNIGHT', pa.string()),
+    ('TYPE', pa.int32()),
+    ('geometry', pa.binary()),
+])
+
+
+def wkb_points(lon, lat):
+    points = np.empty(len(lon), dtype=WKB_POINT)
+    points['byte_order'] = 1
+    points['geometry_type'] = 1
+    points['x'] = lon
+    points['y'] = lat
+    fixed = pa.FixedSizeBinaryArray.from_buffers(pa.binary(WKB_POINT.itemsize), len(points),
+                                                 [None, pa.py_buffer(points.tobytes())])
+    return fixed.cast(pa.binary())
+
+
+def daily_counts(rows, rng):
+    days = pd.date_range(START_DATE, END_DATE, freq='D')
+    # Fire season peaks in August; weekly-scale noise keeps the series from looking synthetic
+    seasonal = 1.0 + 0.8 * np.cos(2 * np.pi * (days.dayofyear.values - 225) / 365.25)
+    weights = seasonal * rng.gamma(4.0, 0.25, len(days))
+    return days, rng.multinomial(rows, weights / weights.sum())
+
+
+def make_batch(day_values, hotspots, rng):
+    n = len(day_values)
+    spot = rng.integers(0, len(hotspots), n)
+    lat = np.clip(hotspots[spot, 0] + rng.normal(0, 0.15, n), 24.5, 49.5)
+    lon = np.clip(hotspots[spot, 1] + rng.normal(0, 0.15, n), -125.0, -66.5)
+    daynight = rng.random(n) < 0.7
+    terra = rng.random(n) < 0.5
+    brightness = 300 + rng.gamma(2.0, 12.0, n)
+    acq_time = np.where(daynight, rng.integers(15, 22, n) * 100, rng.integers(3, 10, n) * 100) + rng.integers(0, 60, n)
+
+    columns = {
+        'LATITUDE': lat,
+        'LONGITUDE': lon,
+        'BRIGHTNESS': brightness,
+        'SCAN': rng.uniform(1.0, 4.8, n),
+        'TRACK': rng.uniform(1.0, 2.0, n),
+        'ACQ_DATE': pa.array(day_values.astype('datetime64[ms]')),
+        'ACQ_TIME': acq_time.astype(np.int32),
+        'SATELLITE': pa.array(np.where(terra, 'Terra', 'Aqua')),
+        'INSTRUMENT': pa.array(np.full(n, 'MODIS')),
+        'CONFIDENCE': np.clip(rng.normal(70, 20, n), 0, 100).astype(np.int32),
+        'VERSION': pa.array(np.full(n, '6.1')),
+        'BRIGHT_T31': brightness - rng.gamma(3.0, 6.0, n),
+        'FRP': rng.lognormal(2.5, 1.2, n),
+        'DAYNIGHT': pa.array(np.where(daynight, 'D', 'N')),
+        'TYPE': rng.choice(np.array([0, 1, 2, 3], dtype=np.int32), n, p=[0.94, 0.01, 0.04, 0.01]),
+        'geometry': wkb_points(lon, lat),
+    }
+    return pa.Table.from_pydict(columns, schema=SCHEMA)
+
+
+def generate(rows, path, seed=0, row_group_size=ROW_GROUP_SIZE):
+    rng = np.random.default_rng(seed)
+    hotspots = np.column_stack([rng.uniform(30, 48, HOTSPOT_COUNT), rng.uniform(-123, -80, HOTSPOT_COUNT)])
+    days, counts = daily_counts(rows, rng)
+    day_values = days.values
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    written = 0
+    with pq.ParquetWriter(path, SCHEMA) as writer:
+        first_day = 0
+        # Group consecutive days into batches of roughly row_group_size rows
+        boundaries = np.searchsorted(np.cumsum(counts), np.arange(row_group_size, rows, row_group_size))
+        for last_day in list(boundaries) + [len(days) - 1]:
+            batch_days = np.repeat(day_values[first_day:last_day + 1], counts[first_day:last_day + 1])
+            if len(batch_days):
+                writer.write_table(make_batch(batch_days, hotspots, rng), row_group_size=row_group_size)
+                written += len(batch_days)
+            first_day = last_day + 1
+    return written
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(1)
+    start_time = time.time()
+    total = generate(int(float(sys.argv[1])), sys.argv[2])
+    print(f"Wrote {total} rows to {sys.argv[2]} in {time.time() - start_time:.1f} seconds")
@@ -0,0 +1,306 @@
+"""Concurrent-user load test for the Dash callbacks.
+
+Virtual users replay realistic _dash-update-component sequences against app.server:
+  - summary:  open /sub_page3a (display_page, the sampled preview, then the exact update_summary)
+  - specific: open /sub_page3b and analyze a year/month, sometimes with attribute filters (display_page, then
+              update_specific_analysis)
+  - routing:  route in /page1 with a stubbed geocoding/routing provider (update_map)
+
+    python benchmarks/load_test.py --concurrency 8 --workers 4 --duration 60
+    python benchmarks/load_test.py --transport http --scenarios specific,routing --concurrency 32
+
+--workers caps how many requests the server executes at once (like gunicorn sync workers);
+saturation is the share of worker capacity that was busy during the run.
+Run from the repository root (the pages read config/secrets.json and FIRE_PARQUET_PATH at import).
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+
+class WorkerPool:
+    # WSGI middleware that limits concurrent requests and records busy time and queueing
+    def __init__(self, wsgi_app, workers):
+        self.wsgi_app = wsgi_app
+        self.workers = workers
+        self._slots = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self.busy_seconds = 0.0
+        self.queue_waits = []
+        self.peak_queue = 0
+        self._waiting = 0
+
+    def __call__(self, environ, start_response):
+        enqueued = time.perf_counter()
+        with self._lock:
+            self._waiting += 1
+            self.peak_queue = max(self.peak_queue, self._waiting)
+        self._slots.acquire()
+        started = time.perf_counter()
+        with self._lock:
+            self._waiting -= 1
+            self.queue_waits.append(started - enqueued)
+        try:
+            # Consume the body while holding the slot so streaming work is counted too
+            return list(self.wsgi_app(environ, start_response))
+        finally:
+            with self._lock:
+                self.busy_seconds += time.perf_counter() - started
+            self._slots.release()
+
+    def reset(self):
+        with self._lock:
+            self.busy_seconds = 0.0
+            self.queue_waits = []
+            self.peak_queue = 0
+
+
+def callback_payload(outputs, inputs, state=()):
+    # outputs/inputs/state are (component id, property[, value]) tuples
+    if len(outputs) == 1:
+        output = f"{outputs[0][0]}.{outputs[0][1]}"
+        output_spec = {'id': outputs[0][0], 'property': outputs[0][1]}
+    else:
+        output = '..' + '...'.join(f"{id_}.{prop}" for id_, prop in outputs) + '..'
+        output_spec = [{'id': id_, 'property': prop} for id_, prop in outputs]
+    return {
+        'output': output,
+        'outputs': output_spec,
+        'inputs': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in inputs],
+        'state': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in state],
+        'changedPropIds': [f"{id_}.{prop}" for id_, prop, _ in inputs],
+    }
+
+
+def registered_outputs(app, input_id, output_id):
+    # (id, property) outputs of the callback fed by input_id that writes output_id, with any allow_duplicate suffix
+    from dash._utils import split_callback_id
+
+    for callback_id, callback in app.callback_map.items():
+        outputs = split_callback_id(callback_id)
+        outputs = [(output['id'], output['property']) for output in (outputs if isinstance(outputs, list)
+                                                                     else [outputs])]
+        if any(spec['id'] == input_id for spec in callback['inputs']) and any(id_ == output_id for id_, _ in outputs):
+            return outputs
+    raise KeyError((input_id, output_id))
+
+
+def open_page(pathname):
+    return ('display_page', callback_payload([('page-content', 'children')], [('url', 'pathname', pathname)]))
+
+
+def build_scenarios(df, app):
+    preview_outputs = registered_outputs(app, 'url', 'summary-preview')
+    summary_outputs = registered_outputs(app, 'summary-preview', 'fires_per_year')
+    year_months = df.groupby(['Year', df['ACQ_DATE'].dt.month]).size().index.tolist()
+    addresses = [f"{number} {street} St" for number in range(100, 120) for street in ('Oak', 'Pine', 'Cedar')]
+
+    def summary():
+        return [
+            open_page('/sub_page3a'),
+            ('update_summary_preview', callback_payload(preview_outputs, [('url', 'pathname', '/sub_page3a')])),
+            ('update_summary', callback_payload(summary_outputs, [('summary-preview', 'data', '/sub_page3a')])),
+        ]
+
+    def specific():
+        year, month = random.choice(year_months)
+        return [
+            open_page('/sub_page3b'),
+            ('update_specific_analysis', callback_payload(
+                [('specific_analysis', 'figure')],
+                [('analyze-button', 'n_clicks', 1)],
+                [('specific-year-dropdown', 'value', int(year)), ('specific-month-dropdown', 'value', int(month)),
+                 ('specific-dataset-dropdown', 'value', 'archive'),
+                 ('filter-confidence', 'value', random.choice([None, ['high'], ['nominal', 'high']])),
+                 ('filter-satellite', 'value', None),
+                 ('filter-daynight', 'value', random.choice([None, ['D'], ['N']])),
+                 ('filter-instrument', 'value', None), ('filter-type', 'value', None)]
+            )),
+        ]
+
+    def routing():
+        start, end = random.sample(addresses, 2)
+        return [
+            ('page1.update_map', callback_payload(
+                [('mapbox-graph', 'figure'), ('route-info', 'children')],
+                [('calculate-button', 'n_clicks', 1)],
+                [('start-input', 'value', start), ('end-input', 'value', end),
+                 ('route-type-dropdown', 'value', 'fastest'), ('traffic-dropdown', 'value', 'live'),
+                 ('travel-mode-dropdown', 'value', 'car'), ('avoid-dropdown', 'value', 'tollRoads'),
+                 ('depart-at-input', 'date', '2024-07-01'), ('vehicle-commercial-checklist', 'value', [])]
+            )),
+        ]
+
+    return {'summary': summary, 'specific': specific, 'routing': routing}
+
+
+def install_routing_stub(app, latency_ms, points=40):
+    # Deterministic provider so routing load is measured without hitting TomTom
+    from pages import page1
+
+    def geocode_address(address):
+        if not address:
+            return None, None
+        digest = zlib.crc32(address.encode())
+        return 37.0 + (digest % 1000) / 1000, -122.0 + (digest // 1000 % 1000) / 1000
+
+    def calculate_routes(start_coords, end_coords, route_type, traffic, travel_mode, avoid, depart_at,
+                         vehicle_commercial):
+        time.sleep(latency_ms / 1000)
+        (start_lat, start_lon), (end_lat, end_lon) = (map(float, c.split(',')) for c in (start_coords, end_coords))
+        coords = [(start_lat + (end_lat - start_lat) * i / (points - 1), start_lon + (end_lon - start_lon) * i / (points - 1))
+                  for i in range(points)]
+        eta = (datetime.fromisoformat(depart_at) + timedelta(minutes=30)).isoformat()
+        return [(eta, 0.5, coords)]
+
+    def get_traffic_data(point):
+        return {'currentSpeed': 45, 'freeFlowSpeed': 60}
+
+    page1.geocode_address = geocode_address
+    page1.calculate_routes = calculate_routes
+    page1.get_traffic_data = get_traffic_data
+    page1.register_callbacks(app)
+
+
+class TestClientTransport:
+    def __init__(self, server):
+        self.server = server
+
+    def session(self):
+        client = self.server.test_client()
+
+        def post(body):
+            response = client.post('/_dash-update-component', data=body, content_type='application/json')
+            return response.status_code, len(response.data)
+
+        return post
+
+
+class HttpTransport:
+    def __init__(self, server):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.httpd = make_server('127.0.0.1', 0, server, threaded=True)
+        self.port = self.httpd.server_port
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def session(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=600)
+
+        def post(body):
+            try:
+                connection.request('POST', '/_dash-update-component', body=body,
+                                   headers={'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                return response.status, len(response.read())
+            except (http.client.HTTPException, OSError):
+                # Reconnect on the next request instead of reusing a broken connection
+                connection.close()
+                raise
+
+        return post
+
+
+def run(transport, scenarios, mix, concurrency, duration, iterations):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    payload_bytes = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user():
+        post = transport.session()
+        completed = 0
+        while time.perf_counter() < deadline and (not iterations or completed < iterations):
+            for step, payload in scenarios[random.choice(mix)]():
+                start_time = time.perf_counter()
+                try:
+                    status, size = post(json.dumps(payload))
+                except Exception:
+                    status, size = 0, 0
+                elapsed = time.perf_counter() - start_time
+                with lock:
+                    latencies[step].append(elapsed)
+                    payload_bytes[0] += size
+                    if not 200 <= status < 300:
+                        errors[step] += 1
+            completed += 1
+
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, payload_bytes[0], time.perf_counter() - start_time
+
+
+def report(latencies, errors, payload_bytes, wall, pool):
+    print(f"{'step':28}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    all_latencies = []
+    for step, values in sorted(latencies.items()):
+        all_latencies.extend(values)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+        print(f"{step:28}{len(values):10}{errors[step]:8}{p50:10.1f}{p95:10.1f}{p99:10.1f}")
+    if all_latencies:
+        p50, p95, p99 = np.percentile(all_latencies, [50, 95, 99]) * 1000
+        print(f"{'all':28}{len(all_latencies):10}{sum(errors.values()):8}{p50:10.1f}{p95:10.1f}{p99:10.1f}")
+    print(f"Throughput: {len(all_latencies) / wall:.2f} req/s, {payload_bytes / wall / 1e6:.2f} MB/s over {wall:.1f}s")
+    saturation = pool.busy_seconds / (wall * pool.workers)
+    queue_p95 = np.percentile(pool.queue_waits, 95) * 1000 if pool.queue_waits else 0.0
+    print(f"Worker saturation: {saturation * 100:.0f}% of {pool.workers} workers, "
+          f"queue wait p95 {queue_p95:.1f} ms, peak queue {pool.peak_queue}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--iterations', type=int, default=0, help='scenario runs per user (0 = until --duration)')
+    parser.add_argument('--scenarios', default='summary,specific,routing',
+                        help='comma-separated mix; repeat a name to weight it')
+    parser.add_argument('--transport', choices=['client', 'http'], default='client')
+    parser.add_argument('--stub-latency-ms', type=float, default=150.0)
+    parser.add_argument('--warmup', action='store_true', help='run every scenario once before measuring')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    from app import app
+    from utils.fire_data import load_fire_data
+
+    mix = args.scenarios.split(',')
+    if 'routing' in mix:
+        install_routing_stub(app, args.stub_latency_ms)
+    pool = WorkerPool(app.server.wsgi_app, args.workers)
+    app.server.wsgi_app = pool
+    transport = TestClientTransport(app.server) if args.transport == 'client' else HttpTransport(app.server)
+    scenarios = build_scenarios(load_fire_data(), app)
+
+    if args.warmup:
+        post = transport.session()
+        for name in set(mix):
+            for _, payload in scenarios[name]():
+                post(json.dumps(payload))
+        pool.reset()
+
+    report(*run(transport, scenarios, mix, args.concurrency, args.duration, args.iterations), pool)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import dash
+from dash import dcc, html, Input, Output, State, no_update
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+import pandas as pd
+import json
+from utils.metrics import instrument_callback
+from utils.live_feed import LIVE_FEED_MAX_POINTS, LIVE_FEED_POLL_SECONDS, load_live_feed
+from utils.quantile_sketch import ingest_batch as update_sketches
+from utils.fire_anomalies import ingest_batch as update_anomalies
+
+# Load secrets
+with open('config/secrets.json') as f:
+    secrets = json.load(f)
+    mapbox_access_token = secrets['mapbox_access_token']
+
+# Drop-directory feed (its watcher is started by the server, see register_live_feed); ingested batches also
+# update the brightness/FRP sketches and anomaly baselines
+live_feed = load_live_feed()
+live_feed.subscribe(update_sketches)
+live_feed.subscribe(update_anomalies)
+LIVE_SERIES_MAX_POINTS = 1000
+
+
+def create_live_figures():
+    # Empty traces; every point arrives through extendData so a figure is never re-sent
+    map_fig = go.Figure(go.Scattermapbox(
+        lat=[], lon=[], text=[],
+        mode='markers',
+        marker=dict(size=7, color=[], colorscale='YlOrRd', cmin=300, cmax=400, showscale=True,
+                    colorbar=dict(title='Brightness')),
+        hovertemplate='%{text}<extra></extra>'
+    ))
+    map_fig.update_layout(
+        mapbox=dict(style="carto-positron", accesstoken=mapbox_access_token, center=dict(lat=37, lon=-95), zoom=3),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        uirevision='live-map'
+    )
+    series_fig = go.Figure(go.Scatter(x=[], y=[], mode='lines+markers'))
+    series_fig.update_layout(title='New Detections per Update', xaxis_title='Time', yaxis_title='Detections',
+                             uirevision='live-series')
+    return map_fig, series_fig
+
+
+live_map, live_series = create_live_figures()
+
+layout = dbc.Container(
+    [
+        dbc.Row([
+            dbc.Col(
+                dbc.Button("Back to Main Page", href="/page3", color="primary", className="mb-4"),
+                width=12
+            )
+        ]),
+        html.H3("Live Fire Detections"),
+        html.Div(id='live-status', className="mb-2"),
+        dcc.Interval(id='live-interval', interval=LIVE_FEED_POLL_SECONDS * 1000),
+        dcc.Store(id='live-cursor'),
+        dcc.Graph(id='live_map', figure=live_map, style={"height": "700px"}),
+        dcc.Graph(id='live_series', figure=live_series)
+    ],
+    fluid=True
+)
+
+
+@instrument_callback('live.update_live')
+def update_live(n_intervals, cursor):
+    rows, cursor = live_feed.since(cursor)
+    status = (f"Watching {live_feed.directory}: {live_feed.detections:,} detections from {live_feed.files_read} "
+              f"file updates; last checked {pd.Timestamp.now():%H:%M:%S}")
+    if not len(rows):
+        return no_update, no_update, cursor, status
+
+    # Only the new points travel; the browser appends them and keeps the newest LIVE_FEED_MAX_POINTS
+    text = (rows['ACQ_DATE'].dt.strftime('%Y-%m-%d') + ' ' + rows['ACQ_TIME'].astype(str).str.zfill(4) +
+            '<br>' + rows['SATELLITE'].astype(str) + '<br>FRP: ' + rows['FRP'].round(1).astype(str))
+    map_update = ({'lat': [rows['LATITUDE'].tolist()], 'lon': [rows['LONGITUDE'].tolist()],
+                   'marker.color': [rows['BRIGHTNESS'].tolist()], 'text': [text.tolist()]}, [0], LIVE_FEED_MAX_POINTS)
+    series_update = ({'x': [[pd.Timestamp.now().isoformat()]], 'y': [[len(rows)]]}, [0], LIVE_SERIES_MAX_POINTS)
+    return map_update, series_update, cursor, status
+
+
+# Register the callbacks
+def register_callbacks(app):
+    app.callback(
+        [Output('live_map', 'extendData'), Output('live_series', 'extendData'), Output('live-cursor', 'data'),
+         Output('live-status', 'children')],
+        [Input('live-interval', 'n_intervals')],
+        [State('live-cursor', 'data')]
+    )(update_live)
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = layout
+register_callbacks(app)
@@ -8,6 +8,15 @@ import pandas as pd
 import requests
 import urllib.parse as urlparse
 import json
+import os
+from utils.route_cache import is_live_traffic, make_route_key, route_cache
+from utils.offline_routing import OFFLINE_TRAVEL_MODES, calculate_offline_routes, unsupported_offline_options
+from utils.metrics import instrument_callback, count_api_call
+from utils.route_hazard import ROUTE_HAZARD_BUFFER_KM, load_hazard_index
+from utils.address_index import ADDRESS_DEBOUNCE_SECONDS, ADDRESS_SUGGESTIONS, address_index
+
+# Routing backend: "tomtom" (remote API) or "offline" (local road network, see utils/offline_routing.py)
+ROUTING_PROVIDER = os.environ.get('ROUTING_PROVIDER', 'tomtom')
 
 # Load the TomTom API key from the secrets.json file
 with open('config/secrets.json') as f:
@@ -38,6 +47,12 @@ avoid_options = [
     {"label": "Ferries", "value": "ferries"}
 ]
 
+if ROUTING_PROVIDER == 'offline':
+    # The local road network only has free-flow car routing: no truck profile and no tags to avoid
+    travel_mode_options = [dict(option, disabled=option['value'] not in OFFLINE_TRAVEL_MODES)
+                           for option in travel_mode_options]
+    avoid_options = [dict(option, disabled=True) for option in avoid_options]
+
 layout = dbc.Container(
     [
         dbc.Row([
@@ -50,10 +65,14 @@ layout = dbc.Container(
             dbc.Col(
                 dbc.Nav(
                     [
-                        dbc.NavItem(dbc.Input(id="start-input", placeholder="Enter start address...", type="text",
-                                              className="mb-2")),
-                        dbc.NavItem(dbc.Input(id="end-input", placeholder="Enter end address...", type="text",
-                                              className="mb-2")),
+                        dbc.NavItem([dcc.Input(id="start-input", placeholder="Enter start address...", type="text",
+                                               className="form-control mb-2", list="start-suggestions",
+                                               autoComplete="off", debounce=ADDRESS_DEBOUNCE_SECONDS),
+                                     html.Datalist(id="start-suggestions")]),
+                        dbc.NavItem([dcc.Input(id="end-input", placeholder="Enter end address...", type="text",
+                                               className="form-control mb-2", list="end-suggestions",
+                                               autoComplete="off", debounce=ADDRESS_DEBOUNCE_SECONDS),
+                                     html.Datalist(id="end-suggestions")]),
                         dbc.NavItem(dbc.Select(id="route-type-dropdown", options=route_type_options,
                                                placeholder="Select Route Type", className="mb-2")),
                         dbc.NavItem(
@@ -107,22 +126,60 @@ layout = dbc.Container(
 def geocode_address(address):
     if not address:
         return None, None
+    # Addresses geocoded before (or bulk-loaded) are answered from the local index
+    known = address_index.lookup(address)
+    if known is not None:
+        return known
     geocode_base_url = "https://api.tomtom.com/search/2/geocode/"
     geocode_request_url = f"{geocode_base_url}{urlparse.quote(address)}.json?key={api_key}"
+    count_api_call('tomtom', 'geocode')
     geocode_response = requests.get(geocode_request_url)
     if geocode_response.status_code == 200:
         geocode_data = geocode_response.json()
         if geocode_data['results']:
             position = geocode_data['results'][0]['position']
+            address_index.add(address, position['lat'], position['lon'])
+            address_index.add(geocode_data['results'][0]['address']['freeformAddress'], position['lat'], position['lon'])
             return position['lat'], position['lon']
     print(f"Geocode request failed: {geocode_response.status_code}, {geocode_response.text}")
     return None, None
 
 
+def search_addresses(text):
+    # TomTom typeahead search, used only when the local index has no suggestion for the text
+    search_url = f"https://api.tomtom.com/search/2/search/{urlparse.quote(text)}.json"
+    count_api_call('tomtom', 'typeahead')
+    response = requests.get(search_url, params={'key': api_key, 'typeahead': 'true', 'limit': ADDRESS_SUGGESTIONS},
+                            timeout=5)
+    if response.status_code != 200:
+        print(f"Address search failed: {response.status_code}, {response.text}")
+        return []
+    return [(result['address']['freeformAddress'], result['position']['lat'], result['position']['lon'])
+            for result in response.json()['results']]
+
+
+@instrument_callback('page1.suggest_addresses')
+def suggest_addresses(text):
+    return [html.Option(value=address) for address in address_index.suggest_or_fetch(text, search_addresses)]
+
+
 def calculate_routes(start_coords, end_coords, route_type, traffic, travel_mode, avoid, depart_at, vehicle_commercial):
     # Ensure the date is in the correct format
     depart_at = depart_at + "T00:00:00" if "T" not in depart_at else depart_at
 
+    # Serve repeat queries from the route cache
+    cache_key = make_route_key(ROUTING_PROVIDER, start_coords, end_coords, route_type, traffic, travel_mode, avoid,
+                               vehicle_commercial, depart_at)
+    cached_routes = route_cache.get(cache_key)
+    if cached_routes is not None:
+        return cached_routes
+
+    if ROUTING_PROVIDER == 'offline':
+        routes = calculate_offline_routes(start_coords, end_coords, depart_at, route_type, travel_mode, avoid)
+        if routes:
+            route_cache.set(cache_key, routes, live=is_live_traffic(traffic))
+        return routes
+
     # Ensure vehicle_commercial is a string
     vehicle_commercial = "true" if vehicle_commercial else "false"
 
@@ -132,7 +189,7 @@ def calculate_routes(start_coords, end_coords, route_type, traffic, travel_mode,
             + f"/json?routeType={route_type}"
             + f"&traffic={traffic}"
             + f"&travelMode={travel_mode}"
-            + f"&avoid={avoid}"
+            + (f"&avoid={avoid}" if avoid else "")
             + f"&vehicleCommercial={vehicle_commercial}"
             + f"&departAt={urlparse.quote(depart_at)}"
             + f"&maxAlternatives=2"
@@ -140,6 +197,7 @@ def calculate_routes(start_coords, end_coords, route_type, traffic, travel_mode,
 
     requestUrl = baseUrl + requestParams + "&key=" + api_key
 
+    count_api_call('tomtom', 'calculateRoute')
     response = requests.get(requestUrl)
 
     if response.status_code == 200:
@@ -152,6 +210,8 @@ def calculate_routes(start_coords, end_coords, route_type, traffic, travel_mode,
             legs = route['legs'][0]['points']
             route_coords = [(point['latitude'], point['longitude']) for point in legs]
             routes.append((eta, travelTime, route_coords))
+        if routes:
+            route_cache.set(cache_key, routes, live=is_live_traffic(traffic))
         return routes
     else:
         return []
@@ -161,6 +221,7 @@ def get_traffic_data(point):
     base_url = "https://api.tomtom.com/traffic/services/4/flowSegmentData/absolute/10/json"
     request_url = f"{base_url}?key={api_key}&point={point}"
     try:
+        count_api_call('tomtom', 'flowSegmentData')
         response = requests.get(request_url)
         if response.status_code == 200:
             traffic_data = response.json()
@@ -184,9 +245,14 @@ def get_traffic_color(current_speed, free_flow_speed):
         return "red"
 
 
+@instrument_callback('page1.update_map')
 def update_map(n_clicks, start_address, end_address, route_type, traffic, travel_mode, avoid, depart_at,
                vehicle_commercial):
     if n_clicks and start_address and end_address:
+        if ROUTING_PROVIDER == 'offline':
+            unsupported = unsupported_offline_options(route_type, travel_mode, avoid)
+            if unsupported:
+                return create_empty_map(), f"Offline routing does not support {', '.join(unsupported)}."
         start_lat, start_lon = geocode_address(start_address)
         end_lat, end_lon = geocode_address(end_address)
         if start_lat and start_lon and end_lat and end_lon:
@@ -197,6 +263,7 @@ def update_map(n_clicks, start_address, end_address, route_type, traffic, travel
             if routes:
                 fig = go.Figure()
                 route_infos = []
+                hazard_index = load_hazard_index()
 
                 for route_index, (eta, travelTime, route_coords) in enumerate(routes):
                     route_df = pd.DataFrame(route_coords, columns=['lat', 'lon'])
@@ -205,6 +272,10 @@ def update_map(n_clicks, start_address, end_address, route_type, traffic, travel
 
                     # Fetch traffic data for each segment and set the color based on the traffic
                     for idx, point in enumerate(route_coords[:-1]):
+                        if ROUTING_PROVIDER == 'offline':
+                            # No live traffic without the remote API
+                            colors.append("blue")
+                            continue
                         next_point = route_coords[idx + 1]
                         mid_point = ((point[0] + next_point[0]) / 2, (point[1] + next_point[1]) / 2)
                         traffic_data = get_traffic_data(f"{mid_point[0]},{mid_point[1]}")
@@ -220,6 +291,28 @@ def update_map(n_clicks, start_address, end_address, route_type, traffic, travel
                                 traffic_data_limit_exceeded = True
                         colors.append(color)
 
+                    # Fire hazard: segments whose corridor holds recent detections, drawn under the traffic colours
+                    hazard = hazard_index.check_route(route_coords, depart_at) if hazard_index else None
+                    if hazard and hazard['detections']:
+                        hazard_lat, hazard_lon = [], []
+                        for i in hazard['segments'].nonzero()[0]:
+                            hazard_lat += [route_coords[i][0], route_coords[i + 1][0], None]
+                            hazard_lon += [route_coords[i][1], route_coords[i + 1][1], None]
+                        fig.add_trace(go.Scattermapbox(
+                            lat=hazard_lat,
+                            lon=hazard_lon,
+                            mode='lines',
+                            line=dict(color='rgba(255, 69, 0, 0.5)', width=14),
+                            name=f'Route {route_index + 1} fire hazard'
+                        ))
+                        fig.add_trace(go.Scattermapbox(
+                            lat=hazard['lat'],
+                            lon=hazard['lon'],
+                            mode='markers',
+                            marker=dict(size=6, color='orangered'),
+                            name=f'Route {route_index + 1} fire detections'
+                        ))
+
                     for i, point in enumerate(route_coords[:-1]):
                         next_point = route_coords[i + 1]
                         fig.add_trace(go.Scattermapbox(
@@ -239,7 +332,14 @@ def update_map(n_clicks, start_address, end_address, route_type, traffic, travel
                         textposition="top right"
                     ))
 
-                    route_infos.append(f"Route {route_index + 1}: ETA: {eta}, Travel time: {travelTime:.2f} hours")
+                    route_info = f"Route {route_index + 1}: ETA: {eta}, Travel time: {travelTime:.2f} hours"
+                    if hazard:
+                        route_info += (f", Fire detections within {ROUTE_HAZARD_BUFFER_KM:g} km "
+                                       f"({hazard['start']} to {hazard['end']}): {hazard['detections']}")
+                        if hazard['detections']:
+                            route_info += (f" on {hazard['segments'].sum()} of {len(hazard['segments'])} segments, "
+                                           f"max FRP {hazard['max_frp']:.1f} MW")
+                    route_infos.append(route_info)
 
                 fig.update_layout(
                     mapbox=dict(
@@ -275,6 +375,8 @@ def create_empty_map():
 
 # Register the callback
 def register_callbacks(app):
+    for field in ('start', 'end'):
+        app.callback(Output(f'{field}-suggestions', 'children'), Input(f'{field}-input', 'value'))(suggest_addresses)
     app.callback(
         [Output('mapbox-graph', 'figure'), Output('route-info', 'children')],
         [Input('calculate-button', 'n_clicks')],
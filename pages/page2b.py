@@ -7,6 +7,14 @@ import pandas as pd
 import googlemaps
 from datetime import datetime
 import json
+import os
+from utils.route_cache import route_cache, make_route_key
+from utils.offline_routing import get_offline_directions
+from utils.metrics import instrument_callback, count_api_call
+from utils.address_index import ADDRESS_DEBOUNCE_SECONDS, address_index
+
+# Routing backend: "google" (remote API) or "offline" (local road network, see utils/offline_routing.py)
+ROUTING_PROVIDER = os.environ.get('ROUTING_PROVIDER', 'google')
 
 # Load the Google Maps API key from the secrets.json file
 with open('config/secrets.json') as f:
@@ -39,7 +47,9 @@ layout = dbc.Container(
             dbc.Col(
                 dbc.Nav(
                     [
-                        dbc.NavItem(dbc.Input(id="current-address-input", placeholder="Enter current address...", type="text", className="mb-2")),
+                        dbc.NavItem([dcc.Input(id="current-address-input", placeholder="Enter current address...", type="text", className="form-control mb-2",
+                                               list="current-address-suggestions", autoComplete="off", debounce=ADDRESS_DEBOUNCE_SECONDS),
+                                     html.Datalist(id="current-address-suggestions")]),
                         dbc.NavItem(dbc.Select(id="place-type-dropdown", options=place_type_options, placeholder="Select Place Type", className="mb-2")),
                         dbc.NavItem(dbc.Button("Find Nearest Place", id="find-place-button", color="primary", className="mb-2")),
                     ],
@@ -67,14 +77,32 @@ layout = dbc.Container(
 def geocode_address(address):
     if not address:
         return None, None
+    # Addresses geocoded before (or bulk-loaded) are answered from the local index
+    known = address_index.lookup(address)
+    if known is not None:
+        return known
+    count_api_call('google', 'geocode')
     geocode_result = gmaps.geocode(address)
     if geocode_result:
         location = geocode_result[0]['geometry']['location']
+        address_index.add(address, location['lat'], location['lng'])
+        address_index.add(geocode_result[0]['formatted_address'], location['lat'], location['lng'])
         return location['lat'], location['lng']
     print(f"Geocode request failed for address: {address}")
     return None, None
 
+def search_addresses(text):
+    # Places autocomplete, used only when the local index has no suggestion; predictions carry no coordinates,
+    # so they are shown but only indexed once geocoded
+    count_api_call('google', 'places_autocomplete')
+    return [(prediction['description'], None, None) for prediction in gmaps.places_autocomplete(text)]
+
+@instrument_callback('page2b.suggest_addresses')
+def suggest_addresses(text):
+    return [html.Option(value=address) for address in address_index.suggest_or_fetch(text, search_addresses)]
+
 def find_nearest_place(current_coords, place_type):
+    count_api_call('google', 'places_nearby')
     places_result = gmaps.places_nearby(location=current_coords, radius=5000, type=place_type)
     if places_result['results']:
         place = places_result['results'][0]
@@ -86,27 +114,46 @@ def find_nearest_place(current_coords, place_type):
     return None, None, None, None
 
 def get_directions(origin_coords, destination_coords):
+    departure_time = datetime.now()
+    cache_key = make_route_key(ROUTING_PROVIDER, origin_coords, destination_coords, route_type='recommended',
+                               traffic='best_guess', travel_mode='driving', depart_at=departure_time)
+    cached_directions = route_cache.get(cache_key)
+    if cached_directions is not None:
+        return cached_directions
+
+    if ROUTING_PROVIDER == 'offline':
+        routes = get_offline_directions(origin_coords, destination_coords)
+        if not routes:
+            return [], None
+        route_coordinates, distance, _ = routes[0]
+        route_cache.set(cache_key, (route_coordinates, distance), live=True)
+        return route_coordinates, distance
+
+    count_api_call('google', 'directions')
     directions_result = gmaps.directions(origin=origin_coords,
                                          destination=destination_coords,
                                          mode='driving',
                                          alternatives=True,
-                                         departure_time=datetime.now(),
+                                         departure_time=departure_time,
                                          traffic_model='best_guess')
     if directions_result:
         recommended_route = directions_result[0]['legs'][0]['steps']
         route_coordinates = [(step['start_location']['lat'], step['start_location']['lng']) for step in recommended_route]
         route_coordinates.append((recommended_route[-1]['end_location']['lat'], recommended_route[-1]['end_location']['lng']))
         distance = directions_result[0]['legs'][0]['distance']['text']
+        route_cache.set(cache_key, (route_coordinates, distance), live=True)
         return route_coordinates, distance
     print(f"Directions request failed from {origin_coords} to {destination_coords}")
     return [], None
 
 def snap_to_roads(route_coordinates):
     path = '|'.join([f"{lat},{lng}" for lat, lng in route_coordinates])
+    count_api_call('google', 'snap_to_roads')
     snapped_points_result = gmaps.snap_to_roads(path=path, interpolate=True)
     snapped_route_coordinates = [(point['location']['latitude'], point['location']['longitude']) for point in snapped_points_result]
     return snapped_route_coordinates
 
+@instrument_callback('page2b.update_map')
 def update_map(n_clicks, current_address, place_type):
     if n_clicks and current_address and place_type:
         start_lat, start_lon = geocode_address(current_address)
@@ -117,7 +164,8 @@ def update_map(n_clicks, current_address, place_type):
                 end_coords = (end_lat, end_lon)
                 route_coordinates, distance = get_directions(start_coords, end_coords)
                 if route_coordinates:
-                    snapped_route_coords = snap_to_roads(route_coordinates)
+                    # Offline routes already follow the road network
+                    snapped_route_coords = route_coordinates if ROUTING_PROVIDER == 'offline' else snap_to_roads(route_coordinates)
                     route_df = pd.DataFrame(snapped_route_coords, columns=['Latitude', 'Longitude'])
                     points_df = pd.DataFrame([
                         {'Latitude': start_coords[0], 'Longitude': start_coords[1], 'Type': 'Current Location'},
@@ -156,6 +204,8 @@ def create_empty_map():
 
 # Register the callback
 def register_callbacks(app):
+    app.callback(Output('current-address-suggestions', 'children'),
+                 Input('current-address-input', 'value'))(suggest_addresses)
     app.callback(
         [Output('mapbox-graph', 'figure', allow_duplicate=True), Output('route-info', 'children', allow_duplicate=True)],
         [Input('find-place-button', 'n_clicks')],
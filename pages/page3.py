@@ -94,7 +94,13 @@ index_layout = dbc.Container(
             [html.Li("Achieved a better balance between precision and recall for the minority class while maintaining high overall accuracy.", style={"font-family": "'Arial', sans-serif"})]
         ),
         dbc.Button("Summary Analysis", href="/sub_page3a", color="primary", className="mt-3"),
-        dbc.Button("Specific Analysis", href="/sub_page3b", color="primary", className="mt-3 ml-2")
+        dbc.Button("Specific Analysis", href="/sub_page3b", color="primary", className="mt-3 ml-2"),
+        dbc.Button("Regional Analysis", href="/sub_page3c", color="primary", className="mt-3 ml-2"),
+        dbc.Button("Fire Risk Prediction", href="/sub_page3d", color="primary", className="mt-3 ml-2"),
+        dbc.Button("Fire Dashboard", href="/sub_page3e", color="primary", className="mt-3 ml-2"),
+        dbc.Button("Fire Events", href="/sub_page3f", color="primary", className="mt-3 ml-2"),
+        dbc.Button("Distributions", href="/sub_page3g", color="primary", className="mt-3 ml-2"),
+        dbc.Button("Live Feed", href="/live", color="primary", className="mt-3 ml-2")
     ],
     fluid=True
 )
@@ -1,10 +1,8 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import geopandas as gpd
-import dask.dataframe as dd
 import pandas as pd
-from shapely import wkb
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
@@ -16,7 +14,14 @@ import datashader.transfer_functions as tf
 from datashader.utils import export_image
 from colorcet import fire
 import json
-import time
+import os
+import numpy as np
+from utils.metrics import instrument_callback, FigureTimer
+from utils.fire_data import load_fire_data
+from utils.spatial_index import GridIndex
+from utils.raster_stack import load_raster_stack
+from utils.stratified_sample import load_fire_sample
+from utils.fire_anomalies import ALL_REGIONS, FIRE_ANOMALY_Z, load_fire_anomalies
 
 # Load secrets
 with open('config/secrets.json') as f:
@@ -24,49 +29,25 @@ with open('config/secrets.json') as f:
     api_key = secrets['tomtom_api_key']
     mapbox_access_token = secrets['mapbox_access_token']
 
-# Global variable for caching
-cached_df = None
-
-
-# Load the parquet file in chunks
-def load_geojson_chunk(parquet_file_path, npartitions=2):
-    global cached_df
-    if cached_df is not None:
-        return cached_df
-
-    start_time = time.time()
-
-    # Read Parquet file using Dask
-    ddf = dd.read_parquet(parquet_file_path)
-
-    # Convert to GeoPandas DataFrame
-    df = ddf.compute()
-
-    # Convert the geometry column from WKB to shapely geometries
-    df['geometry'] = df['geometry'].apply(wkb.loads)
-
-    # Ensure geometry column is recognized as geometry
-    gdf = gpd.GeoDataFrame(df, geometry='geometry')
-
-    end_time = time.time()
-    print(f"Time taken to load Parquet file: {end_time - start_time} seconds")
-
-    cached_df = dd.from_pandas(gdf, npartitions=npartitions)
-    return cached_df
-
-
-# Load the parquet data
-parquet_file_path = '/Users/cobi/PycharmProjects/project_ai/data/fire_archive_M-C61_490372.parquet'
-gdf_chunked = load_geojson_chunk(parquet_file_path)
-df = gdf_chunked.compute()
-
-# Convert the ACQ_DATE to datetime format
-try:
-    df['ACQ_DATE'] = pd.to_datetime(df['ACQ_DATE'])
-except Exception as e:
-    print(f"Error converting ACQ_DATE to datetime: {e}")
-
-df['Year'] = df['ACQ_DATE'].dt.year
+# Load the fire archive (shared with the other fire analysis pages)
+df = load_fire_data()
+# Date- and space-stratified sample for the preview rendered while the exact summary is computed
+fire_sample = load_fire_sample()
+# Seasonal baselines per day of year and region, kept up to date by the live feed
+fire_anomalies = load_fire_anomalies()
+
+# Maximum number of markers the fire point map sends for one viewport
+FIRE_MAP_POINT_BUDGET = int(os.environ.get('FIRE_MAP_POINT_BUDGET', 20000))
+FIRE_MAP_CENTER = {'lat': 37, 'lon': -95}
+FIRE_MAP_ZOOM = 3
+
+# Spatial index over the detections for viewport queries
+fire_index = GridIndex(df['LATITUDE'].values, df['LONGITUDE'].values, values=df['BRIGHTNESS'].values)
+fire_latitudes = df['LATITUDE'].values
+fire_longitudes = df['LONGITUDE'].values
+fire_brightness = df['BRIGHTNESS'].values
+fire_frp = df['FRP'].values
+fire_dates = df['ACQ_DATE'].values
 
 layout = dbc.Container(
     [
@@ -76,10 +57,24 @@ layout = dbc.Container(
                 width=12
             )
         ]),
+        dbc.Alert(id='summary-preview-status', color="info", is_open=False),
+        dcc.Store(id='summary-preview'),
         html.H3("Number of Fire Detections per Year (2014-2024)"),
         dcc.Graph(id='fires_per_year'),
         html.H3("Spatial Distribution of Fires (2014-2024)"),
         dcc.Graph(id='spatial_distribution'),
+        html.H3("Spatial Distribution Over Time"),
+        dcc.RadioItems(
+            id='playback-frequency',
+            options=[{'label': 'Year by year', 'value': 'year'}, {'label': 'Month by month', 'value': 'month'}],
+            value='year',
+            inline=True,
+            inputStyle={"margin-right": "5px", "margin-left": "10px"}
+        ),
+        dbc.Button("Play", id='playback-button', color="primary", className="mt-2 mb-2"),
+        dcc.Slider(id='playback-slider', min=0, max=0, step=1, value=0),
+        dcc.Interval(id='playback-interval', interval=1000, disabled=True),
+        dcc.Graph(id='spatial_playback'),
         html.H3("Hexbin Plot of Fire Occurrences (2014-2024)"),
         dcc.Graph(id='hexbin_plot'),
         html.H3("Fire Occurrences by Month (2014-2024)"),
@@ -88,12 +83,23 @@ layout = dbc.Container(
         dcc.Graph(id='time_series'),
         html.H3("Trend Analysis of Fire Occurrences (2014-2024)"),
         dcc.Graph(id='trend_analysis'),
+        html.H3("Anomalous Days"),
+        dcc.Dropdown(
+            id='anomaly-region-dropdown',
+            options=[{'label': region, 'value': region} for region in fire_anomalies.region_names],
+            value=ALL_REGIONS,
+            clearable=False
+        ),
+        dcc.Graph(id='anomaly_series'),
+        html.Div(id='anomaly_table'),
         html.H3("Yearly Fire Occurrences (2014-2024)"),
         dcc.Graph(id='yearly_fires'),
         html.H3("Fire Occurrences by Season (2014-2024)"),
         dcc.Graph(id='seasonal_fires'),
         html.H3("Forecast of Fire Occurrences"),
-        dcc.Graph(id='forecast_fires')
+        dcc.Graph(id='forecast_fires'),
+        html.H3("Fire Detections (zoom in for individual detections)"),
+        dcc.Graph(id='fire_points_map', style={"height": "800px"})
     ],
     fluid=True
 )
@@ -106,6 +112,199 @@ def create_datashader_image(df, plot_width=800, plot_height=600):
     return img
 
 
+def viewport_bounds(relayout_data, width=1200, height=800):
+    relayout_data = relayout_data or {}
+    derived = relayout_data.get('mapbox._derived')
+    if derived and derived.get('coordinates'):
+        lons = [corner[0] for corner in derived['coordinates']]
+        lats = [corner[1] for corner in derived['coordinates']]
+        return min(lats), min(lons), max(lats), max(lons)
+
+    # Without derived corners, approximate the visible extent from center and zoom (512px tiles)
+    center = relayout_data.get('mapbox.center', FIRE_MAP_CENTER)
+    zoom = relayout_data.get('mapbox.zoom', FIRE_MAP_ZOOM)
+    lon_span = 360 * width / (512 * 2 ** zoom)
+    lat_span = lon_span * height / width * np.cos(np.radians(center['lat']))
+    return (center['lat'] - lat_span / 2, center['lon'] - lon_span / 2,
+            center['lat'] + lat_span / 2, center['lon'] + lon_span / 2)
+
+
+def create_fire_points_figure(south, west, north, east, budget=FIRE_MAP_POINT_BUDGET):
+    fig = go.Figure()
+    if fire_index.estimate_bbox(south, west, north, east) <= budget:
+        positions = fire_index.query_bbox(south, west, north, east)
+        dates = fire_dates[positions].astype('datetime64[D]').astype(str)
+        fig.add_trace(go.Scattermapbox(
+            lat=fire_latitudes[positions],
+            lon=fire_longitudes[positions],
+            mode='markers',
+            marker=dict(size=6, color=fire_brightness[positions], colorscale='YlOrRd', showscale=True,
+                        colorbar=dict(title='Brightness')),
+            customdata=np.column_stack([dates, fire_frp[positions]]),
+            hovertemplate='%{customdata[0]}<br>Brightness: %{marker.color:.1f}<br>FRP: %{customdata[1]}<extra></extra>'
+        ))
+        title = f'{len(positions):,} fire detections in view'
+    else:
+        cell_size, lat, lon, counts, mean_brightness = fire_index.aggregate_bbox(south, west, north, east, budget)
+        fig.add_trace(go.Scattermapbox(
+            lat=lat,
+            lon=lon,
+            mode='markers',
+            marker=dict(size=4 + 3 * np.log1p(counts), color=np.log10(counts), colorscale='YlOrRd', showscale=True,
+                        colorbar=dict(title='log10 detections')),
+            customdata=np.column_stack([counts, mean_brightness]),
+            hovertemplate='%{customdata[0]:,} detections<br>Mean brightness: %{customdata[1]:.1f}<extra></extra>'
+        ))
+        title = f'{int(counts.sum()):,} fire detections in view, aggregated to {cell_size:g}° cells'
+
+    fig.update_layout(
+        title=title,
+        mapbox=dict(style="carto-positron", accesstoken=mapbox_access_token, center=FIRE_MAP_CENTER, zoom=FIRE_MAP_ZOOM),
+        margin={"r": 0, "t": 40, "l": 0, "b": 0},
+        uirevision='fire-points'  # keep the user's pan/zoom when the data is replaced
+    )
+    return fig
+
+
+def update_playback_slider(freq):
+    stack = load_raster_stack(df, freq)
+    # Label every year; monthly stacks would crowd the slider with one mark per month
+    marks = {i: period[:4] for i, period in enumerate(stack.periods) if freq == 'year' or period.endswith('-01')}
+    return len(stack.periods) - 1, marks, 0
+
+
+@instrument_callback('sub_page3a.update_spatial_playback')
+def update_spatial_playback(index, freq):
+    # Shade the precomputed slice for this period instead of re-aggregating the points
+    stack = load_raster_stack(df, freq)
+    index = min(index or 0, len(stack.periods) - 1)
+    fig = px.imshow(stack.shade(index).to_pil(), title=f'Spatial Distribution of Fires ({stack.periods[index]})')
+    fig.update_layout(width=1200, height=800)
+    return fig
+
+
+@instrument_callback('sub_page3a.update_fire_points_map')
+def update_fire_points_map(relayout_data):
+    if relayout_data and not any(key.startswith('mapbox') for key in relayout_data):
+        raise PreventUpdate
+    return create_fire_points_figure(*viewport_bounds(relayout_data))
+
+
+def estimated_counts(keys, labels=None):
+    # Weighted counts from the sample with 95% interval half-widths
+    estimate = fire_sample.estimate_counts(keys)
+    return pd.DataFrame({labels or 'key': estimate.index, 'counts': estimate['estimate'].round().values,
+                         'error': 1.96 * estimate['std_error'].values})
+
+
+def preview_errors():
+    # Relative 95% interval of the estimated daily counts (yearly and monthly counts are exact: months are strata)
+    daily = fire_sample.estimate_counts(fire_sample.frame['ACQ_DATE'].values.astype('datetime64[D]'))
+    return 1.96 * daily['std_error'] / daily['estimate']
+
+
+def add_anomaly_markers(fig, series):
+    # Days outside the seasonal baseline, from the maintained per-day-of-year statistics
+    for label, flagged, color in [('Unusually high', series['anomaly'] & (series['z'] > 0), 'red'),
+                                  ('Unusually low', series['anomaly'] & (series['z'] < 0), 'royalblue')]:
+        fig.add_trace(go.Scatter(x=series.loc[flagged, 'ACQ_DATE'], y=series.loc[flagged, 'counts'], mode='markers',
+                                 name=label, marker=dict(color=color, size=9, symbol='diamond'),
+                                 customdata=series.loc[flagged, ['expected', 'z']].values,
+                                 hovertemplate='%{x|%Y-%m-%d}: %{y} detections<br>expected %{customdata[0]:.0f}, '
+                                               'z = %{customdata[1]:.1f}<extra></extra>'))
+    return fig
+
+
+@instrument_callback('sub_page3a.update_anomalies')
+def update_anomalies(region):
+    series = fire_anomalies.series(region)
+    fig = go.Figure([
+        go.Scatter(x=series['ACQ_DATE'], y=series['upper'], mode='lines', line=dict(width=0), showlegend=False,
+                   hoverinfo='skip'),
+        go.Scatter(x=series['ACQ_DATE'], y=series['lower'], mode='lines', line=dict(width=0), fill='tonexty',
+                   fillcolor='rgba(255,165,0,0.25)', name='Seasonal baseline (95%)', hoverinfo='skip'),
+        go.Scatter(x=series['ACQ_DATE'], y=series['expected'], mode='lines', name='Expected',
+                   line=dict(color='orange')),
+        go.Scatter(x=series['ACQ_DATE'], y=series['counts'], mode='lines', name='Detections',
+                   line=dict(color='gray', width=1)),
+    ])
+    add_anomaly_markers(fig, series)
+    fig.update_layout(title=f'Daily Detections vs Seasonal Baseline ({region}, |z| >= {FIRE_ANOMALY_Z:g})',
+                      xaxis_title='Date', yaxis_title='Number of Fires')
+
+    flagged = fire_anomalies.flagged()
+    if region != ALL_REGIONS:
+        flagged = flagged[flagged['Region'] == region]
+    flagged = flagged.head(20).assign(ACQ_DATE=lambda frame: frame['ACQ_DATE'].dt.strftime('%Y-%m-%d'))
+    table = dbc.Table.from_dataframe(flagged.rename(columns={'ACQ_DATE': 'Date', 'counts': 'Detections',
+                                                             'expected': 'Expected', 'z': 'z-score'}),
+                                     striped=True, bordered=True, size='sm')
+    return fig, [html.H5("Most Recent Anomalous Days"), table]
+
+
+@instrument_callback('sub_page3a.update_summary_preview')
+def update_summary_preview(pathname):
+    # Fast first render from the stratified sample; the exact figures replace these when update_summary finishes
+    if pathname != '/sub_page3a':
+        raise PreventUpdate
+    sample = fire_sample.frame
+    title = ' (preview from sample)'
+
+    yearly = estimated_counts(sample['Year'].values, 'Year')
+    fig1 = px.line(yearly, x='Year', y='counts', markers=True,
+                   title='Number of Fire Detections per Year (2014-2024)' + title)
+    fig1.update_layout(xaxis_title='Year', yaxis_title='Number of Fires')
+
+    # Weighted sample points stand in for every detection
+    cvs = ds.Canvas(plot_width=800, plot_height=600)
+    img = tf.shade(cvs.points(sample, 'LONGITUDE', 'LATITUDE', agg=ds.sum('WEIGHT')), cmap=fire, how='log')
+    fig2 = px.imshow(img.to_pil(), title='Spatial Distribution of Fires (2014-2024)' + title)
+    fig2.update_layout(width=1200, height=800)
+
+    fig3 = px.density_mapbox(sample, lat='LATITUDE', lon='LONGITUDE', z='BRIGHTNESS', radius=10,
+                             mapbox_style="stamen-terrain", title='Hexbin Plot of Fire Occurrences (2014-2024)' + title)
+    fig3.update_layout(mapbox=dict(accesstoken=mapbox_access_token, center=dict(lat=37, lon=-95), zoom=3),
+                       width=1200, height=800)
+
+    monthly = estimated_counts(sample['ACQ_DATE'].dt.month.values, 'Month')
+    fig4 = px.bar(monthly, x='Month', y='counts', title='Fire Occurrences by Month (2014-2024)' + title)
+    fig4.update_layout(xaxis_title='Month', yaxis_title='Number of Fires')
+
+    daily = estimated_counts(sample['ACQ_DATE'].values.astype('datetime64[D]'), 'ACQ_DATE')
+    fig5 = px.line(daily, x='ACQ_DATE', y='counts', error_y='error',
+                   title='Time Series Analysis of Fire Occurrences (2014-2024)' + title)
+    fig5.update_layout(xaxis_title='Date', yaxis_title='Number of Fires')
+
+    fig7 = px.bar(yearly, x='Year', y='counts', title='Yearly Fire Occurrences (2014-2024)' + title)
+    fig7.update_layout(xaxis_title='Year', yaxis_title='Number of Fires')
+
+    seasons = np.array(['Winter', 'Winter', 'Spring', 'Spring', 'Spring', 'Summer', 'Summer', 'Summer', 'Fall',
+                        'Fall', 'Fall', 'Winter'])
+    seasonal = estimated_counts(seasons[sample['ACQ_DATE'].dt.month.values - 1], 'Season')
+    fig8 = px.bar(seasonal, x='Season', y='counts', title='Fire Occurrences by Season (2014-2024)' + title)
+    fig8.update_layout(xaxis_title='Season', yaxis_title='Number of Fires')
+
+    errors = preview_errors()
+    status = (f"Preview from a stratified sample of {len(fire_sample):,} of {fire_sample.total:,} detections "
+              f"({len(fire_sample.population):,} month x {fire_sample.cell_size:g}° strata). Yearly and monthly "
+              f"counts are exact; daily counts are within ±{errors.median():.0%} (median 95% interval). "
+              f"Computing exact results...")
+    return fig1, fig2, fig3, fig4, fig5, fig7, fig8, status, True, pathname
+
+
+def update_summary_exact(pathname):
+    # Second step of the summary: exact figures over the whole archive, replacing the preview
+    figures = update_summary(pathname)
+    # Realised error of the preview's daily counts, now that the exact ones are known
+    days, counts = np.unique(df['ACQ_DATE'].values.astype('datetime64[D]'), return_counts=True)
+    estimate = fire_sample.estimate_counts(fire_sample.frame['ACQ_DATE'].values.astype('datetime64[D]'))
+    estimated = estimate['estimate'].reindex(days, fill_value=0).values
+    errors = np.abs(estimated - counts) / counts
+    status = (f"Exact results from all {fire_sample.total:,} detections. The preview's daily counts were off by "
+              f"{np.median(errors):.0%} (median) and {np.percentile(errors, 95):.0%} (95th percentile).")
+    return (*figures, status)
+
+
 # Define the app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
 app.layout = layout
@@ -126,25 +325,30 @@ app.layout = layout
     ],
     [Input('url', 'pathname')]
 )
+@instrument_callback('sub_page3a.update_summary')
 def update_summary(pathname):
     if pathname == '/sub_page3a':
+        timer = FigureTimer('sub_page3a.update_summary')
         # Number of Fire Detections per Year (2014-2024)
         fires_per_year = df.groupby('Year').size().reset_index(name='counts')
         fig1 = px.line(fires_per_year, x='Year', y='counts', markers=True,
                        title='Number of Fire Detections per Year (2014-2024)')
         fig1.update_layout(xaxis_title='Year', yaxis_title='Number of Fires')
+        timer.lap('fires_per_year')
 
         # Spatial Distribution of Fires (2014-2024) using Datashader
         img = create_datashader_image(df)
         export_image(img, 'spatial_distribution', background="black")
         fig2 = px.imshow(img.to_pil(), title='Spatial Distribution of Fires (2014-2024)')
         fig2.update_layout(width=1200, height=800)
+        timer.lap('spatial_distribution')
 
         # Hexbin Plot of Fire Occurrences (2014-2024)
         fig3 = px.density_mapbox(df, lat='LATITUDE', lon='LONGITUDE', z='BRIGHTNESS', radius=10,
                                  mapbox_style="stamen-terrain", title='Hexbin Plot of Fire Occurrences (2014-2024)')
         fig3.update_layout(mapbox=dict(accesstoken=mapbox_access_token, center=dict(lat=37, lon=-95), zoom=3),
                            width=1200, height=800)
+        timer.lap('hexbin_plot')
 
         # Fire Occurrences by Month (2014-2024)
         df_reset = df.reset_index()
@@ -159,13 +363,16 @@ def update_summary(pathname):
                                                                                                     'Jul', 'Aug', 'Sep',
                                                                                                     'Oct', 'Nov',
                                                                                                     'Dec']))
+        timer.lap('monthly_fires')
 
         # Time Series Analysis of Fire Occurrences (2014-2024)
         time_series = df_reset['ACQ_DATE'].value_counts().sort_index().reset_index()
         time_series.columns = ['ACQ_DATE', 'counts']
         fig5 = px.line(time_series, x='ACQ_DATE', y='counts', markers=True,
                        title='Time Series Analysis of Fire Occurrences (2014-2024)')
+        add_anomaly_markers(fig5, fire_anomalies.series())
         fig5.update_layout(xaxis_title='Date', yaxis_title='Number of Fires')
+        timer.lap('time_series')
 
         # Trend Analysis of Fire Occurrences (2014-2024)
         df_reset.set_index('ACQ_DATE', inplace=True)
@@ -186,12 +393,14 @@ def update_summary(pathname):
         fig6.update_layout(title='Trend Analysis of Fire Occurrences (2014-2024)', xaxis_title='Date',
                            yaxis_title='Number of Fires')
         df_reset.reset_index(inplace=True)
+        timer.lap('trend_analysis')
 
         # Yearly Fire Occurrences (2014-2024)
         yearly_counts = df_reset['Year'].value_counts().sort_index().reset_index()
         yearly_counts.columns = ['Year', 'counts']
         fig7 = px.bar(yearly_counts, x='Year', y='counts', title='Yearly Fire Occurrences (2014-2024)')
         fig7.update_layout(xaxis_title='Year', yaxis_title='Number of Fires')
+        timer.lap('yearly_fires')
 
         # Fire Occurrences by Season (2014-2024)
         def categorize_season(date):
@@ -210,6 +419,7 @@ def update_summary(pathname):
         seasonal_counts.columns = ['Season', 'counts']
         fig8 = px.bar(seasonal_counts, x='Season', y='counts', title='Fire Occurrences by Season (2014-2024)')
         fig8.update_layout(xaxis_title='Season', yaxis_title='Number of Fires')
+        timer.lap('seasonal_fires')
 
         # Forecast of Fire Occurrences
         if len(monthly_counts.unique()) > 1:  # Ensure there is variability in the data
@@ -231,6 +441,7 @@ def update_summary(pathname):
             fig9 = go.Figure()
             fig9.add_trace(go.Scatter(x=monthly_counts.index, y=monthly_counts, mode='lines', name='Historical Data'))
             fig9.update_layout(title='Forecast of Fire Occurrences', xaxis_title='Date', yaxis_title='Number of Fires')
+        timer.lap('forecast_fires')
 
         return fig1, fig2, fig3, fig4, fig5, fig6, fig7, fig8, fig9
     return {}, {}, {}, {}, {}, {}, {}, {}, {}
@@ -238,6 +449,7 @@ def update_summary(pathname):
 
 # Register the callbacks
 def register_callbacks(app):
+    # Preview first (pathname -> store), then the exact summary once the store is set
     app.callback(
         [
             Output('fires_per_year', 'figure'),
@@ -245,13 +457,70 @@ def register_callbacks(app):
             Output('hexbin_plot', 'figure'),
             Output('monthly_fires', 'figure'),
             Output('time_series', 'figure'),
-            Output('trend_analysis', 'figure'),
             Output('yearly_fires', 'figure'),
             Output('seasonal_fires', 'figure'),
-            Output('forecast_fires', 'figure')
+            Output('summary-preview-status', 'children'),
+            Output('summary-preview-status', 'is_open'),
+            Output('summary-preview', 'data')
         ],
         [Input('url', 'pathname')]
-    )(update_summary)
+    )(update_summary_preview)
+    app.callback(
+        [
+            Output('fires_per_year', 'figure', allow_duplicate=True),
+            Output('spatial_distribution', 'figure', allow_duplicate=True),
+            Output('hexbin_plot', 'figure', allow_duplicate=True),
+            Output('monthly_fires', 'figure', allow_duplicate=True),
+            Output('time_series', 'figure', allow_duplicate=True),
+            Output('trend_analysis', 'figure'),
+            Output('yearly_fires', 'figure', allow_duplicate=True),
+            Output('seasonal_fires', 'figure', allow_duplicate=True),
+            Output('forecast_fires', 'figure'),
+            Output('summary-preview-status', 'children', allow_duplicate=True)
+        ],
+        [Input('summary-preview', 'data')],
+        prevent_initial_call=True
+    )(update_summary_exact)
+    app.callback(
+        Output('fire_points_map', 'figure'),
+        [Input('fire_points_map', 'relayoutData')]
+    )(update_fire_points_map)
+    app.callback(
+        [Output('anomaly_series', 'figure'), Output('anomaly_table', 'children')],
+        [Input('anomaly-region-dropdown', 'value')]
+    )(update_anomalies)
+    app.callback(
+        [Output('playback-slider', 'max'), Output('playback-slider', 'marks'), Output('playback-slider', 'value')],
+        [Input('playback-frequency', 'value')]
+    )(update_playback_slider)
+    app.callback(
+        Output('spatial_playback', 'figure'),
+        [Input('playback-slider', 'value'), Input('playback-frequency', 'value')]
+    )(update_spatial_playback)
+
+    # Play/pause and frame stepping stay in the browser; only the frame image is rendered on the server
+    app.clientside_callback(
+        """
+        function(n_clicks, disabled) {
+            return [!disabled, disabled ? 'Pause' : 'Play'];
+        }
+        """,
+        [Output('playback-interval', 'disabled'), Output('playback-button', 'children')],
+        [Input('playback-button', 'n_clicks')],
+        [State('playback-interval', 'disabled')],
+        prevent_initial_call=True
+    )
+    app.clientside_callback(
+        """
+        function(n_intervals, value, max) {
+            return (value || 0) >= max ? 0 : (value || 0) + 1;
+        }
+        """,
+        Output('playback-slider', 'value', allow_duplicate=True),
+        [Input('playback-interval', 'n_intervals')],
+        [State('playback-slider', 'value'), State('playback-slider', 'max')],
+        prevent_initial_call=True
+    )
 
 
 register_callbacks(app)
@@ -1,54 +1,76 @@
 import dash
 from dash import dcc, html, Input, Output, State
 import dash_bootstrap_components as dbc
-import geopandas as gpd
-import dask.dataframe as dd
-from shapely import wkb
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-import time
+import calendar
 import json
+import time
+from urllib.parse import urlencode
+import numpy as np
+from utils.metrics import instrument_callback
+from utils.fire_data import load_fire_data
+from utils.fire_storage import load_manifest, read_month
+from utils.summed_area import load_summed_area_table
+from utils.bitmap_index import (CONFIDENCE_BINS, DAYNIGHT_LABELS, FIRE_ATTRIBUTE_COLUMNS, TYPE_LABELS, attribute_mask,
+                                load_fire_attribute_index)
 # Load secrets
 with open('config/secrets.json') as f:
     secrets = json.load(f)
     api_key = secrets['tomtom_api_key']
     mapbox_access_token = secrets['mapbox_access_token']
 
-# Load the parquet file in chunks
-def load_geojson_chunk(parquet_file_path, npartitions=2):
-    start_time = time.time()
+# Load the fire archive (shared with the other fire analysis pages)
+df = load_fire_data()
+
 
-    # Read Parquet file using Dask
-    ddf = dd.read_parquet(parquet_file_path)
+# Fire counts per year and month, shipped once to the browser for the temporal trends comparison
+def build_year_month_counts(df):
+    year_month_counts = (
+        df.groupby(['Year', df['ACQ_DATE'].dt.month]).size()
+        .unstack(fill_value=0)
+        .reindex(columns=range(1, 13), fill_value=0)
+    )
+    return {str(year): row.tolist() for year, row in year_month_counts.iterrows()}
 
-    # Convert to GeoPandas DataFrame
-    df = ddf.compute()
 
-    # Convert the geometry column from WKB to shapely geometries
-    df['geometry'] = df['geometry'].apply(wkb.loads)
+year_month_data = build_year_month_counts(df)
 
-    # Ensure geometry column is recognized as geometry
-    gdf = gpd.GeoDataFrame(df, geometry='geometry')
+# Archives converted into the partitioned store; the loaded archive stays the default
+fire_datasets = load_manifest()
+dataset_options = [{'label': 'Loaded archive', 'value': 'archive'}] + [
+    {'label': f"{instrument} ({', '.join(entry['satellites'])})", 'value': instrument}
+    for instrument, entry in fire_datasets.items()
+]
+dataset_years = sorted(set(df['Year'].unique()).union(*(entry['years'] for entry in fire_datasets.values())))
 
-    end_time = time.time()
-    print(f"Time taken to load Parquet file: {end_time - start_time} seconds")
+# Prefix sums over (day, lat bin, lon bin) for the date-range and map-box selection
+summed_area = load_summed_area_table()
+range_marks = {summed_area.day_of(f'{year}-01-01'): str(year) for year in sorted(df['Year'].unique())
+               if 0 <= summed_area.day_of(f'{year}-01-01') < summed_area.n_days}
 
-    return dd.from_pandas(gdf, npartitions=npartitions)
+# Bitmaps per confidence bin, satellite, day/night, instrument and type, combined with the date index
+attribute_index = load_fire_attribute_index()
+ATTRIBUTE_FILTERS = [
+    ('CONFIDENCE', 'Confidence', {label: label.title() for label, _, _ in CONFIDENCE_BINS}),
+    ('SATELLITE', 'Satellite', {}),
+    ('DAYNIGHT', 'Day/Night', DAYNIGHT_LABELS),
+    ('INSTRUMENT', 'Instrument', {}),
+    ('TYPE', 'Type', TYPE_LABELS),
+]
 
-# Load the parquet data
-parquet_file_path = '/Users/cobi/PycharmProjects/project_ai/data/fire_archive_M-C61_490372.parquet'
-gdf_chunked = load_geojson_chunk(parquet_file_path)
-df = gdf_chunked.compute()
 
-# Convert the ACQ_DATE to datetime format
-try:
-    df['ACQ_DATE'] = pd.to_datetime(df['ACQ_DATE'])
-except Exception as e:
-    print(f"Error converting ACQ_DATE to datetime: {e}")
+def attribute_filter(column, name, labels):
+    return dbc.Col(dcc.Dropdown(
+        id=f'filter-{column.lower()}',
+        options=[{'label': f"{labels.get(value, value)} ({count:,})", 'value': value}
+                 for value, count in attribute_index.options(column)],
+        multi=True,
+        placeholder=f"Any {name.lower()}"
+    ), width=True)
 
-df['Year'] = df['ACQ_DATE'].dt.year
 
 layout = dbc.Container(
     [
@@ -59,9 +81,15 @@ layout = dbc.Container(
             )
         ]),
         html.H3("Analyze Specific Year and Month"),
+        dcc.Dropdown(
+            id='specific-dataset-dropdown',
+            options=dataset_options,
+            value='archive',
+            clearable=False
+        ),
         dcc.Dropdown(
             id='specific-year-dropdown',
-            options=[{'label': str(year), 'value': year} for year in df['Year'].unique()],
+            options=[{'label': str(year), 'value': year} for year in dataset_years],
             placeholder="Select Year"
         ),
         dcc.Dropdown(
@@ -75,8 +103,37 @@ layout = dbc.Container(
                      {'label': 'December', 'value': 12}],
             placeholder="Select Month"
         ),
+        dbc.Row([attribute_filter(column, name, labels) for column, name, labels in ATTRIBUTE_FILTERS],
+                className="mt-2 g-2"),
         dbc.Button("Analyze", id="analyze-button", color="primary", className="mt-2"),
         dcc.Graph(id='specific_analysis'),
+        html.Div([
+            dcc.RadioItems(
+                id='export-format',
+                options=[{'label': 'CSV', 'value': 'csv'}, {'label': 'Parquet', 'value': 'parquet'},
+                         {'label': 'GeoJSON', 'value': 'geojson'}],
+                value='csv',
+                inline=True,
+                inputStyle={"margin-right": "5px", "margin-left": "10px"}
+            ),
+            html.A("Download detections", id='export-link', href='/export/fires?format=csv',
+                   className="btn btn-outline-primary mt-2")
+        ], className="mb-4"),
+        html.H3("Analyze a Date Range and Area"),
+        html.P("Drag the slider to pick dates and use box select on the map to pick an area."),
+        dcc.RangeSlider(
+            id='range-days',
+            min=0,
+            max=summed_area.n_days - 1,
+            step=1,
+            value=[0, summed_area.n_days - 1],
+            marks=range_marks
+        ),
+        html.Div(id='range-summary', className="mt-2 mb-2"),
+        html.A("Download selection", id='range-export-link', href='/export/fires?format=csv',
+               className="btn btn-outline-primary mb-2"),
+        dcc.Graph(id='range_map', style={"height": "600px"}),
+        dcc.Graph(id='range_daily'),
         html.H3("Temporal Trends for Specific Years"),
         dcc.Dropdown(
             id='specific-years-dropdown',
@@ -84,44 +141,195 @@ layout = dbc.Container(
             multi=True,
             placeholder="Select Years"
         ),
-        dcc.Graph(id='temporal_trends')
+        dcc.Graph(id='temporal_trends'),
+        dcc.Store(id='year-month-counts', data=year_month_data)
     ],
     fluid=True
 )
 
+def describe_filters(filters):
+    parts = []
+    for column, name, labels in ATTRIBUTE_FILTERS:
+        if column in filters:
+            parts.append(f"{name}: {', '.join(str(labels.get(value, value)) for value in filters[column])}")
+    return '; '.join(parts)
+
+
+@instrument_callback('sub_page3b.update_specific_analysis')
+def update_specific_analysis(n_clicks, year, month, dataset='archive', *filter_values):
+    if n_clicks and year and month:
+        filters = {column: values for (column, _, _), values in zip(ATTRIBUTE_FILTERS, filter_values) if values}
+        if dataset in fire_datasets:
+            # Only the year/satellite partitions and row groups covering the month are read
+            columns = ['ACQ_DATE'] + [column for column in FIRE_ATTRIBUTE_COLUMNS if column in filters]
+            df_filtered = read_month(year, month, instrument=dataset, columns=columns)
+            df_filtered = df_filtered[attribute_mask(df_filtered, filters)]
+        else:
+            # Date range and attribute filters resolve to row positions through the bitmap index
+            rows = attribute_index.rows(filters, f'{year}-{month:02}-01',
+                                        f'{year}-{month:02}-{calendar.monthrange(year, month)[1]}')
+            df_filtered = df.iloc[rows]
+        specific_counts = df_filtered['ACQ_DATE'].value_counts().sort_index().reset_index()
+        specific_counts.columns = ['ACQ_DATE', 'counts']
+        title = f'Fire Occurrences for {year}-{month:02}'
+        if filters:
+            title += f' ({describe_filters(filters)})'
+        specific_fig = px.line(specific_counts, x='ACQ_DATE', y='counts', markers=True, title=title)
+        specific_fig.update_layout(xaxis_title='Date', yaxis_title='Number of Fires')
+        return specific_fig
+    return {}
+
+def selected_bbox(selected_data):
+    # (south, west, north, east) of a box selection on the range map, or None for the whole archive
+    corners = ((selected_data or {}).get('range') or {}).get('mapbox')
+    if not corners:
+        return None
+    (lon0, lat0), (lon1, lat1) = corners
+    return min(lat0, lat1), min(lon0, lon1), max(lat0, lat1), max(lon0, lon1)
+
+
+@instrument_callback('sub_page3b.update_range_map')
+def update_range_map(day_range):
+    start_day, end_day = day_range or (None, None)
+    counts = summed_area.grid('count', start_day, end_day)
+    rows, cols = np.nonzero(counts)
+    half = summed_area.cell_size / 2
+    fig = go.Figure(go.Scattermapbox(
+        lat=summed_area.lat0 + rows * summed_area.cell_size + half,
+        lon=summed_area.lon0 + cols * summed_area.cell_size + half,
+        mode='markers',
+        marker=dict(size=10, color=np.log10(counts[rows, cols]), colorscale='YlOrRd', showscale=True,
+                    colorbar=dict(title='log10 detections')),
+        customdata=counts[rows, cols],
+        hovertemplate='%{customdata:,} detections<extra></extra>'
+    ))
+    fig.update_layout(
+        mapbox=dict(style="carto-positron", accesstoken=mapbox_access_token, center=dict(lat=37, lon=-95), zoom=3),
+        margin={"r": 0, "t": 0, "l": 0, "b": 0},
+        dragmode='select',
+        uirevision='range-map'
+    )
+    return fig
+
+
+@instrument_callback('sub_page3b.update_range_selection')
+def update_range_selection(day_range, selected_data):
+    start_day, end_day = day_range or (0, summed_area.n_days - 1)
+    bbox = selected_bbox(selected_data)
+    start_time = time.perf_counter()
+    totals = summed_area.query(start_day, end_day, bbox)
+    query_us = (time.perf_counter() - start_time) * 1e6
+    start_date, end_date = summed_area.date_of(start_day), summed_area.date_of(end_day)
+
+    area = 'all areas'
+    if bbox:
+        south, west, north, east = summed_area.snapped_bbox(bbox)
+        area = f"{south:g}..{north:g}°N, {west:g}..{east:g}°E (snapped to {summed_area.cell_size:g}° bins)"
+    mean_brightness = totals['brightness'] / totals['count'] if totals['count'] else float('nan')
+    summary = (f"{start_date} to {end_date}, {area}: {totals['count']:,} detections, mean brightness "
+               f"{mean_brightness:.1f} K, total FRP {totals['frp']:,.0f} MW (answered in {query_us:.0f} µs)")
+
+    daily = summed_area.daily('count', start_day, end_day, bbox)
+    dates = np.arange(start_date, start_date + np.timedelta64(len(daily), 'D')).astype(str)
+    daily_fig = go.Figure(go.Scatter(x=dates, y=daily, mode='lines'))
+    daily_fig.update_layout(title=f'Daily Fire Detections ({start_date} to {end_date})', xaxis_title='Date',
+                            yaxis_title='Number of Fires')
+    return summary, daily_fig
+
+
+def update_range_export_link(day_range, selected_data, fmt):
+    # Same dates and snapped box as the summary, so the download holds the detections it counts
+    start_day, end_day = day_range or (0, summed_area.n_days - 1)
+    params = {'format': fmt or 'csv', 'start_date': str(summed_area.date_of(start_day)),
+              'end_date': str(summed_area.date_of(end_day))}
+    bbox = selected_bbox(selected_data)
+    if bbox:
+        params['bbox'] = ','.join(f'{value:g}' for value in summed_area.snapped_bbox(bbox))
+    return '/export/fires?' + urlencode(params)
+
+
 def register_callbacks(app):
-    @app.callback(
+    app.callback(
+        Output('range_map', 'figure'),
+        [Input('range-days', 'value')]
+    )(update_range_map)
+    app.callback(
+        [Output('range-summary', 'children'), Output('range_daily', 'figure')],
+        [Input('range-days', 'value'), Input('range_map', 'selectedData')]
+    )(update_range_selection)
+    app.callback(
+        Output('range-export-link', 'href'),
+        [Input('range-days', 'value'), Input('range_map', 'selectedData'), Input('export-format', 'value')]
+    )(update_range_export_link)
+    app.callback(
         Output('specific_analysis', 'figure'),
         [Input('analyze-button', 'n_clicks')],
-        [State('specific-year-dropdown', 'value'), State('specific-month-dropdown', 'value')]
+        [State('specific-year-dropdown', 'value'), State('specific-month-dropdown', 'value'),
+         State('specific-dataset-dropdown', 'value')] +
+        [State(f'filter-{column.lower()}', 'value') for column, _, _ in ATTRIBUTE_FILTERS]
+    )(update_specific_analysis)
+
+    # Download link for the selected dataset/year/month and attribute filters; the file is streamed by /export/fires
+    app.clientside_callback(
+        """
+        function(year, month, dataset, format, ...filterValues) {
+            const params = new URLSearchParams({format: format || 'csv', dataset: dataset || 'archive'});
+            if (year) {
+                params.set('year', year);
+                if (month) {
+                    params.set('month', month);
+                }
+            }
+            const columns = %s;
+            columns.forEach(function(column, i) {
+                if (filterValues[i] && filterValues[i].length) {
+                    params.set(column, filterValues[i].join(','));
+                }
+            });
+            return '/export/fires?' + params.toString();
+        }
+        """ % json.dumps([column.lower() for column, _, _ in ATTRIBUTE_FILTERS]),
+        Output('export-link', 'href'),
+        [Input('specific-year-dropdown', 'value'), Input('specific-month-dropdown', 'value'),
+         Input('specific-dataset-dropdown', 'value'), Input('export-format', 'value')] +
+        [Input(f'filter-{column.lower()}', 'value') for column, _, _ in ATTRIBUTE_FILTERS]
     )
-    def update_specific_analysis(n_clicks, year, month):
-        if n_clicks and year and month:
-            df_filtered = df[(df['Year'] == year) & (df['ACQ_DATE'].dt.month == month)]
-            specific_counts = df_filtered['ACQ_DATE'].value_counts().sort_index().reset_index()
-            specific_counts.columns = ['ACQ_DATE', 'counts']
-            specific_fig = px.line(specific_counts, x='ACQ_DATE', y='counts', markers=True,
-                                   title=f'Fire Occurrences for {year}-{month:02}')
-            specific_fig.update_layout(xaxis_title='Date', yaxis_title='Number of Fires')
-            return specific_fig
-        return {}
-
-    @app.callback(
+
+    # Compare years in the browser from the preloaded year x month matrix
+    app.clientside_callback(
+        """
+        function(years, counts) {
+            if (!years || years.length === 0) {
+                return {};
+            }
+            const months = [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12];
+            return {
+                data: years.map(function(year) {
+                    return {
+                        type: 'scatter',
+                        mode: 'lines+markers',
+                        x: months,
+                        y: counts[String(year)] || months.map(function() { return 0; }),
+                        name: String(year)
+                    };
+                }),
+                layout: {
+                    title: {text: 'Monthly Fire Occurrences for Specific Years'},
+                    xaxis: {
+                        title: {text: 'Month'},
+                        tickmode: 'array',
+                        tickvals: months,
+                        ticktext: ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+                    },
+                    yaxis: {title: {text: 'Number of Fires'}}
+                }
+            };
+        }
+        """,
         Output('temporal_trends', 'figure'),
-        [Input('specific-years-dropdown', 'value')]
+        [Input('specific-years-dropdown', 'value')],
+        [State('year-month-counts', 'data')]
     )
-    def update_temporal_trends(years):
-        if years:
-            df_filtered = df[df['Year'].isin(years)]
-            monthly_counts = df_filtered.groupby(['Year', df_filtered['ACQ_DATE'].dt.month]).size().unstack(level=0).fillna(0)
-            temporal_fig = go.Figure()
-            for yr in years:
-                temporal_fig.add_trace(go.Scatter(x=monthly_counts.index, y=monthly_counts[yr], mode='lines+markers', name=str(yr)))
-            temporal_fig.update_layout(title='Monthly Fire Occurrences for Specific Years', xaxis_title='Month', yaxis_title='Number of Fires')
-            temporal_fig.update_xaxes(tickmode='array', tickvals=list(range(1, 13)),
-                                      ticktext=['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'])
-            return temporal_fig
-        return {}
 
 # Define the app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
@@ -0,0 +1,69 @@
+import dash
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+import plotly.express as px
+from utils.metrics import instrument_callback
+from utils.fire_data import load_fire_data
+from utils.regions import load_region_index
+
+# Load the fire archive and assign every detection to a region once
+df = load_fire_data()
+region_index = load_region_index()
+
+min_date = df['ACQ_DATE'].min().date()
+max_date = df['ACQ_DATE'].max().date()
+
+layout = dbc.Container(
+    [
+        dbc.Row([
+            dbc.Col(
+                dbc.Button("Back to Main Page", href="/page3", color="primary", className="mb-4"),
+                width=12
+            )
+        ]),
+        html.H3("Fire Data Across Regions"),
+        dcc.DatePickerRange(
+            id='region-date-range',
+            min_date_allowed=min_date,
+            max_date_allowed=max_date,
+            start_date=min_date,
+            end_date=max_date,
+            className="mb-2"
+        ),
+        dcc.Graph(id='region_counts'),
+        dcc.Graph(id='region_brightness'),
+        dcc.Graph(id='region_frp')
+    ],
+    fluid=True
+)
+
+
+@instrument_callback('sub_page3c.update_region_comparison')
+def update_region_comparison(start_date, end_date):
+    regions = region_index.aggregate(start_date, end_date)
+    period = f"{start_date or min_date} to {end_date or max_date}"
+
+    fig1 = px.bar(regions, x='Region', y='counts', title=f'Number of Fires by Region ({period})')
+    fig1.update_layout(xaxis_title='Region', yaxis_title='Number of Fires')
+
+    fig2 = px.bar(regions, x='Region', y='mean_brightness', title=f'Average Brightness Temperature by Region ({period})')
+    fig2.update_layout(xaxis_title='Region', yaxis_title='Brightness (K)')
+
+    fig3 = px.bar(regions, x='Region', y='mean_frp', title=f'Average Fire Radiative Power by Region ({period})')
+    fig3.update_layout(xaxis_title='Region', yaxis_title='FRP (MW)')
+
+    return fig1, fig2, fig3
+
+
+# Register the callbacks
+def register_callbacks(app):
+    app.callback(
+        [Output('region_counts', 'figure'), Output('region_brightness', 'figure'), Output('region_frp', 'figure')],
+        [Input('region-date-range', 'start_date'), Input('region-date-range', 'end_date')]
+    )(update_region_comparison)
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = layout
+register_callbacks(app)
@@ -0,0 +1,99 @@
+import dash
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+import numpy as np
+import time
+from utils.metrics import instrument_callback
+from utils.fire_model import load_fire_model
+
+# Load the persisted fire occurrence model; it is trained offline with `python -m utils.fire_model`
+model = load_fire_model()
+months = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+
+if model is None:
+    content = [dbc.Alert("No trained fire model found. Run `python -m utils.fire_model` to train it, then restart "
+                         "the app.", color="warning")]
+else:
+    latitudes, longitudes = model.grid_axes()
+
+    # The first archive year is history only; the year after the archive is a forecast
+    last_year = model.first_year + (model.n_periods - 1) // 12
+    years = list(range(model.first_year + 1, last_year + 2))
+    content = [
+        dcc.Dropdown(
+            id='risk-year-dropdown',
+            options=[{'label': str(year), 'value': year} for year in years],
+            value=last_year,
+            placeholder="Select a year",
+            className="mb-2"
+        ),
+        dcc.Dropdown(
+            id='risk-month-dropdown',
+            options=[{'label': name, 'value': i + 1} for i, name in enumerate(months)],
+            value=7,
+            placeholder="Select a month",
+            className="mb-2"
+        ),
+        dcc.Graph(id='risk_heatmap', style={"height": "700px"}),
+        html.P(id='risk-model-info')
+    ]
+
+layout = dbc.Container(
+    [
+        dbc.Row([
+            dbc.Col(
+                dbc.Button("Back to Main Page", href="/page3", color="primary", className="mb-4"),
+                width=12
+            )
+        ]),
+        html.H3("Predicted Fire Occurrence Risk"),
+        *content
+    ],
+    fluid=True
+)
+
+
+@instrument_callback('sub_page3d.update_risk_map')
+def update_risk_map(year, month):
+    if model is None or year is None or month is None:
+        return go.Figure(), ""
+
+    start_time = time.time()
+    risk = model.predict_grid(year, month)
+    inference_seconds = time.time() - start_time
+    fig = go.Figure(go.Heatmap(
+        z=np.where(risk > 0, risk, np.nan),
+        x=longitudes,
+        y=latitudes,
+        zmin=0,
+        zmax=1,
+        colorscale='YlOrRd',
+        colorbar={'title': 'Probability'}
+    ))
+    fig.update_layout(
+        title=f'Probability of Fire Occurrence, {months[month - 1]} {year}',
+        xaxis_title='Longitude',
+        yaxis_title='Latitude',
+        yaxis_scaleanchor='x'
+    )
+
+    scores = ", ".join(f"{name} {value:.2f}" for name, value in model.scores.items())
+    info = (f"Random Forest with SMOTE on {model.cell_size}° grid cells; held-out {scores}. "
+            f"Scored {risk.size} cells in {inference_seconds * 1000:.0f} ms.")
+    return fig, info
+
+
+# Register the callbacks
+def register_callbacks(app):
+    app.callback(
+        [Output('risk_heatmap', 'figure'), Output('risk-model-info', 'children')],
+        [Input('risk-year-dropdown', 'value'), Input('risk-month-dropdown', 'value')]
+    )(update_risk_map)
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = layout
+register_callbacks(app)
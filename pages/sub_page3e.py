@@ -0,0 +1,172 @@
+import dash
+from dash import dcc, html, Input, Output, Patch
+from dash.exceptions import PreventUpdate
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+import numpy as np
+from layouts.center_container import centerComponent
+from utils.metrics import instrument_callback
+from utils.fire_data import load_fire_data
+from utils.regions import load_region_index
+
+# Load the fire archive and region assignments (shared with the other fire analysis pages)
+df = load_fire_data()
+region_index = load_region_index()
+
+# Metric selected by the shared data-type dropdown: (column, aggregate, axis title)
+DATA_TYPES = {
+    'Fire Count': (None, 'count', 'Number of Fires'),
+    'Mean Brightness': ('BRIGHTNESS', 'mean', 'Brightness (K)'),
+    'Mean FRP': ('FRP', 'mean', 'FRP (MW)'),
+}
+DASHBOARD_CELL_DEGREES = 0.5
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+lat0 = np.floor(df['LATITUDE'].min() / DASHBOARD_CELL_DEGREES) * DASHBOARD_CELL_DEGREES
+lon0 = np.floor(df['LONGITUDE'].min() / DASHBOARD_CELL_DEGREES) * DASHBOARD_CELL_DEGREES
+n_rows = int((df['LATITUDE'].max() - lat0) // DASHBOARD_CELL_DEGREES) + 1
+n_cols = int((df['LONGITUDE'].max() - lon0) // DASHBOARD_CELL_DEGREES) + 1
+grid_latitudes = (lat0 + (np.arange(n_rows) + 0.5) * DASHBOARD_CELL_DEGREES).tolist()
+grid_longitudes = (lon0 + (np.arange(n_cols) + 0.5) * DASHBOARD_CELL_DEGREES).tolist()
+
+
+def aggregate(counts, sums, how):
+    if how == 'count':
+        return counts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return sums / counts
+
+
+def to_list(values):
+    # JSON-ready values; empty bins become gaps
+    return [None if np.isnan(value) else round(float(value), 2) for value in values]
+
+
+def build_year_slices(df):
+    # Trace data for every (year, data type), computed once so a year change only ships the new arrays
+    slices = {}
+    years = df['Year'].values
+    days = df['ACQ_DATE'].values.astype('datetime64[D]')
+    months = df['ACQ_DATE'].dt.month.values - 1
+    rows = ((df['LATITUDE'].values - lat0) // DASHBOARD_CELL_DEGREES).astype(np.int64)
+    cols = ((df['LONGITUDE'].values - lon0) // DASHBOARD_CELL_DEGREES).astype(np.int64)
+    cells = rows * n_cols + cols
+
+    for year in np.unique(years):
+        mask = years == year
+        year_days, day_codes = np.unique(days[mask], return_inverse=True)
+        regions = region_index.aggregate(f'{year}-01-01', f'{year}-12-31')
+        slices[int(year)] = {'days': year_days.astype(str).tolist(), 'regions': regions['Region'].tolist()}
+        for data_type, (column, how, _) in DATA_TYPES.items():
+            weights = df[column].values[mask] if column else None
+            daily = aggregate(np.bincount(day_codes, minlength=len(year_days)).astype(float),
+                              np.bincount(day_codes, weights=weights, minlength=len(year_days)) if column else None, how)
+            monthly = aggregate(np.bincount(months[mask], minlength=12).astype(float),
+                                np.bincount(months[mask], weights=weights, minlength=12) if column else None, how)
+            grid_counts = np.bincount(cells[mask], minlength=n_rows * n_cols).astype(float)
+            grid = aggregate(grid_counts, np.bincount(cells[mask], weights=weights, minlength=n_rows * n_cols)
+                             if column else None, how)
+            grid[grid_counts == 0] = np.nan
+            region_values = regions['counts'] if how == 'count' else regions[f'mean_{column.lower()}']
+            slices[int(year)][data_type] = {
+                'daily': to_list(daily),
+                'monthly': to_list(monthly),
+                'grid': [to_list(row) for row in grid.reshape(n_rows, n_cols)],
+                'regions': to_list(region_values.values.astype(float)),
+            }
+    return slices
+
+
+year_slices = build_year_slices(df)
+years = sorted(year_slices, reverse=True)
+data_types = list(DATA_TYPES)
+
+
+def create_dashboard_figures(year, data_type):
+    # Full figures, built once for the initial layout; callbacks only patch their trace data
+    year_slice, values = year_slices[year], year_slices[year][data_type]
+    title = DATA_TYPES[data_type][2]
+
+    daily_fig = go.Figure(go.Scatter(x=year_slice['days'], y=values['daily'], mode='lines'))
+    daily_fig.update_layout(title=f'Daily {data_type} ({year})', xaxis_title='Date', yaxis_title=title)
+
+    monthly_fig = go.Figure(go.Bar(x=MONTHS, y=values['monthly']))
+    monthly_fig.update_layout(title=f'Monthly {data_type} ({year})', xaxis_title='Month', yaxis_title=title)
+
+    region_fig = go.Figure(go.Bar(x=year_slice['regions'], y=values['regions']))
+    region_fig.update_layout(title=f'{data_type} by Region ({year})', xaxis_title='Region', yaxis_title=title)
+
+    grid_fig = go.Figure(go.Heatmap(z=values['grid'], x=grid_longitudes, y=grid_latitudes, colorscale='YlOrRd',
+                                    colorbar={'title': title}))
+    grid_fig.update_layout(title=f'{data_type} per {DASHBOARD_CELL_DEGREES}° Cell ({year})', xaxis_title='Longitude',
+                           yaxis_title='Latitude', yaxis_scaleanchor='x', height=600)
+    return daily_fig, monthly_fig, region_fig, grid_fig
+
+
+initial_figures = create_dashboard_figures(years[0], data_types[0])
+
+layout = dbc.Container(
+    [
+        dbc.Row([
+            dbc.Col(
+                dbc.Button("Back to Main Page", href="/page3", color="primary", className="mb-4"),
+                width=12
+            )
+        ]),
+        html.H3("Fire Dashboard"),
+        centerComponent(years, data_types),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='dashboard_daily', figure=initial_figures[0]), width=12),
+        ]),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='dashboard_monthly', figure=initial_figures[1]), width=6),
+            dbc.Col(dcc.Graph(id='dashboard_regions', figure=initial_figures[2]), width=6),
+        ]),
+        dcc.Graph(id='dashboard_grid', figure=initial_figures[3])
+    ],
+    fluid=True
+)
+
+
+@instrument_callback('sub_page3e.update_dashboard')
+def update_dashboard(year, data_type):
+    if year not in year_slices or data_type not in DATA_TYPES:
+        raise PreventUpdate
+    year_slice, values = year_slices[year], year_slices[year][data_type]
+    title = DATA_TYPES[data_type][2]
+
+    daily, monthly, regions, grid = Patch(), Patch(), Patch(), Patch()
+    daily['data'][0]['x'] = year_slice['days']
+    daily['data'][0]['y'] = values['daily']
+    daily['layout']['title']['text'] = f'Daily {data_type} ({year})'
+    daily['layout']['yaxis']['title']['text'] = title
+
+    monthly['data'][0]['y'] = values['monthly']
+    monthly['layout']['title']['text'] = f'Monthly {data_type} ({year})'
+    monthly['layout']['yaxis']['title']['text'] = title
+
+    regions['data'][0]['x'] = year_slice['regions']
+    regions['data'][0]['y'] = values['regions']
+    regions['layout']['title']['text'] = f'{data_type} by Region ({year})'
+    regions['layout']['yaxis']['title']['text'] = title
+
+    grid['data'][0]['z'] = values['grid']
+    grid['data'][0]['colorbar']['title']['text'] = title
+    grid['layout']['title']['text'] = f'{data_type} per {DASHBOARD_CELL_DEGREES}° Cell ({year})'
+    return daily, monthly, regions, grid
+
+
+# Register the callbacks
+def register_callbacks(app):
+    app.callback(
+        [Output('dashboard_daily', 'figure'), Output('dashboard_monthly', 'figure'),
+         Output('dashboard_regions', 'figure'), Output('dashboard_grid', 'figure')],
+        [Input('shared-year-dropdown', 'value'), Input('shared-data-type-dropdown', 'value')],
+        prevent_initial_call=True
+    )(update_dashboard)
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = layout
+register_callbacks(app)
@@ -0,0 +1,113 @@
+import dash
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+import numpy as np
+from utils.metrics import instrument_callback
+from utils.fire_data import load_fire_data, load_date_index
+from utils.fire_events import FIRE_EVENT_CELL_DEGREES, FIRE_EVENT_GAP_DAYS, load_fire_events
+
+# Load the fire archive and group its detections into events once
+df = load_fire_data()
+date_index = load_date_index()
+fire_events = load_fire_events()
+
+min_date = df['ACQ_DATE'].min().date()
+max_date = df['ACQ_DATE'].max().date()
+TOP_EVENTS = 20
+
+layout = dbc.Container(
+    [
+        dbc.Row([
+            dbc.Col(
+                dbc.Button("Back to Main Page", href="/page3", color="primary", className="mb-4"),
+                width=12
+            )
+        ]),
+        html.H3("Fire Events"),
+        html.P(f"Detections in neighbouring {FIRE_EVENT_CELL_DEGREES}° cells at most {FIRE_EVENT_GAP_DAYS} day(s) "
+               f"apart are grouped into one event; burned area is approximated by the area of the cells an event "
+               f"touched."),
+        dcc.DatePickerRange(
+            id='events-date-range',
+            min_date_allowed=min_date,
+            max_date_allowed=max_date,
+            start_date=min_date,
+            end_date=max_date,
+            className="mb-2"
+        ),
+        html.Div(id='events_summary', className="mb-2"),
+        dcc.Graph(id='events_per_month'),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='events_duration'), width=6),
+            dbc.Col(dcc.Graph(id='events_area'), width=6),
+        ]),
+        dcc.Graph(id='events_largest')
+    ],
+    fluid=True
+)
+
+
+@instrument_callback('sub_page3f.update_fire_events')
+def update_fire_events(start_date, end_date):
+    events = fire_events.between(start_date, end_date)
+    period = f"{start_date or min_date} to {end_date or max_date}"
+    detections = date_index.count(start_date, end_date)
+    summary = (f"{len(events):,} events from {detections:,} detections ({period}); "
+               f"median duration {events['duration_days'].median() if len(events) else 0:.0f} day(s), "
+               f"total burned-area proxy {events['area_km2'].sum():,.0f} km²")
+
+    # Events next to raw detections, which is what the other pages count as fires
+    months = events['start'].values.astype('datetime64[M]')
+    month_values, event_counts = np.unique(months, return_counts=True)
+    detection_months = df['ACQ_DATE'].values[date_index.rows(start_date, end_date)].astype('datetime64[M]')
+    detection_values, detection_counts = np.unique(detection_months, return_counts=True)
+    fig1 = go.Figure([
+        go.Scatter(x=month_values.astype('datetime64[D]').astype(str), y=event_counts, mode='lines', name='Events'),
+        go.Scatter(x=detection_values.astype('datetime64[D]').astype(str), y=detection_counts, mode='lines',
+                   name='Detections'),
+    ])
+    fig1.update_layout(title=f'Fire Events and Detections per Month ({period})', xaxis_title='Month',
+                       yaxis_title='Count')
+
+    durations, duration_counts = np.unique(events['duration_days'].values, return_counts=True)
+    fig2 = go.Figure(go.Bar(x=durations, y=duration_counts))
+    fig2.update_layout(title='Event Duration', xaxis_title='Duration (days)', yaxis_title='Number of Events',
+                       yaxis_type='log')
+
+    # Log-spaced bins: most events are a single cell, a few cover hundreds of km²
+    areas = events['area_km2'].values
+    edges = np.logspace(np.log10(max(areas.min(), 1e-3)), np.log10(areas.max()) + 0.01, 30) if len(areas) \
+        else np.array([1.0, 10.0])
+    area_counts, _ = np.histogram(areas, bins=edges)
+    fig3 = go.Figure(go.Bar(x=np.sqrt(edges[:-1] * edges[1:]), y=area_counts))
+    fig3.update_layout(title='Burned-Area Proxy per Event', xaxis_title='Area (km²)', yaxis_title='Number of Events',
+                       xaxis_type='log', yaxis_type='log')
+
+    largest = events.nlargest(TOP_EVENTS, 'area_km2')
+    fig4 = go.Figure(go.Scatter(
+        x=largest['start'].dt.strftime('%Y-%m-%d'), y=largest['area_km2'], mode='markers',
+        marker={'size': np.clip(largest['duration_days'] * 3, 6, 40), 'color': largest['frp_total'],
+                'colorscale': 'YlOrRd', 'showscale': True, 'colorbar': {'title': 'Total FRP (MW)'}},
+        text=[f"{lat:.2f}, {lon:.2f}: {days} day(s), {count:,} detections" for lat, lon, days, count in
+              zip(largest['latitude'], largest['longitude'], largest['duration_days'], largest['detections'])]
+    ))
+    fig4.update_layout(title=f'{TOP_EVENTS} Largest Events ({period})', xaxis_title='Start Date',
+                       yaxis_title='Area (km²)')
+
+    return summary, fig1, fig2, fig3, fig4
+
+
+# Register the callbacks
+def register_callbacks(app):
+    app.callback(
+        [Output('events_summary', 'children'), Output('events_per_month', 'figure'),
+         Output('events_duration', 'figure'), Output('events_area', 'figure'), Output('events_largest', 'figure')],
+        [Input('events-date-range', 'start_date'), Input('events-date-range', 'end_date')]
+    )(update_fire_events)
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = layout
+register_callbacks(app)
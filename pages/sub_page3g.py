@@ -0,0 +1,143 @@
+import calendar
+
+import dash
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+import plotly.graph_objects as go
+import numpy as np
+import pandas as pd
+from utils.metrics import instrument_callback
+from utils.fire_data import load_fire_data
+from utils.quantile_sketch import SKETCH_RELATIVE_ACCURACY, load_distribution_sketches
+
+# Load the fire archive and sketch its brightness/FRP distributions per day and region once
+df = load_fire_data()
+sketches = load_distribution_sketches()
+
+years = sorted(df['Year'].unique())
+PERCENTILES = [0.1, 0.5, 0.9, 0.99]
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+COLUMNS = {'BRIGHTNESS': 'Brightness (K)', 'FRP': 'FRP (MW)'}
+
+layout = dbc.Container(
+    [
+        dbc.Row([
+            dbc.Col(
+                dbc.Button("Back to Main Page", href="/page3", color="primary", className="mb-4"),
+                width=12
+            )
+        ]),
+        html.H3("Brightness and FRP Distributions"),
+        html.P(f"Percentiles are merged from per-day, per-region sketches and are within "
+               f"{SKETCH_RELATIVE_ACCURACY:.0%} of the exact value."),
+        dbc.Row([
+            dbc.Col(dcc.Dropdown(
+                id='distribution-year-dropdown',
+                options=[{'label': 'All Years', 'value': 'all'}] +
+                        [{'label': str(year), 'value': int(year)} for year in years],
+                value='all',
+                clearable=False
+            ), width=3),
+            dbc.Col(dcc.Dropdown(
+                id='distribution-month-dropdown',
+                options=[{'label': 'All Months', 'value': 'all'}] +
+                        [{'label': name, 'value': month} for month, name in enumerate(MONTHS, start=1)],
+                value='all',
+                clearable=False
+            ), width=3),
+            dbc.Col(dcc.Dropdown(
+                id='distribution-region-dropdown',
+                options=[{'label': region, 'value': region} for region in sketches.region_names],
+                multi=True,
+                placeholder="All regions"
+            ), width=6),
+        ], className="mb-2"),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='brightness_histogram'), width=6),
+            dbc.Col(dcc.Graph(id='frp_histogram'), width=6),
+        ]),
+        dbc.Row([
+            dbc.Col(dcc.Graph(id='brightness_percentiles'), width=6),
+            dbc.Col(dcc.Graph(id='frp_percentiles'), width=6),
+        ])
+    ],
+    fluid=True
+)
+
+
+def month_range(year, month):
+    return f'{year}-{month:02d}-01', f'{year}-{month:02d}-{calendar.monthrange(year, month)[1]}'
+
+
+def selection_histogram(column, year, month, regions):
+    # Bucket counts for the year/month selection; a month with All Years merges that month of every year
+    if year == 'all':
+        if month == 'all':
+            return sketches.histogram(column, None, None, regions)
+        return sketches.month_histogram(column, month, regions)
+    if month == 'all':
+        return sketches.histogram(column, f'{year}-01-01', f'{year}-12-31', regions)
+    return sketches.histogram(column, *month_range(year, month), regions)
+
+
+def periods(year, month):
+    # Sub-periods for the percentile trend: years (or one month of each year), months of a year, or days of a month
+    if year == 'all':
+        if month != 'all':
+            return [(str(y), *month_range(int(y), month)) for y in years]
+        return [(str(y), f'{y}-01-01', f'{y}-12-31') for y in years]
+    if month == 'all':
+        return [(MONTHS[m - 1], *month_range(year, m)) for m in range(1, 13)]
+    days = pd.date_range(f'{year}-{month:02d}-01', periods=calendar.monthrange(year, month)[1]).strftime('%Y-%m-%d')
+    return [(day, day, day) for day in days]
+
+
+def histogram_figure(column, year, month, regions, label):
+    counts = selection_histogram(column, year, month, regions)
+    buckets = sketches.buckets[column]
+    used = np.nonzero(counts)[0]
+    fig = go.Figure(go.Bar(x=buckets.value(used), y=counts[used]))
+    fig.update_layout(title=f'{COLUMNS[column]} Distribution ({label})', xaxis_title=COLUMNS[column],
+                      yaxis_title='Number of Detections', bargap=0, xaxis_type='log' if column == 'FRP' else 'linear')
+    return fig
+
+
+def percentile_figure(column, year, month, regions, label):
+    names = [name for name, _, _ in periods(year, month)]
+    values = np.array([sketches.quantiles(column, PERCENTILES, start_date, end_date, regions)
+                       for _, start_date, end_date in periods(year, month)])
+    fig = go.Figure([go.Scatter(x=names, y=values[:, i], mode='lines+markers', name=f'p{q * 100:g}')
+                     for i, q in enumerate(PERCENTILES)])
+    fig.update_layout(title=f'{COLUMNS[column]} Percentiles ({label})', yaxis_title=COLUMNS[column],
+                      yaxis_type='log' if column == 'FRP' else 'linear')
+    return fig
+
+
+@instrument_callback('sub_page3g.update_distributions')
+def update_distributions(year, month, regions):
+    if year == 'all':
+        label = 'All Years' if month == 'all' else f'{MONTHS[month - 1]}, All Years'
+    else:
+        label = str(year) if month == 'all' else f'{MONTHS[month - 1]} {year}'
+    if regions:
+        label += f", {', '.join(regions)}"
+    return (histogram_figure('BRIGHTNESS', year, month, regions, label),
+            histogram_figure('FRP', year, month, regions, label),
+            percentile_figure('BRIGHTNESS', year, month, regions, label),
+            percentile_figure('FRP', year, month, regions, label))
+
+
+# Register the callbacks
+def register_callbacks(app):
+    app.callback(
+        [Output('brightness_histogram', 'figure'), Output('frp_histogram', 'figure'),
+         Output('brightness_percentiles', 'figure'), Output('frp_percentiles', 'figure')],
+        [Input('distribution-year-dropdown', 'value'), Input('distribution-month-dropdown', 'value'),
+         Input('distribution-region-dropdown', 'value')]
+    )(update_distributions)
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = layout
+register_callbacks(app)
@@ -0,0 +1,109 @@
+import dash
+from dash import dcc, html, Input, Output
+from dash.exceptions import PreventUpdate
+import dash_bootstrap_components as dbc
+import pandas as pd
+import plotly.graph_objects as go
+from layouts.sidebar import getSideBarComponent
+from utils.metrics import instrument_callback
+from utils.gridded_data import GRIDDED_DATASETS, cached_aggregate, load_gridded_dataset
+from utils.regions import DEFAULT_REGIONS
+
+# Sidebar paths for each gridded analysis type
+WEATHER_PAGES = {'/solar': 'solar', '/wind': 'wind', '/uv': 'uv', '/prep': 'prep', '/wth': 'wth'}
+AREAS = {'All': None}
+AREAS.update({name: (south, west, north, east) for name, south, west, north, east in DEFAULT_REGIONS})
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def create_layout(name):
+    config = GRIDDED_DATASETS[name]
+    dataset = load_gridded_dataset(name)
+    if dataset is None:
+        content = dbc.Alert(f"No gridded {config['title'].lower()} data found. Add {name}.nc, {name}.zarr or a "
+                            f"{name}/ directory of NetCDF files to the gridded data directory.", color="warning")
+    else:
+        content = html.Div([
+            dcc.DatePickerRange(
+                id=f'{name}-date-range',
+                min_date_allowed=dataset.start.date(),
+                max_date_allowed=dataset.end.date(),
+                start_date=max(dataset.start, dataset.end - pd.DateOffset(years=1)).date(),
+                end_date=dataset.end.date(),
+                className="mb-2"
+            ),
+            dcc.Dropdown(
+                id=f'{name}-area-dropdown',
+                options=[{'label': area, 'value': area} for area in AREAS],
+                value='All',
+                clearable=False,
+                className="mb-2"
+            ),
+            dcc.RadioItems(
+                id=f'{name}-frequency',
+                options=[{'label': 'Daily', 'value': 'D'}, {'label': 'Monthly', 'value': 'MS'}],
+                value='D',
+                inline=True,
+                inputStyle={"margin-right": "5px", "margin-left": "10px"}
+            ),
+            dcc.Graph(id=f'{name}-time-series'),
+            dcc.Graph(id=f'{name}-mean-map', style={"height": "600px"}),
+            dcc.Graph(id=f'{name}-climatology')
+        ])
+
+    return html.Div([
+        getSideBarComponent(),
+        html.Div([html.H3(config['title']), content], style={"margin-left": "22%", "padding": "20px"})
+    ])
+
+
+def update_weather_figures(name, start_date, end_date, area, freq):
+    config = GRIDDED_DATASETS[name]
+    dataset = load_gridded_dataset(name)
+    if dataset is None:
+        # Data removed since the page was rendered
+        raise PreventUpdate
+    bbox = AREAS.get(area)
+    units = config['units']
+
+    series = cached_aggregate(dataset, 'time_series', start_date, end_date, bbox, freq)
+    series_fig = go.Figure(go.Scatter(x=series.index, y=series.values, mode='lines'))
+    series_fig.update_layout(title=f"{config['title']} ({area}, area mean)", xaxis_title='Date',
+                             yaxis_title=f"{config['title']} ({units})")
+
+    mean = cached_aggregate(dataset, 'time_mean_map', start_date, end_date, bbox)
+    map_fig = go.Figure(go.Heatmap(z=mean.values, x=mean['lon'].values, y=mean['lat'].values, colorscale='Viridis',
+                                   colorbar={'title': units}))
+    map_fig.update_layout(title=f"Mean {config['title']} ({start_date} to {end_date})", xaxis_title='Longitude',
+                          yaxis_title='Latitude', yaxis_scaleanchor='x')
+
+    climatology = cached_aggregate(dataset, 'climatology', bbox)
+    climatology_fig = go.Figure(go.Bar(x=[MONTHS[month - 1] for month in climatology.index], y=climatology.values))
+    climatology_fig.update_layout(title=f"Monthly Climatology of {config['title']} ({area})", xaxis_title='Month',
+                                  yaxis_title=f"{config['title']} ({units})")
+    return series_fig, map_fig, climatology_fig
+
+
+def page_layout(pathname):
+    # Built per request, so data added (or updated) after startup shows up without a restart
+    return create_layout(WEATHER_PAGES[pathname])
+
+
+# Register the callbacks; every analysis type gets its callback whether or not its data exists yet
+def register_callbacks(app):
+    for name in WEATHER_PAGES.values():
+        def update(start_date, end_date, area, freq, name=name):
+            return update_weather_figures(name, start_date, end_date, area, freq)
+
+        app.callback(
+            [Output(f'{name}-time-series', 'figure'), Output(f'{name}-mean-map', 'figure'),
+             Output(f'{name}-climatology', 'figure')],
+            [Input(f'{name}-date-range', 'start_date'), Input(f'{name}-date-range', 'end_date'),
+             Input(f'{name}-area-dropdown', 'value'), Input(f'{name}-frequency', 'value')]
+        )(instrument_callback(f'weather.update_{name}')(update))
+
+
+# Define the app
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+app.layout = html.Div([dcc.Location(id='url', refresh=False), html.Div(id='page-content')])
+register_callbacks(app)
@@ -0,0 +1,200 @@
+import bisect
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+# Geocoded addresses persist in SQLite; a bulk CSV (address, lat, lon) seeds the index if present
+ADDRESS_INDEX_PATH = os.environ.get('ADDRESS_INDEX_PATH', 'cache/addresses.sqlite')
+ADDRESS_BULK_PATH = os.environ.get('ADDRESS_BULK_PATH', 'data/addresses.csv')
+ADDRESS_SUGGESTIONS = 8
+ADDRESS_MIN_PREFIX = 3
+# Typing pause (seconds) before an address input asks for suggestions
+ADDRESS_DEBOUNCE_SECONDS = 0.3
+# Suggestions match the start of any of an address's first few words ("main st" finds "12 Main St")
+ADDRESS_WORD_STARTS = 4
+# Most prefix matches ranked per lookup; bounds the work for short, common prefixes
+ADDRESS_SCAN_LIMIT = 500
+# Prefixes the provider had nothing for are not re-sent (nor any longer prefix) for this many seconds; the
+# most recent misses are kept, so new addresses appear at the provider without a restart
+ADDRESS_MISS_TTL = float(os.environ.get('ADDRESS_MISS_TTL', 600))
+ADDRESS_MISS_MAX = int(os.environ.get('ADDRESS_MISS_MAX', 1000))
+
+
+def normalize_address(text):
+    return ' '.join(re.sub(r'[^\w\s]', ' ', str(text).lower()).split())
+
+
+class AddressIndex:
+    # Sorted array of normalized keys (each address under every word start) searched with bisect: a prefix's
+    # matches are one contiguous run, so a suggestion costs two binary searches plus ranking the run by use
+
+    def __init__(self, path=ADDRESS_INDEX_PATH, bulk_path=ADDRESS_BULK_PATH):
+        self.path = path
+        self.bulk_path = bulk_path
+        self.addresses = []
+        self.coords = []
+        self.uses = []
+        self.ids = {}        # normalized address -> position in addresses
+        self.keys = []       # sorted word-start keys
+        self.key_ids = []    # address position of each key
+        self.missed = OrderedDict()  # prefix the provider had nothing for -> time of the miss, oldest first
+        self._lock = threading.Lock()
+        self._db = None
+        self._loaded = False
+
+    def _connection(self):
+        if self._db is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS addresses (key TEXT PRIMARY KEY, address TEXT NOT NULL, lat REAL NOT NULL, "
+                "lon REAL NOT NULL, uses INTEGER NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    @staticmethod
+    def _word_starts(key):
+        words = key.split(' ')
+        return [' '.join(words[i:]) for i in range(min(len(words), ADDRESS_WORD_STARTS))]
+
+    def _load(self):
+        # Bulk file and stored addresses, sorted once; later additions are inserted in place
+        if self._loaded:
+            return
+        start_time = time.time()
+        rows = []
+        if self.bulk_path and os.path.exists(self.bulk_path):
+            bulk = pd.read_csv(self.bulk_path).rename(columns=str.lower)
+            bulk = bulk.rename(columns={'latitude': 'lat', 'longitude': 'lon'})
+            rows.extend(zip(bulk['address'], bulk['lat'], bulk['lon'], [0] * len(bulk)))
+        db = self._connection()
+        if db is not None:
+            rows.extend(db.execute("SELECT address, lat, lon, uses FROM addresses"))
+        pairs = []
+        for address, lat, lon, uses in rows:
+            key = normalize_address(address)
+            if not key:
+                continue
+            if key in self.ids:
+                self.uses[self.ids[key]] += uses
+                continue
+            self.ids[key] = len(self.addresses)
+            self.addresses.append(address)
+            self.coords.append((float(lat), float(lon)))
+            self.uses.append(uses)
+            pairs.extend((word_start, self.ids[key]) for word_start in self._word_starts(key))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.key_ids = [i for _, i in pairs]
+        self._loaded = True
+        print(f"Time taken to build address index ({len(self.addresses)} addresses): {time.time() - start_time} seconds")
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self.addresses)
+
+    def add(self, address, lat, lon):
+        key = normalize_address(address)
+        if not key or lat is None or lon is None:
+            return
+        with self._lock:
+            self._load()
+            i = self.ids.get(key)
+            if i is None:
+                i = self.ids[key] = len(self.addresses)
+                self.addresses.append(address)
+                self.coords.append((float(lat), float(lon)))
+                self.uses.append(1)
+                for word_start in self._word_starts(key):
+                    position = bisect.bisect_left(self.keys, word_start)
+                    self.keys.insert(position, word_start)
+                    self.key_ids.insert(position, i)
+            else:
+                self.coords[i] = (float(lat), float(lon))
+                self.uses[i] += 1
+            self._store(key, i)
+
+    def _store(self, key, i):
+        db = self._connection()
+        if db is not None:
+            db.execute("INSERT OR REPLACE INTO addresses (key, address, lat, lon, uses) VALUES (?, ?, ?, ?, ?)",
+                       (key, self.addresses[i], *self.coords[i], self.uses[i]))
+            db.commit()
+
+    def lookup(self, address):
+        # (lat, lon) of a known address, counting the use, else None
+        key = normalize_address(address)
+        with self._lock:
+            self._load()
+            i = self.ids.get(key)
+            if i is None:
+                return None
+            self.uses[i] += 1
+            self._store(key, i)
+            return self.coords[i]
+
+    def suggest(self, text, limit=ADDRESS_SUGGESTIONS):
+        prefix = normalize_address(text or '')
+        if len(prefix) < ADDRESS_MIN_PREFIX:
+            return []
+        with self._lock:
+            self._load()
+            start = bisect.bisect_left(self.keys, prefix)
+            end = bisect.bisect_left(self.keys, prefix + '\uffff', start,
+                                     min(len(self.keys), start + ADDRESS_SCAN_LIMIT))
+            matches = dict.fromkeys(self.key_ids[start:end])
+            ranked = sorted(matches, key=lambda i: (-self.uses[i], len(self.addresses[i])))
+            return [self.addresses[i] for i in ranked[:limit]]
+
+    def _recently_missed(self, prefix):
+        # Whether prefix, or a shorter prefix of it, came back empty within the TTL
+        now = time.time()
+        with self._lock:
+            for end in range(ADDRESS_MIN_PREFIX, len(prefix) + 1):
+                missed_at = self.missed.get(prefix[:end])
+                if missed_at is None:
+                    continue
+                if now - missed_at < ADDRESS_MISS_TTL:
+                    return True
+                del self.missed[prefix[:end]]
+        return False
+
+    def _miss(self, prefix):
+        with self._lock:
+            self.missed[prefix] = time.time()
+            self.missed.move_to_end(prefix)
+            while len(self.missed) > ADDRESS_MISS_MAX:
+                self.missed.popitem(last=False)
+
+    def suggest_or_fetch(self, text, provider, limit=ADDRESS_SUGGESTIONS):
+        # Local suggestions, or on a miss provider(text) -> [(address, lat, lon)]; results with coordinates are
+        # kept so the next keystrokes and the geocode on submit are answered locally
+        suggestions = self.suggest(text, limit)
+        prefix = normalize_address(text or '')
+        if suggestions or len(prefix) < ADDRESS_MIN_PREFIX:
+            return suggestions
+        if self._recently_missed(prefix):
+            return []
+        try:
+            results = provider(text)
+        except Exception as e:
+            print(f"Address suggestion request failed: {e}")
+            return []
+        if not results:
+            self._miss(prefix)
+        for address, lat, lon in results:
+            self.add(address, lat, lon)
+        return list(dict.fromkeys(address for address, _, _ in results))[:limit]
+
+
+# Shared index used by the routing pages
+address_index = AddressIndex()
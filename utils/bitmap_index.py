@@ -0,0 +1,254 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_data import load_date_index, load_fire_data
+
+# Rows per container and the cardinality above which a container is a bitmap rather than a sorted array
+# (4096 two-byte offsets = one 8 KB bitmap), as in Roaring
+BITMAP_CHUNK_ROWS = 1 << 16
+BITMAP_ARRAY_LIMIT = 4096
+FIRE_ATTRIBUTE_COLUMNS = ['CONFIDENCE', 'SATELLITE', 'DAYNIGHT', 'INSTRUMENT', 'TYPE']
+# MODIS confidence is 0-100; VIIRS low/nominal/high is stored as 0/30/80 (see fire_storage.VIIRS_CONFIDENCE)
+CONFIDENCE_BINS = [('low', 0, 30), ('nominal', 30, 80), ('high', 80, 101)]
+TYPE_LABELS = {0: 'Vegetation fire', 1: 'Active volcano', 2: 'Other static land source', 3: 'Offshore'}
+DAYNIGHT_LABELS = {'D': 'Day', 'N': 'Night'}
+
+fire_attribute_index = None
+
+# A chunk in which every row is set
+FULL = 'full'
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def _from_bits(bits, count):
+    # Container for one chunk's boolean mask with count rows set
+    if count == len(bits):
+        return FULL
+    if count < BITMAP_ARRAY_LIMIT:
+        return np.flatnonzero(bits).astype(np.uint16)
+    padded = np.zeros(BITMAP_CHUNK_ROWS, dtype=bool)
+    padded[:len(bits)] = bits
+    return np.packbits(padded)
+
+
+def _to_bitmap(container, length):
+    if isinstance(container, np.ndarray) and container.dtype == np.uint8:
+        return container
+    bits = np.zeros(BITMAP_CHUNK_ROWS, dtype=bool)
+    if container is FULL:
+        bits[:length] = True
+    else:
+        bits[container] = True
+    return np.packbits(bits)
+
+
+def _shrink(bitmap, length):
+    # A bitmap container back to the cheapest form for its cardinality (None when empty)
+    count = int(_POPCOUNT[bitmap].sum())
+    if not count:
+        return None
+    if count == length:
+        return FULL
+    if count < BITMAP_ARRAY_LIMIT:
+        return np.flatnonzero(np.unpackbits(bitmap)).astype(np.uint16)
+    return bitmap
+
+
+def _and(a, b, length):
+    if a is FULL:
+        return b
+    if b is FULL:
+        return a
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        result = np.intersect1d(a, b, assume_unique=True)
+        return result if len(result) else None
+    if a.dtype == np.uint16 or b.dtype == np.uint16:
+        offsets, bitmap = (a, b) if a.dtype == np.uint16 else (b, a)
+        result = offsets[(bitmap[offsets >> 3] >> (7 - (offsets & 7))) & 1 == 1]
+        return result if len(result) else None
+    return _shrink(a & b, length)
+
+
+def _or(a, b, length):
+    if a is FULL or b is FULL:
+        return FULL
+    if a.dtype == np.uint16 and b.dtype == np.uint16:
+        result = np.union1d(a, b)
+        if len(result) < BITMAP_ARRAY_LIMIT:
+            return result
+    return _shrink(_to_bitmap(a, length) | _to_bitmap(b, length), length)
+
+
+class Bitmap:
+    # Compressed row set: one container per BITMAP_CHUNK_ROWS rows, either FULL, a sorted uint16 offset array
+    # (sparse) or an 8 KB bitmap (dense); empty chunks have no container. AND/OR work container by container,
+    # so a narrow operand (e.g. a date range) limits the work to the chunks it covers.
+
+    def __init__(self, n_rows, containers=None):
+        self.n_rows = n_rows
+        self.containers = containers if containers is not None else {}
+
+    def _length(self, chunk):
+        return min(BITMAP_CHUNK_ROWS, self.n_rows - chunk * BITMAP_CHUNK_ROWS)
+
+    @classmethod
+    def from_mask(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        containers = {}
+        for chunk, start in enumerate(range(0, len(mask), BITMAP_CHUNK_ROWS)):
+            bits = mask[start:start + BITMAP_CHUNK_ROWS]
+            count = int(np.count_nonzero(bits))
+            if count:
+                containers[chunk] = _from_bits(bits, count)
+        return cls(len(mask), containers)
+
+    @classmethod
+    def from_range(cls, start, stop, n_rows):
+        bitmap = cls(n_rows)
+        for chunk in range(start // BITMAP_CHUNK_ROWS, (stop - 1) // BITMAP_CHUNK_ROWS + 1 if stop > start else 0):
+            base = chunk * BITMAP_CHUNK_ROWS
+            first, last = max(start - base, 0), min(stop - base, bitmap._length(chunk))
+            if first == 0 and last == bitmap._length(chunk):
+                bitmap.containers[chunk] = FULL
+            else:
+                bits = np.zeros(bitmap._length(chunk), dtype=bool)
+                bits[first:last] = True
+                bitmap.containers[chunk] = _from_bits(bits, last - first)
+        return bitmap
+
+    @classmethod
+    def from_positions(cls, positions, n_rows):
+        positions = np.sort(np.asarray(positions, dtype=np.int64))
+        bitmap = cls(n_rows)
+        chunks = positions // BITMAP_CHUNK_ROWS
+        bounds = np.flatnonzero(np.diff(chunks)) + 1
+        for part in np.split(positions, bounds) if len(positions) else []:
+            chunk = int(part[0] // BITMAP_CHUNK_ROWS)
+            bits = np.zeros(bitmap._length(chunk), dtype=bool)
+            bits[part - chunk * BITMAP_CHUNK_ROWS] = True
+            bitmap.containers[chunk] = _from_bits(bits, len(part))
+        return bitmap
+
+    def __and__(self, other):
+        containers = {}
+        for chunk in sorted(self.containers.keys() & other.containers.keys()):
+            container = _and(self.containers[chunk], other.containers[chunk], self._length(chunk))
+            if container is not None:
+                containers[chunk] = container
+        return Bitmap(self.n_rows, containers)
+
+    def __or__(self, other):
+        containers = {}
+        for chunk in sorted(self.containers.keys() | other.containers.keys()):
+            a, b = self.containers.get(chunk), other.containers.get(chunk)
+            containers[chunk] = a if b is None else b if a is None else _or(a, b, self._length(chunk))
+        return Bitmap(self.n_rows, containers)
+
+    def __len__(self):
+        total = 0
+        for chunk, container in self.containers.items():
+            if container is FULL:
+                total += self._length(chunk)
+            elif container.dtype == np.uint16:
+                total += len(container)
+            else:
+                total += int(_POPCOUNT[container].sum())
+        return total
+
+    def positions(self):
+        # Sorted row positions (int64)
+        parts = []
+        for chunk in sorted(self.containers):
+            base = chunk * BITMAP_CHUNK_ROWS
+            container = self.containers[chunk]
+            if container is FULL:
+                parts.append(np.arange(base, base + self._length(chunk)))
+            elif container.dtype == np.uint16:
+                parts.append(container.astype(np.int64) + base)
+            else:
+                parts.append(np.flatnonzero(np.unpackbits(container)) + base)
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return sum(container.nbytes for container in self.containers.values() if container is not FULL)
+
+
+def attribute_masks(df, column):
+    # (value, boolean mask) per indexed value of a column; CONFIDENCE is binned
+    if column == 'CONFIDENCE':
+        confidence = df['CONFIDENCE'].values
+        return [(label, (confidence >= low) & (confidence < high)) for label, low, high in CONFIDENCE_BINS]
+    codes, uniques = pd.factorize(df[column], sort=True)
+    return [(value.item() if hasattr(value, 'item') else value, codes == code) for code, value in enumerate(uniques)]
+
+
+def attribute_mask(df, filters):
+    # The same filters as FireAttributeIndex.select as a plain boolean mask, for frames without an index
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in (filters or {}).items():
+        if values:
+            selected = dict(attribute_masks(df, column))
+            mask &= np.logical_or.reduce([selected[value] for value in values if value in selected] +
+                                         [np.zeros(len(df), dtype=bool)])
+    return mask
+
+
+class FireAttributeIndex:
+    # Bitmap per value of each categorical FIRMS attribute; a filter is the OR of the chosen values within an
+    # attribute and the AND across attributes and with the date range, so no request scans the columns
+
+    def __init__(self, df, date_index=None, columns=FIRE_ATTRIBUTE_COLUMNS):
+        self.n_rows = len(df)
+        self.date_index = date_index
+        self.bitmaps = {column: {value: Bitmap.from_mask(mask) for value, mask in attribute_masks(df, column)}
+                        for column in columns if column in df}
+
+    def options(self, column):
+        # (value, number of detections) for every indexed value of the column
+        return [(value, len(bitmap)) for value, bitmap in self.bitmaps.get(column, {}).items()]
+
+    def _date_rows(self, start_date, end_date):
+        rows = self.date_index.rows(start_date, end_date)
+        if isinstance(rows, slice):
+            return Bitmap.from_range(rows.start, rows.stop, self.n_rows)
+        return Bitmap.from_positions(rows, self.n_rows)
+
+    def select(self, filters=None, start_date=None, end_date=None):
+        # Bitmap of the rows matching every filter ({column: [values]}, empty lists ignored) and the date range
+        if (start_date is not None or end_date is not None) and self.date_index is not None:
+            result = self._date_rows(start_date, end_date)
+        else:
+            result = Bitmap.from_range(0, self.n_rows, self.n_rows)
+        for column, values in (filters or {}).items():
+            if not values:
+                continue
+            chosen = Bitmap(self.n_rows)
+            for value in values:
+                bitmap = self.bitmaps[column].get(value)
+                if bitmap is not None:
+                    chosen = chosen | bitmap
+            result = result & chosen
+        return result
+
+    def rows(self, filters=None, start_date=None, end_date=None):
+        return self.select(filters, start_date, end_date).positions()
+
+    def count(self, filters=None, start_date=None, end_date=None):
+        return len(self.select(filters, start_date, end_date))
+
+    @property
+    def nbytes(self):
+        return sum(bitmap.nbytes for values in self.bitmaps.values() for bitmap in values.values())
+
+
+def load_fire_attribute_index():
+    global fire_attribute_index
+    if fire_attribute_index is None:
+        start_time = time.time()
+        fire_attribute_index = FireAttributeIndex(load_fire_data(), load_date_index())
+        print(f"Time taken to build attribute bitmaps ({fire_attribute_index.nbytes / 1e6:.1f} MB): "
+              f"{time.time() - start_time} seconds")
+    return fire_attribute_index
@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_data import load_fire_data
+from utils.regions import assign_regions, load_region_index
+
+# A day's baseline pools the same calendar days +/- FIRE_ANOMALY_WINDOW_DAYS of earlier years, weighted so a
+# year's influence halves every FIRE_ANOMALY_HALF_LIFE_YEARS; |z| >= FIRE_ANOMALY_Z on log counts is flagged
+FIRE_ANOMALY_WINDOW_DAYS = int(os.environ.get('FIRE_ANOMALY_WINDOW_DAYS', 7))
+FIRE_ANOMALY_HALF_LIFE_YEARS = float(os.environ.get('FIRE_ANOMALY_HALF_LIFE_YEARS', 5))
+FIRE_ANOMALY_Z = float(os.environ.get('FIRE_ANOMALY_Z', 3.0))
+# Years of history a baseline needs before it flags anything
+FIRE_ANOMALY_MIN_YEARS = 2
+# Floor on the baseline spread (log1p units), so near-constant quiet periods do not flag single detections
+FIRE_ANOMALY_MIN_STD = 0.25
+# Live detections close a day once a detection this many days later has arrived
+FIRE_ANOMALY_CLOSE_LAG_DAYS = 1
+# Longest run of days without any detection still counted as quiet (zero) days; longer runs, such as the months
+# between the end of the archive and the first live batch, are missing data and leave the baselines untouched
+FIRE_ANOMALY_MAX_GAP_DAYS = int(os.environ.get('FIRE_ANOMALY_MAX_GAP_DAYS', 3))
+ALL_REGIONS = 'All regions'
+
+fire_anomalies = None
+
+
+class FireAnomalies:
+    # Running mean and variance of log1p(daily count) per (day of year, region), updated one closed day at a time
+    # (Welford's update, switching to an exponentially weighted one after the half-life). Each day is scored
+    # against the baselines as they stood before it, so the results never need the archive again.
+
+    def __init__(self, region_names, first_day, window=FIRE_ANOMALY_WINDOW_DAYS,
+                 half_life_years=FIRE_ANOMALY_HALF_LIFE_YEARS, threshold=FIRE_ANOMALY_Z):
+        self.region_names = list(region_names) + [ALL_REGIONS]
+        self.first_day = np.datetime64(first_day, 'D')
+        self.next_day = 0
+        self.threshold = threshold
+        self.offsets = np.arange(-window, window + 1)
+        self.min_weight = FIRE_ANOMALY_MIN_YEARS * len(self.offsets)
+        self.decay = 1 - 0.5 ** (1 / (half_life_years * len(self.offsets)))
+        shape = (366, len(self.region_names))
+        self.weight = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.variance = np.zeros(shape)
+        self.pending = {}
+        self._days = []
+        self._lock = threading.Lock()
+        self._arrays = None
+
+    @classmethod
+    def from_frame(cls, df, codes, region_names, **kwargs):
+        dates = df['ACQ_DATE'].values.astype('datetime64[D]')
+        anomalies = cls(region_names, dates.min(), **kwargs)
+        anomalies.add(dates, codes)
+        anomalies.close(int((dates.max() - anomalies.first_day).astype(np.int64)))
+        return anomalies
+
+    def add(self, dates, codes):
+        # Count detections into their (still open) days; days already closed are ignored
+        days = (np.asarray(dates, dtype='datetime64[D]') - self.first_day).astype(np.int64)
+        n_regions = len(self.region_names) - 1
+        with self._lock:
+            keep = days >= self.next_day
+            if not keep.any():
+                return
+            start = int(days[keep].min())
+            counts = np.bincount((days[keep] - start) * n_regions + np.asarray(codes)[keep],
+                                 minlength=(int(days[keep].max()) - start + 1) * n_regions).reshape(-1, n_regions)
+            for offset in np.nonzero(counts.any(axis=1))[0]:
+                day = start + int(offset)
+                self.pending[day] = self.pending.get(day, 0) + counts[offset]
+
+    def ingest(self, batch):
+        # Live-feed listener: count the batch, then close every day that is at least the lag behind its newest
+        if not len(batch):
+            return
+        codes, _ = assign_regions(batch['LATITUDE'].values, batch['LONGITUDE'].values)
+        dates = batch['ACQ_DATE'].values.astype('datetime64[D]')
+        self.add(dates, codes)
+        self.close(int((dates.max() - self.first_day).astype(np.int64)) - FIRE_ANOMALY_CLOSE_LAG_DAYS)
+
+    def close(self, through_day):
+        # Score and fold in every day up to through_day inclusive. Days without detections count as zero when they
+        # fall in a run of at most FIRE_ANOMALY_MAX_GAP_DAYS; longer runs are recorded as missing
+        with self._lock:
+            n_regions = len(self.region_names) - 1
+            data_days = sorted(day for day in self.pending if self.next_day <= day <= through_day)
+            day = self.next_day
+            for data_day in data_days + [through_day + 1]:
+                missing = data_day - day > FIRE_ANOMALY_MAX_GAP_DAYS
+                for empty_day in range(day, data_day):
+                    if missing:
+                        self._skip()
+                    else:
+                        self._step(empty_day, np.zeros(n_regions + 1, dtype=np.int64))
+                if data_day <= through_day:
+                    counts = self.pending.pop(data_day)
+                    self._step(data_day, np.append(counts, counts.sum()))
+                day = data_day + 1
+            self.next_day = max(self.next_day, through_day + 1)
+            self._arrays = None
+
+    def _skip(self):
+        # A day without data: shown as a gap, never scored or flagged
+        missing = np.full(len(self.region_names), np.nan)
+        self._days.append((missing, missing, missing, np.zeros(len(self.region_names), dtype=bool)))
+
+    def _step(self, day, counts):
+        date = pd.Timestamp(self.first_day + np.timedelta64(day, 'D'))
+        rows = (date.dayofyear - 1 + self.offsets) % 366
+        x = np.log1p(counts)
+        centre = rows[len(rows) // 2]
+        std = np.maximum(np.sqrt(self.variance[centre]), FIRE_ANOMALY_MIN_STD)
+        self._days.append((counts, self.mean[centre].copy(), std, self.weight[centre] >= self.min_weight))
+
+        # Welford's update with weight 1/n, exponentially weighted (rate decay) once n passes the half-life
+        self.weight[rows] += 1
+        alpha = np.maximum(1 / self.weight[rows], self.decay)
+        difference = x - self.mean[rows]
+        increment = alpha * difference
+        self.mean[rows] += increment
+        self.variance[rows] = (1 - alpha) * (self.variance[rows] + difference * increment)
+
+    def _scored(self):
+        # (counts, baseline means, baseline spreads, baseline ready) per closed day and region; NaN on missing days
+        if self._arrays is None:
+            empty = np.zeros((0, len(self.region_names)))
+            self._arrays = tuple(np.array(values) for values in zip(*self._days)) if self._days else \
+                (empty, empty, empty, empty.astype(bool))
+        return self._arrays
+
+    def series(self, region=None):
+        # Daily observed and expected counts, 95% band, z-score and flag for one region (or all regions)
+        with self._lock:
+            counts, means, stds, ready = self._scored()
+        column = self.region_names.index(region or ALL_REGIONS)
+        mean, std = means[:, column], stds[:, column]
+        z = (np.log1p(counts[:, column]) - mean) / std
+        return pd.DataFrame({
+            'ACQ_DATE': self.first_day + np.arange(len(counts)).astype('timedelta64[D]'),
+            'counts': counts[:, column],
+            'expected': np.expm1(mean),
+            'lower': np.expm1(np.maximum(mean - 1.96 * std, 0)),
+            'upper': np.expm1(mean + 1.96 * std),
+            'z': z,
+            'anomaly': ready[:, column] & (np.abs(z) >= self.threshold),
+        })
+
+    def flagged(self, start_date=None):
+        # Anomalous (date, region) pairs, newest first
+        with self._lock:
+            counts, means, stds, ready = self._scored()
+        z = (np.log1p(counts) - means) / stds
+        days, columns = np.nonzero(ready & (np.abs(z) >= self.threshold))
+        result = pd.DataFrame({
+            'ACQ_DATE': self.first_day + days.astype('timedelta64[D]'),
+            'Region': np.array(self.region_names)[columns],
+            'counts': counts[days, columns].astype(np.int64),
+            'expected': np.expm1(means[days, columns]).round(1),
+            'z': z[days, columns].round(2),
+        })
+        if start_date is not None:
+            result = result[result['ACQ_DATE'] >= pd.Timestamp(start_date)]
+        return result.sort_values(['ACQ_DATE', 'z'], ascending=False).reset_index(drop=True)
+
+
+def load_fire_anomalies():
+    global fire_anomalies
+    if fire_anomalies is None:
+        start_time = time.time()
+        region_index = load_region_index()
+        fire_anomalies = FireAnomalies.from_frame(load_fire_data(), region_index.codes, region_index.names)
+        print(f"Time taken to build anomaly baselines: {time.time() - start_time} seconds")
+    return fire_anomalies
+
+
+def ingest_batch(batch):
+    # Live-feed listener: update the baselines if they have been built
+    if fire_anomalies is not None:
+        fire_anomalies.ingest(batch)
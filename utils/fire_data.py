@@ -0,0 +1,107 @@
+import os
+import time
+
+import dask.dataframe as dd
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from shapely import wkb
+
+from utils.metrics import fire_data_load_seconds
+
+# Location of the FIRMS archive (override with FIRE_PARQUET_PATH)
+FIRE_PARQUET_PATH = os.environ.get('FIRE_PARQUET_PATH', 'data/fire_archive_M-C61_490372.parquet')
+
+# Global variables for caching
+cached_df = None
+fire_df = None
+date_index = None
+
+
+# Load the parquet file in chunks
+def load_geojson_chunk(parquet_file_path, npartitions=2):
+    global cached_df
+    if cached_df is not None:
+        return cached_df
+
+    start_time = time.time()
+
+    # Read Parquet file using Dask
+    ddf = dd.read_parquet(parquet_file_path)
+
+    # Convert to GeoPandas DataFrame
+    df = ddf.compute()
+
+    # Convert the geometry column from WKB to shapely geometries
+    df['geometry'] = df['geometry'].apply(wkb.loads)
+
+    # Ensure geometry column is recognized as geometry
+    gdf = gpd.GeoDataFrame(df, geometry='geometry')
+
+    end_time = time.time()
+    print(f"Time taken to load Parquet file: {end_time - start_time} seconds")
+    fire_data_load_seconds.set(end_time - start_time)
+
+    cached_df = dd.from_pandas(gdf, npartitions=npartitions)
+    return cached_df
+
+
+# Fire detections shared by the fire analysis pages
+def load_fire_data(parquet_file_path=None):
+    global fire_df
+    if fire_df is not None:
+        return fire_df
+
+    df = load_geojson_chunk(parquet_file_path or FIRE_PARQUET_PATH).compute()
+
+    # Convert the ACQ_DATE to datetime format
+    try:
+        df['ACQ_DATE'] = pd.to_datetime(df['ACQ_DATE'])
+    except Exception as e:
+        print(f"Error converting ACQ_DATE to datetime: {e}")
+
+    df['Year'] = df['ACQ_DATE'].dt.year
+    fire_df = df
+    return fire_df
+
+
+class DateIndex:
+    # Row positions ordered by ACQ_DATE, so any date range is one contiguous run found by binary search
+
+    def __init__(self, dates):
+        dates = np.asarray(dates, dtype='datetime64[ns]')
+        # Archives written in date order need no permutation (and no 8 bytes per row for one)
+        if len(dates) < 2 or (dates[1:] >= dates[:-1]).all():
+            self.order = None
+            self.dates = dates
+        else:
+            self.order = np.argsort(dates, kind='stable')
+            self.dates = dates[self.order]
+
+    def rows(self, start_date=None, end_date=None):
+        # Positions for start_date..end_date inclusive (whole days); a slice when the archive is date-sorted
+        start, end = 0, len(self.dates)
+        if start_date is not None:
+            start = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date).normalize()), 'left')
+        if end_date is not None:
+            next_day = pd.Timestamp(end_date).normalize() + pd.Timedelta(days=1)
+            end = max(np.searchsorted(self.dates, np.datetime64(next_day), 'left'), start)
+        return slice(int(start), int(end)) if self.order is None else self.order[start:end]
+
+    def count(self, start_date=None, end_date=None):
+        rows = self.rows(start_date, end_date)
+        return rows.stop - rows.start if isinstance(rows, slice) else len(rows)
+
+
+def load_date_index():
+    global date_index
+    if date_index is None:
+        start_time = time.time()
+        date_index = DateIndex(load_fire_data()['ACQ_DATE'].values)
+        print(f"Time taken to build date index: {time.time() - start_time} seconds")
+    return date_index
+
+
+def source_signature(df):
+    # Identifies the archive a derived structure on disk was built from
+    return {'rows': len(df), 'first': str(df['ACQ_DATE'].min()), 'last': str(df['ACQ_DATE'].max())}
@@ -0,0 +1,172 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from utils.fire_data import load_fire_data
+
+# Detections in neighbouring cells (8-connected) at most FIRE_EVENT_GAP_DAYS apart belong to the same event
+FIRE_EVENT_CELL_DEGREES = float(os.environ.get('FIRE_EVENT_CELL_DEGREES', 0.01))
+FIRE_EVENT_GAP_DAYS = int(os.environ.get('FIRE_EVENT_GAP_DAYS', 1))
+# Time chunks are clustered in parallel and stitched at their boundaries
+FIRE_EVENT_WORKERS = int(os.environ.get('FIRE_EVENT_WORKERS', os.cpu_count() or 1))
+FIRE_EVENT_CHUNK_DAYS = int(os.environ.get('FIRE_EVENT_CHUNK_DAYS', 90))
+KM_PER_DEGREE = 111.32
+
+fire_events = None
+
+
+def neighbour_offsets(gap_days):
+    # (days, rows, cols) steps to look forward along; each undirected edge is found from exactly one end
+    offsets = [(0, 0, 1), (0, 1, -1), (0, 1, 0), (0, 1, 1)]
+    for day in range(1, gap_days + 1):
+        offsets += [(day, row, col) for row in (-1, 0, 1) for col in (-1, 0, 1)]
+    return offsets
+
+
+class FireEvents:
+    # Connected components of (day, cell) nodes found by hashing cells to integer keys and binary-searching
+    # each node's forward neighbours, so the cost is O(n log n) rather than pairwise distances
+
+    def __init__(self, lat, lon, dates, frp, cell_size=FIRE_EVENT_CELL_DEGREES, gap_days=FIRE_EVENT_GAP_DAYS,
+                 workers=FIRE_EVENT_WORKERS, chunk_days=FIRE_EVENT_CHUNK_DAYS):
+        self.cell_size = cell_size
+        self.gap_days = gap_days
+        self.lat0 = np.floor(lat.min() / cell_size) * cell_size if len(lat) else 0.0
+        self.lon0 = np.floor(lon.min() / cell_size) * cell_size if len(lon) else 0.0
+        rows = ((lat - self.lat0) // cell_size).astype(np.int64)
+        cols = ((lon - self.lon0) // cell_size).astype(np.int64)
+        self.n_rows = int(rows.max()) + 1 if len(rows) else 1
+        self.n_cols = int(cols.max()) + 1 if len(cols) else 1
+
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        self.first_day = dates.min() if len(dates) else np.datetime64('1970-01-01', 'D')
+        days = (dates - self.first_day).astype(np.int64)
+        keys = (days * self.n_rows + rows) * self.n_cols + cols
+
+        # Row positions grouped into day chunks; date-sorted archives need no permutation
+        order = None if len(days) < 2 or (days[1:] >= days[:-1]).all() else np.argsort(days, kind='stable')
+        sorted_days = days if order is None else days[order]
+        n_days = int(sorted_days[-1]) + 1 if len(days) else 1
+        chunk_days = max(chunk_days, gap_days)
+        boundaries = np.searchsorted(sorted_days, np.arange(0, n_days + chunk_days, chunk_days))
+        chunks = [slice(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+
+        def cluster(rows_slice):
+            chunk_keys = keys[rows_slice] if order is None else keys[order[rows_slice]]
+            nodes, inverse = np.unique(chunk_keys, return_inverse=True)
+            return nodes, inverse, self._components(nodes)
+
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            results = list(executor.map(cluster, chunks))
+
+        # Stitch: chunk-local components become nodes of a small graph joined by edges across chunk boundaries
+        nodes = np.concatenate([result[0] for result in results]) if results else np.zeros(0, dtype=np.int64)
+        offsets = np.cumsum([0] + [result[2][0] for result in results])
+        local = np.concatenate([labels + offset for (_, _, (_, labels)), offset in zip(results, offsets)]) \
+            if results else np.zeros(0, dtype=np.int64)
+        node_offsets = np.cumsum([0] + [len(result[0]) for result in results])
+        boundary_days = sorted_days[[chunk.start for chunk in chunks[1:]]]
+        sources, targets = self._boundary_edges(nodes, boundary_days)
+        n_components, merged = connected_components(
+            coo_matrix((np.ones(len(sources), dtype=np.int8), (local[sources], local[targets])),
+                       shape=(offsets[-1], offsets[-1])), directed=False)
+        node_event = merged[local]
+        # Events numbered in order of first detection
+        first_node = np.full(n_components, len(node_event), dtype=np.int64)
+        np.minimum.at(first_node, node_event, np.arange(len(node_event)))
+        renumber = np.empty(n_components, dtype=np.int64)
+        renumber[np.argsort(first_node, kind='stable')] = np.arange(n_components)
+        node_event = renumber[node_event]
+
+        self.labels = np.empty(len(keys), dtype=np.int64)
+        for chunk, (_, inverse, _), node_offset in zip(chunks, results, node_offsets):
+            positions = chunk if order is None else order[chunk]
+            self.labels[positions] = node_event[inverse + node_offset]
+        self.events = self._summarize(nodes, node_event, n_components, lat, lon, frp)
+
+    def _decode(self, nodes):
+        cols = nodes % self.n_cols
+        rows = (nodes // self.n_cols) % self.n_rows
+        return nodes // (self.n_cols * self.n_rows), rows, cols
+
+    def _neighbours(self, nodes, candidates):
+        # (source, target) index pairs into nodes for every forward neighbour of nodes[candidates] that exists
+        days, rows, cols = self._decode(nodes[candidates])
+        sources, targets = [], []
+        for day_step, row_step, col_step in neighbour_offsets(self.gap_days):
+            valid = (rows + row_step >= 0) & (rows + row_step < self.n_rows) & \
+                    (cols + col_step >= 0) & (cols + col_step < self.n_cols)
+            wanted = nodes[candidates[valid]] + (day_step * self.n_rows + row_step) * self.n_cols + col_step
+            positions = np.searchsorted(nodes, wanted)
+            found = positions < len(nodes)
+            found[found] = nodes[positions[found]] == wanted[found]
+            sources.append(candidates[valid][found])
+            targets.append(positions[found])
+        return np.concatenate(sources), np.concatenate(targets)
+
+    def _components(self, nodes):
+        sources, targets = self._neighbours(nodes, np.arange(len(nodes)))
+        graph = coo_matrix((np.ones(len(sources), dtype=np.int8), (sources, targets)), shape=(len(nodes), len(nodes)))
+        return connected_components(graph, directed=False)
+
+    def _boundary_edges(self, nodes, boundary_days):
+        # Only nodes within gap_days before a chunk boundary can reach into the next chunk
+        if not len(boundary_days) or not len(nodes):
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        days = self._decode(nodes)[0]
+        following = boundary_days[np.minimum(np.searchsorted(boundary_days, days, 'right'), len(boundary_days) - 1)]
+        candidates = np.nonzero((following > days) & (following - days <= self.gap_days))[0]
+        sources, targets = self._neighbours(nodes, candidates)
+        return sources, targets
+
+    def _summarize(self, nodes, node_event, n_events, lat, lon, frp):
+        # One row per event: first/last day, detections, distinct cells and their area, FRP and centroid
+        days, rows, cols = self._decode(nodes)
+        start = np.full(n_events, np.iinfo(np.int64).max)
+        end = np.zeros(n_events, dtype=np.int64)
+        np.minimum.at(start, node_event, days)
+        np.maximum.at(end, node_event, days)
+        cells = np.unique(node_event * (self.n_rows * self.n_cols) + rows * self.n_cols + cols)
+        cell_events = cells // (self.n_rows * self.n_cols)
+        cell_lat = self.lat0 + ((cells % (self.n_rows * self.n_cols)) // self.n_cols + 0.5) * self.cell_size
+        cell_area = (self.cell_size * KM_PER_DEGREE) ** 2 * np.cos(np.deg2rad(cell_lat))
+
+        detections = np.bincount(self.labels, minlength=n_events)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'start': self.first_day + start.astype('timedelta64[D]'),
+                'end': self.first_day + end.astype('timedelta64[D]'),
+                'duration_days': end - start + 1,
+                'detections': detections,
+                'cells': np.bincount(cell_events, minlength=n_events),
+                'area_km2': np.bincount(cell_events, weights=cell_area, minlength=n_events),
+                'frp_total': np.bincount(self.labels, weights=frp, minlength=n_events),
+                'latitude': np.bincount(self.labels, weights=lat, minlength=n_events) / detections,
+                'longitude': np.bincount(self.labels, weights=lon, minlength=n_events) / detections,
+            })
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        return cls(df['LATITUDE'].values, df['LONGITUDE'].values, df['ACQ_DATE'].values, df['FRP'].values, **kwargs)
+
+    def between(self, start_date=None, end_date=None):
+        # Events starting in start_date..end_date inclusive; events are numbered by start date
+        starts = self.events['start'].values
+        start = 0 if start_date is None else np.searchsorted(starts, np.datetime64(pd.Timestamp(start_date).date()))
+        end = len(starts) if end_date is None else \
+            np.searchsorted(starts, np.datetime64(pd.Timestamp(end_date).date()), 'right')
+        return self.events.iloc[start:end]
+
+
+def load_fire_events():
+    global fire_events
+    if fire_events is None:
+        start_time = time.time()
+        fire_events = FireEvents.from_frame(load_fire_data())
+        print(f"Time taken to cluster fire events: {time.time() - start_time} seconds")
+    return fire_events
@@ -0,0 +1,224 @@
+import calendar
+import io
+import os
+
+import flask
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.bitmap_index import FIRE_ATTRIBUTE_COLUMNS, attribute_mask, load_fire_attribute_index
+from utils.fire_data import load_date_index, load_fire_data
+from utils.fire_storage import FIRE_DATASET_PATH, SCHEMA, iter_fire_batches, load_manifest
+
+# Rows formatted per chunk; bounds the memory a download holds regardless of how many rows match
+EXPORT_CHUNK_ROWS = int(os.environ.get('EXPORT_CHUNK_ROWS', 50_000))
+EXPORT_COLUMNS = ['LATITUDE', 'LONGITUDE', 'BRIGHTNESS', 'SCAN', 'TRACK', 'ACQ_DATE', 'ACQ_TIME', 'SATELLITE',
+                  'INSTRUMENT', 'CONFIDENCE', 'VERSION', 'BRIGHT_T31', 'FRP', 'DAYNIGHT', 'TYPE']
+# Fixed Parquet schema, so a column that is all null in the first chunk (or changes dtype later) cannot break
+# a download that has already started streaming
+EXPORT_SCHEMA = pa.schema([SCHEMA.field(column) for column in EXPORT_COLUMNS])
+GEOJSON_PROPERTIES = ['ACQ_DATE', 'ACQ_TIME', 'BRIGHTNESS', 'FRP', 'CONFIDENCE', 'SATELLITE', 'DAYNIGHT']
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'geojson': 'application/geo+json',
+}
+
+
+def in_bbox(chunk, bbox):
+    # Rows inside (south, west, north, east), half-open like the summed-area bins the page snaps boxes to
+    south, west, north, east = bbox
+    lat, lon = chunk['LATITUDE'].values, chunk['LONGITUDE'].values
+    return (lat >= south) & (lat < north) & (lon >= west) & (lon < east)
+
+
+def filter_chunk(chunk, filters=None, bbox=None):
+    if not filters and bbox is None:
+        return chunk
+    mask = attribute_mask(chunk, filters)
+    if bbox is not None:
+        mask &= in_bbox(chunk, bbox)
+    return chunk[mask]
+
+
+def archive_chunks(df, rows, chunk_rows=EXPORT_CHUNK_ROWS, filters=None, bbox=None):
+    # Frames of at most chunk_rows rows taken from a date index slice or position array
+    columns = [df.columns.get_loc(column) for column in EXPORT_COLUMNS if column in df]
+    if isinstance(rows, slice):
+        chunks = (df.iloc[start:min(start + chunk_rows, rows.stop), columns]
+                  for start in range(rows.start, rows.stop, chunk_rows))
+    else:
+        chunks = (df.iloc[rows[start:start + chunk_rows], columns] for start in range(0, len(rows), chunk_rows))
+    for chunk in chunks:
+        yield filter_chunk(chunk, filters, bbox)
+
+
+def dataset_chunks(instrument, start_date, end_date, chunk_rows=EXPORT_CHUNK_ROWS, path=FIRE_DATASET_PATH,
+                   filters=None, bbox=None):
+    for batch in iter_fire_batches(path, instrument, start_date, end_date, EXPORT_COLUMNS, chunk_rows):
+        yield filter_chunk(batch.to_pandas(), filters, bbox)
+
+
+def stream_csv(chunks):
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header, date_format='%Y-%m-%d')
+        header = False
+    if header:
+        yield ','.join(EXPORT_COLUMNS) + '\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    # Write-only file object for ParquetWriter; drain() hands back what was written since the last call
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def parquet_frame(chunk):
+    # Chunk with every EXPORT_SCHEMA column, string columns as strings (e.g. a numeric VERSION), nulls kept
+    chunk = chunk.reindex(columns=EXPORT_COLUMNS)
+    for field in EXPORT_SCHEMA:
+        if pa.types.is_string(field.type) and chunk[field.name].dtype != object:
+            chunk[field.name] = chunk[field.name].astype(str).where(chunk[field.name].notna(), None)
+    return chunk
+
+
+def stream_parquet(chunks):
+    # One row group per chunk, flushed to the client as soon as it is written
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, EXPORT_SCHEMA)
+    for chunk in chunks:
+        writer.write_table(pa.Table.from_pandas(parquet_frame(chunk), schema=EXPORT_SCHEMA, preserve_index=False))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def _coordinates(lon, lat):
+    # GeoJSON geometry, or null for a detection without coordinates (NaN is not valid JSON)
+    if lon != lon or lat != lat:
+        return 'null'
+    return '{"type": "Point", "coordinates": [%r, %r]}' % (lon, lat)
+
+
+def stream_geojson(chunks):
+    yield '{"type": "FeatureCollection", "features": ['
+    separator = ''
+    for chunk in chunks:
+        properties = chunk[GEOJSON_PROPERTIES].copy()
+        properties['ACQ_DATE'] = properties['ACQ_DATE'].dt.strftime('%Y-%m-%d')
+        # One JSON object per line from pandas' encoder (which writes missing values as null) instead of a
+        # json.dumps call per feature
+        records = properties.to_json(orient='records', lines=True).splitlines()
+        features = [
+            '{"type": "Feature", "geometry": %s, "properties": %s}' % (_coordinates(lon, lat), record)
+            for lon, lat, record in zip(chunk['LONGITUDE'].tolist(), chunk['LATITUDE'].tolist(), records)
+        ]
+        if features:
+            yield separator + ', '.join(features)
+            separator = ', '
+    yield ']}'
+
+
+STREAMS = {'csv': stream_csv, 'parquet': stream_parquet, 'geojson': stream_geojson}
+
+
+def export_range(args):
+    # start_date/end_date (inclusive) from either an explicit range or year[/month]
+    if args.get('start_date') or args.get('end_date'):
+        start_date = pd.Timestamp(args['start_date']) if args.get('start_date') else None
+        end_date = pd.Timestamp(args['end_date']) if args.get('end_date') else None
+        return start_date, end_date
+    if args.get('year'):
+        year = int(args['year'])
+        if args.get('month'):
+            month = int(args['month'])
+            return pd.Timestamp(year, month, 1), pd.Timestamp(year, month, calendar.monthrange(year, month)[1])
+        return pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31)
+    return None, None
+
+
+def export_filters(args):
+    # {column: [values]} from comma-separated confidence=, satellite=, daynight=, instrument= and type= parameters
+    filters = {}
+    for column in FIRE_ATTRIBUTE_COLUMNS:
+        values = [value for value in args.get(column.lower(), '').split(',') if value]
+        if values:
+            filters[column] = [int(value) for value in values] if column == 'TYPE' else values
+    return filters
+
+
+def export_bbox(args):
+    # (south, west, north, east) from bbox=south,west,north,east, or None
+    if not args.get('bbox'):
+        return None
+    bbox = tuple(float(value) for value in args['bbox'].split(','))
+    if len(bbox) != 4:
+        raise ValueError(args['bbox'])
+    return bbox
+
+
+def export_filename(start_date, end_date, dataset, fmt):
+    parts = ['fires', dataset if dataset != 'archive' else None,
+             start_date.strftime('%Y%m%d') if start_date is not None else None,
+             end_date.strftime('%Y%m%d') if end_date is not None else None]
+    return '_'.join(part for part in parts if part) + f'.{fmt}'
+
+
+def register_export(server, load=None, load_attributes=None):
+    # GET /export/fires?format=csv|parquet|geojson&year=&month= (or start_date=&end_date=)&dataset=archive|MODIS|...
+    #     optionally &confidence=high,nominal&satellite=&daynight=&instrument=&type= and &bbox=south,west,north,east
+    # load_attributes returns the attribute bitmaps for load's frame; without them filters are applied per chunk
+    load_attributes = load_attributes or (load_fire_attribute_index if load is None else None)
+    load = load or (lambda: (load_fire_data(), load_date_index()))
+
+    @server.route('/export/fires')
+    def export_fires():
+        args = flask.request.args
+        fmt = args.get('format', 'csv').lower()
+        dataset = args.get('dataset', 'archive')
+        if fmt not in STREAMS:
+            flask.abort(400, description=f"Unsupported format {fmt!r}; use one of {', '.join(STREAMS)}")
+        try:
+            start_date, end_date = export_range(args)
+            filters = export_filters(args)
+            bbox = export_bbox(args)
+        except (ValueError, TypeError):
+            flask.abort(400, description='Invalid year, month, date range, filter or bbox')
+
+        if dataset == 'archive':
+            df, index = load()
+            if filters and load_attributes is not None:
+                # Attribute filters resolve to row positions through the bitmaps, as on the page
+                chunks = archive_chunks(df, load_attributes().rows(filters, start_date, end_date), bbox=bbox)
+            else:
+                chunks = archive_chunks(df, index.rows(start_date, end_date), filters=filters, bbox=bbox)
+        elif dataset in load_manifest():
+            chunks = dataset_chunks(dataset, start_date, end_date, filters=filters, bbox=bbox)
+        else:
+            flask.abort(404, description=f"Unknown dataset {dataset!r}")
+
+        response = flask.Response(flask.stream_with_context(STREAMS[fmt](chunks)), mimetype=EXPORT_FORMATS[fmt])
+        response.headers['Content-Disposition'] = \
+            f'attachment; filename={export_filename(start_date, end_date, dataset, fmt)}'
+        return response
+
+    return export_fires
@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from utils.fire_data import load_fire_data
+
+# Persisted model bundle and grid resolution in degrees (override with the environment)
+FIRE_MODEL_PATH = os.environ.get('FIRE_MODEL_PATH', 'data/fire_model.joblib')
+FIRE_MODEL_CELL_DEGREES = float(os.environ.get('FIRE_MODEL_CELL_DEGREES', 0.5))
+
+FEATURES = ['latitude', 'longitude', 'month_sin', 'month_cos', 'previous_month', 'previous_year',
+            'month_history_rate', 'mean_brightness']
+
+fire_model = None
+
+
+class FireModel:
+    # Random Forest over (grid cell, month) features; every cell of a month is scored in one predict_proba call
+
+    def __init__(self, cell_size, lat0, lon0, n_rows, n_cols, first_year, counts, brightness):
+        self.cell_size = cell_size
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.n_rows = n_rows
+        self.n_cols = n_cols
+        self.first_year = first_year
+        # Detections and brightness sums per (month since first_year, cell)
+        self.counts = counts
+        self.brightness = brightness
+        self.classifier = None
+        self.timings = {}
+        self.scores = {}
+
+    @classmethod
+    def from_frame(cls, df, cell_size=FIRE_MODEL_CELL_DEGREES):
+        lat, lon = df['LATITUDE'].values, df['LONGITUDE'].values
+        lat0 = np.floor(lat.min() / cell_size) * cell_size
+        lon0 = np.floor(lon.min() / cell_size) * cell_size
+        n_rows = int((lat.max() - lat0) // cell_size) + 1
+        n_cols = int((lon.max() - lon0) // cell_size) + 1
+        cells = ((lat - lat0) // cell_size).astype(np.int64) * n_cols + ((lon - lon0) // cell_size).astype(np.int64)
+
+        dates = df['ACQ_DATE']
+        first_year = int(dates.dt.year.min())
+        periods = (dates.dt.year.values - first_year) * 12 + dates.dt.month.values - 1
+        n_periods = int(periods.max()) + 1
+        n_cells = n_rows * n_cols
+        flat = periods * n_cells + cells
+        counts = np.bincount(flat, minlength=n_periods * n_cells).reshape(n_periods, n_cells)
+        brightness = np.bincount(flat, weights=df['BRIGHTNESS'].values,
+                                 minlength=n_periods * n_cells).reshape(n_periods, n_cells)
+        return cls(cell_size, lat0, lon0, n_rows, n_cols, first_year, counts.astype(np.int32), brightness)
+
+    @property
+    def n_periods(self):
+        return len(self.counts)
+
+    def period_of(self, year, month):
+        return (int(year) - self.first_year) * 12 + int(month) - 1
+
+    def features(self, periods, cells=None):
+        # Feature matrix of shape (len(periods) * len(cells), len(FEATURES)); only months before each period are used
+        periods = np.asarray(periods)
+        cells = np.arange(self.n_rows * self.n_cols) if cells is None else cells
+        history = np.zeros((self.n_periods + 1, len(cells)))
+        history[1:] = np.cumsum(self.counts[:, cells], axis=0)
+        brightness_history = np.zeros_like(history)
+        brightness_history[1:] = np.cumsum(self.brightness[:, cells], axis=0)
+
+        # Same calendar month in earlier years; periods past the archive use the latest available history
+        seen = np.minimum(periods, self.n_periods)
+        padded = np.zeros((-(-self.n_periods // 12) * 12 + 12, len(cells)))
+        padded[12:12 + self.n_periods] = self.counts[:, cells]
+        month_history = np.cumsum(padded.reshape(-1, 12, len(cells)), axis=0)
+        months = periods % 12
+        years_seen = np.minimum(periods // 12, (self.n_periods - months - 1) // 12 + 1).clip(0)
+
+        def lagged(lag):
+            # Past the archive, step back whole lags to the latest archived month: the last month for lag 1, the
+            # same calendar month of the last archived year for lag 12 (a zero would read as "no detections")
+            steps = np.maximum(1, -(-(periods - self.n_periods + 1) // lag))
+            lag_periods = periods - lag * steps
+            valid = (lag_periods >= 0)[:, None]
+            return np.where(valid, self.counts[np.clip(lag_periods, 0, self.n_periods - 1)][:, cells], 0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            month_rate = month_history[years_seen, months] / np.maximum(years_seen, 1)[:, None]
+            mean_brightness = np.nan_to_num(brightness_history[seen] / history[seen])
+
+        rows, cols = np.divmod(cells, self.n_cols)
+        shape = (len(periods), len(cells))
+        columns = [
+            np.broadcast_to(self.lat0 + (rows + 0.5) * self.cell_size, shape),
+            np.broadcast_to(self.lon0 + (cols + 0.5) * self.cell_size, shape),
+            np.broadcast_to(np.sin(2 * np.pi * months / 12)[:, None], shape),
+            np.broadcast_to(np.cos(2 * np.pi * months / 12)[:, None], shape),
+            lagged(1),
+            lagged(12),
+            month_rate,
+            mean_brightness,
+        ]
+        return np.stack([column.reshape(-1) for column in columns], axis=1).astype(np.float32)
+
+    def training_set(self, periods):
+        # Cells that burned at least once, for every given month; label is any detection in that month
+        cells = np.nonzero(self.counts.sum(axis=0))[0]
+        labels = (self.counts[np.asarray(periods)][:, cells] > 0).reshape(-1)
+        return self.features(periods, cells), labels
+
+    def train(self, test_months=12, n_estimators=100, max_depth=16, random_state=0):
+        from imblearn.over_sampling import SMOTE
+        from sklearn.ensemble import RandomForestClassifier
+        from sklearn.metrics import precision_recall_fscore_support, roc_auc_score
+
+        # First year is history only; the most recent months are held out for evaluation
+        split = max(self.n_periods - test_months, 13)
+        start_time = time.time()
+        X_train, y_train = self.training_set(np.arange(12, split))
+        X_test, y_test = self.training_set(np.arange(split, self.n_periods))
+        self.timings['features_seconds'] = time.time() - start_time
+
+        start_time = time.time()
+        X_train, y_train = SMOTE(random_state=random_state).fit_resample(X_train, y_train)
+        self.timings['smote_seconds'] = time.time() - start_time
+
+        start_time = time.time()
+        self.classifier = RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, n_jobs=-1,
+                                                 random_state=random_state)
+        self.classifier.fit(X_train, y_train)
+        self.timings['train_seconds'] = time.time() - start_time
+
+        if len(y_test) and y_test.any() and not y_test.all():
+            probabilities = self.classifier.predict_proba(X_test)[:, 1]
+            precision, recall, f1, _ = precision_recall_fscore_support(y_test, probabilities >= 0.5, average='binary')
+            self.scores = {'precision': precision, 'recall': recall, 'f1': f1,
+                           'roc_auc': roc_auc_score(y_test, probabilities)}
+        return self
+
+    def predict_grid(self, year, month):
+        # Fire probability for every grid cell in one month, shaped (n_rows, n_cols)
+        probabilities = self.classifier.predict_proba(self.features([self.period_of(year, month)]))[:, 1]
+        return probabilities.reshape(self.n_rows, self.n_cols)
+
+    def grid_axes(self):
+        latitudes = self.lat0 + (np.arange(self.n_rows) + 0.5) * self.cell_size
+        longitudes = self.lon0 + (np.arange(self.n_cols) + 0.5) * self.cell_size
+        return latitudes, longitudes
+
+    def save(self, path=FIRE_MODEL_PATH):
+        # Written beside the target and renamed into place, so a loading process never reads a partial bundle
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        joblib.dump(self, temporary_path, compress=3)
+        os.replace(temporary_path, path)
+
+    @staticmethod
+    def load(path=FIRE_MODEL_PATH):
+        return joblib.load(path)
+
+
+def train_fire_model(df, cell_size=FIRE_MODEL_CELL_DEGREES, path=FIRE_MODEL_PATH):
+    start_time = time.time()
+    model = FireModel.from_frame(df, cell_size).train()
+    # Grid inference for the latest month, timed once here and stored with the bundle
+    inference_start = time.time()
+    model.predict_grid(model.first_year + (model.n_periods - 1) // 12, (model.n_periods - 1) % 12 + 1)
+    model.timings['grid_inference_seconds'] = time.time() - inference_start
+    model.save(path)
+    print(f"Time taken to train fire model: {time.time() - start_time} seconds {model.timings} {model.scores}")
+    return model
+
+
+def load_fire_model(path=None):
+    # Persisted model, or None until `python -m utils.fire_model` has trained one; the web process never trains
+    global fire_model
+    if fire_model is None:
+        path = path or FIRE_MODEL_PATH
+        if not os.path.exists(path):
+            print(f"No fire model at {path}; run `python -m utils.fire_model` to train it")
+            return None
+        start_time = time.time()
+        fire_model = FireModel.load(path)
+        print(f"Time taken to load fire model: {time.time() - start_time} seconds")
+    return fire_model
+
+
+if __name__ == "__main__":
+    # python -m utils.fire_model [model.joblib]
+    # Train through the importable module so the pickled class is utils.fire_model.FireModel, not __main__
+    from utils.fire_model import train_fire_model
+
+    output_path = sys.argv[1] if len(sys.argv) > 1 else FIRE_MODEL_PATH
+    df = load_fire_data()
+    model = train_fire_model(df, path=output_path)
+    print(f"Grid {model.n_rows} x {model.n_cols} cells of {model.cell_size} degrees, {model.n_periods} months")
+    for name, value in model.timings.items():
+        print(f"{name}: {value:.3f}")
+    for name, value in model.scores.items():
+        print(f"held-out {name}: {value:.3f}")
+
+    last_year = model.first_year + (model.n_periods - 1) // 12
+    start_time = time.time()
+    for month in range(1, 13):
+        model.predict_grid(last_year, month)
+    print(f"Grid inference: {(time.time() - start_time) / 12 * 1000:.1f} ms per month "
+          f"({model.n_rows * model.n_cols} cells per call)")
+    print(f"Saved {output_path}")
@@ -0,0 +1,199 @@
+import argparse
+import glob
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Root of the year/satellite partitioned store written by `python -m utils.fire_storage`
+FIRE_DATASET_PATH = os.environ.get('FIRE_DATASET_PATH', 'data/fire_datasets')
+FIRE_DATASET_ROW_GROUP_SIZE = int(os.environ.get('FIRE_DATASET_ROW_GROUP_SIZE', 100_000))
+MANIFEST_NAME = '_manifest.json'
+
+# Common schema for MODIS and VIIRS archives; VIIRS brightness channels are renamed to the MODIS names
+SCHEMA = pa.schema([
+    ('LATITUDE', pa.float64()),
+    ('LONGITUDE', pa.float64()),
+    ('BRIGHTNESS', pa.float64()),
+    ('SCAN', pa.float64()),
+    ('TRACK', pa.float64()),
+    ('ACQ_DATE', pa.timestamp('ms')),
+    ('ACQ_TIME', pa.int32()),
+    ('SATELLITE', pa.string()),
+    ('INSTRUMENT', pa.string()),
+    ('CONFIDENCE', pa.int32()),
+    ('VERSION', pa.string()),
+    ('BRIGHT_T31', pa.float64()),
+    ('FRP', pa.float64()),
+    ('DAYNIGHT', pa.string()),
+    ('TYPE', pa.int32()),
+    ('geometry', pa.binary()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int16()), ('satellite', pa.string())]), flavor='hive')
+COLUMN_ALIASES = {'BRIGHT_TI4': 'BRIGHTNESS', 'BRIGHT_TI5': 'BRIGHT_T31'}
+# VIIRS reports low/nominal/high; map each class to the lower bound of the matching MODIS confidence class
+VIIRS_CONFIDENCE = {'l': 0, 'low': 0, 'n': 30, 'nominal': 30, 'h': 80, 'high': 80}
+
+
+def read_archive(path):
+    # One FIRMS archive (parquet or CSV download) normalized to SCHEMA
+    if path.endswith('.csv'):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_parquet(path)
+    return pa.Table.from_pandas(normalize_frame(df), schema=SCHEMA, preserve_index=False)
+
+
+def normalize_frame(df):
+    # FIRMS detections from either instrument with SCHEMA's columns, names and encodings
+    df = df.rename(columns=lambda name: name if name == 'geometry' else name.upper()).rename(columns=COLUMN_ALIASES)
+
+    df['ACQ_DATE'] = pd.to_datetime(df['ACQ_DATE'])
+    if df['CONFIDENCE'].dtype == object:
+        df['CONFIDENCE'] = df['CONFIDENCE'].str.lower().map(VIIRS_CONFIDENCE)
+    if 'VERSION' in df:
+        df['VERSION'] = df['VERSION'].astype(str)
+    if 'geometry' not in df:
+        import shapely
+        df['geometry'] = shapely.to_wkb(shapely.points(df['LONGITUDE'].values, df['LATITUDE'].values))
+    for field in SCHEMA:
+        if field.name not in df:
+            df[field.name] = None
+    return df[SCHEMA.names]
+
+
+def source_name(path):
+    # Per-source part of the partition file names, so archives of the same instrument do not overwrite each other
+    return re.sub(r'[^\w.-]', '_', os.path.splitext(os.path.basename(path))[0])
+
+
+def write_partitions(table, output_dir=FIRE_DATASET_PATH, row_group_size=FIRE_DATASET_ROW_GROUP_SIZE, source='0'):
+    # Sorted by acquisition time so each row group covers a narrow date range (min/max statistics prune well).
+    # Files are named {instrument}-{source}.parquet; the source's files from an earlier run are replaced, so
+    # converting the same archive again is idempotent
+    table = table.sort_by([('ACQ_DATE', 'ascending'), ('ACQ_TIME', 'ascending')])
+    years = table['ACQ_DATE'].to_numpy().astype('datetime64[Y]').astype(np.int64) + 1970
+    satellites = table['SATELLITE'].to_numpy(zero_copy_only=False).astype(str)
+    instrument = str(table['INSTRUMENT'][0]).lower() if len(table) else 'archive'
+    file_name = f'{instrument}-{source}.parquet'
+    for stale in glob.glob(os.path.join(output_dir, 'year=*', 'satellite=*', file_name)):
+        os.remove(stale)
+    for year in np.unique(years):
+        for satellite in np.unique(satellites[years == year]):
+            # np.nonzero keeps the rows in date order within the partition
+            rows = np.nonzero((years == year) & (satellites == satellite))[0]
+            partition_dir = os.path.join(output_dir, f'year={year}', f'satellite={satellite}')
+            os.makedirs(partition_dir, exist_ok=True)
+            pq.write_table(table.take(rows), os.path.join(partition_dir, file_name),
+                           row_group_size=row_group_size, write_statistics=True)
+
+
+def update_manifest(table, output_dir=FIRE_DATASET_PATH, source='0'):
+    # Instruments present in the store, with their satellites, years and row counts (drives dataset selectors).
+    # Each instrument keeps one entry per source; its totals are the union (satellites, years) and sum (rows)
+    manifest = load_manifest(output_dir)
+    df = table.select(['INSTRUMENT', 'SATELLITE', 'ACQ_DATE']).to_pandas()
+    for instrument, group in df.groupby('INSTRUMENT'):
+        entry = manifest.get(instrument, {})
+        # Entries written before sources were tracked came from {instrument}-0.parquet files
+        sources = entry.get('sources') or ({'0': {key: entry[key] for key in ('satellites', 'years', 'rows')}}
+                                           if entry else {})
+        sources[source] = {
+            'satellites': sorted(group['SATELLITE'].unique().tolist()),
+            'years': sorted(group['ACQ_DATE'].dt.year.unique().tolist()),
+            'rows': len(group),
+        }
+        manifest[instrument] = {
+            'satellites': sorted(set().union(*(entry['satellites'] for entry in sources.values()))),
+            'years': sorted(set().union(*(entry['years'] for entry in sources.values()))),
+            'rows': sum(entry['rows'] for entry in sources.values()),
+            'sources': sources,
+        }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def load_manifest(path=FIRE_DATASET_PATH):
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def convert_archives(paths, output_dir=FIRE_DATASET_PATH, row_group_size=FIRE_DATASET_ROW_GROUP_SIZE):
+    os.makedirs(output_dir, exist_ok=True)
+    for path in paths:
+        start_time = time.time()
+        table = read_archive(path)
+        write_partitions(table, output_dir, row_group_size, source_name(path))
+        update_manifest(table, output_dir, source_name(path))
+        print(f"Converted {path} ({len(table)} rows) in {time.time() - start_time:.1f} seconds")
+
+
+def open_fire_dataset(path=FIRE_DATASET_PATH):
+    return ds.dataset(path, format='parquet', partitioning=PARTITIONING, exclude_invalid_files=True)
+
+
+def fire_filter(path=FIRE_DATASET_PATH, instrument=None, years=None, start_date=None, end_date=None):
+    # Partition filters (year, satellite) skip directories; date filters skip row groups by their statistics
+    manifest = load_manifest(path)
+    condition = ds.scalar(True)
+    if instrument:
+        condition &= ds.field('satellite').isin(manifest.get(instrument, {}).get('satellites', []))
+    if years:
+        condition &= ds.field('year').isin([int(year) for year in years])
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        condition &= (ds.field('year') >= start.year) & (ds.field('ACQ_DATE') >= pa.scalar(start, pa.timestamp('ms')))
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        condition &= (ds.field('year') <= end.year) & (ds.field('ACQ_DATE') <= pa.scalar(end, pa.timestamp('ms')))
+    return condition
+
+
+def read_fire_data(path=FIRE_DATASET_PATH, instrument=None, years=None, start_date=None, end_date=None,
+                   columns=None):
+    condition = fire_filter(path, instrument, years, start_date, end_date)
+    df = open_fire_dataset(path).to_table(columns=columns, filter=condition).to_pandas()
+    df = df.drop(columns=['year', 'satellite'], errors='ignore')
+    if 'ACQ_DATE' in df:
+        df['ACQ_DATE'] = pd.to_datetime(df['ACQ_DATE'])
+        df['Year'] = df['ACQ_DATE'].dt.year
+    return df
+
+
+def iter_fire_batches(path=FIRE_DATASET_PATH, instrument=None, start_date=None, end_date=None, columns=None,
+                      batch_size=FIRE_DATASET_ROW_GROUP_SIZE):
+    # Record batches of the filtered store, read lazily so only one batch is held at a time
+    condition = fire_filter(path, instrument, None, start_date, end_date)
+    scanner = open_fire_dataset(path).scanner(columns=columns, filter=condition, batch_size=batch_size)
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield batch
+
+
+def read_month(year, month, instrument=None, columns=None, path=FIRE_DATASET_PATH):
+    start = pd.Timestamp(year=int(year), month=int(month), day=1)
+    end = start + pd.offsets.MonthEnd(1)
+    return read_fire_data(path, instrument=instrument, years=[year], start_date=start, end_date=end, columns=columns)
+
+
+if __name__ == "__main__":
+    # python -m utils.fire_storage fire_archive_M-C61_490372.parquet fire_archive_SV-C2_490373.csv
+    parser = argparse.ArgumentParser(description='Convert FIRMS archives into a year/satellite partitioned store')
+    parser.add_argument('sources', nargs='+')
+    parser.add_argument('--output', default=FIRE_DATASET_PATH)
+    parser.add_argument('--row-group-size', type=int, default=FIRE_DATASET_ROW_GROUP_SIZE)
+    args = parser.parse_args()
+    convert_archives(args.sources, args.output, args.row_group_size)
+    for instrument, entry in load_manifest(args.output).items():
+        print(f"{instrument}: {entry['rows']} rows, satellites {', '.join(entry['satellites'])}, "
+              f"years {entry['years'][0]}-{entry['years'][-1]}")
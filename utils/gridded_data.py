@@ -0,0 +1,164 @@
+import glob
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+# Directory with one NetCDF file, NetCDF directory or Zarr store per analysis type (solar.zarr, wind.nc, uv/*.nc, ...)
+GRIDDED_DATA_DIR = os.environ.get('GRIDDED_DATA_DIR', 'data/gridded')
+# Time steps per dask chunk; aggregates stream through the cube one chunk at a time
+GRIDDED_TIME_CHUNK = int(os.environ.get('GRIDDED_TIME_CHUNK', 24 * 31))
+GRIDDED_CACHE_SIZE = int(os.environ.get('GRIDDED_CACHE_SIZE', 256))
+# Largest map sent to the browser, in grid cells per side; bigger grids are block-averaged
+GRIDDED_MAP_MAX_CELLS = int(os.environ.get('GRIDDED_MAP_MAX_CELLS', 300))
+
+# Analysis types linked from the sidebar: variable candidates (first present wins), title and units
+GRIDDED_DATASETS = {
+    'solar': {'variables': ['ssrd', 'rsds', 'swdown', 'ghi'], 'title': 'Surface Solar Radiation', 'units': 'W/m²'},
+    'wind': {'variables': ['wind_speed', 'si10', 'ws10', 'sfcWind'], 'components': ('u10', 'v10'),
+             'title': 'Wind Speed', 'units': 'm/s'},
+    'uv': {'variables': ['uvb', 'uvi', 'uv_index'], 'title': 'UV Radiation', 'units': 'W/m²'},
+    'prep': {'variables': ['tp', 'pr', 'precip', 'precipitation'], 'title': 'Precipitation', 'units': 'mm'},
+    'wth': {'variables': ['t2m', 'tas', 'air_temperature', 'temperature'], 'title': 'Air Temperature', 'units': 'K'},
+}
+COORDINATE_NAMES = {
+    'time': ['time', 'valid_time', 'date'],
+    'lat': ['latitude', 'lat', 'y'],
+    'lon': ['longitude', 'lon', 'x'],
+}
+
+datasets = {}
+_aggregate_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def dataset_path(name, data_dir=None):
+    data_dir = data_dir or GRIDDED_DATA_DIR
+    for candidate in (f'{name}.zarr', f'{name}.nc', f'{name}.nc4', name):
+        path = os.path.join(data_dir, candidate)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def dataset_mtime(path):
+    # Version of the data behind path. A Zarr store's directory mtime only changes when top-level entries are
+    # added or removed, so its consolidated metadata (rewritten on every update) is used; a NetCDF directory
+    # changes when any of its files does
+    zmetadata = os.path.join(path, '.zmetadata')
+    if os.path.exists(zmetadata):
+        return os.path.getmtime(zmetadata)
+    if os.path.isdir(path):
+        files = glob.glob(os.path.join(path, '*.nc'))
+        return max([os.path.getmtime(path)] + [os.path.getmtime(file) for file in files])
+    return os.path.getmtime(path)
+
+
+def open_gridded(path):
+    # Lazy, chunked open: only metadata is read here; NetCDF variables are read chunk by chunk on compute
+    if path.endswith('.zarr') or os.path.exists(os.path.join(path, '.zmetadata')):
+        ds = xr.open_zarr(path)
+    elif os.path.isdir(path):
+        ds = xr.open_mfdataset(sorted(glob.glob(os.path.join(path, '*.nc'))), combine='by_coords',
+                               chunks={}, parallel=False)
+    else:
+        ds = xr.open_dataset(path, chunks={})
+    renames = {}
+    for standard, candidates in COORDINATE_NAMES.items():
+        found = next((candidate for candidate in candidates if candidate in ds.dims), None)
+        if found and found != standard:
+            renames[found] = standard
+    ds = ds.rename(renames)
+    if 'time' in ds.dims:
+        ds = ds.chunk({'time': GRIDDED_TIME_CHUNK})
+    # Longitudes stored as 0..360 are shifted so region boxes in -180..180 select correctly
+    if float(ds['lon'].max()) > 180:
+        ds = ds.assign_coords(lon=((ds['lon'] + 180) % 360) - 180).sortby('lon')
+    return ds
+
+
+class GriddedDataset:
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self.config = GRIDDED_DATASETS[name]
+        self.ds = open_gridded(path)
+        self.variable = self._variable()
+        times = self.ds['time'].values
+        self.start, self.end = pd.Timestamp(times.min()), pd.Timestamp(times.max())
+        self.signature = (path, dataset_mtime(path))
+
+    def _variable(self):
+        for variable in self.config['variables']:
+            if variable in self.ds:
+                return self.ds[variable]
+        components = self.config.get('components')
+        if components and all(component in self.ds for component in components):
+            u, v = (self.ds[component] for component in components)
+            return np.hypot(u, v).rename('wind_speed')
+        return self.ds[next(iter(self.ds.data_vars))]
+
+    def select(self, start_date=None, end_date=None, bbox=None):
+        variable = self.variable.sel(time=slice(start_date, end_date))
+        if bbox:
+            south, west, north, east = bbox
+            descending = variable['lat'].size > 1 and variable['lat'][0] > variable['lat'][-1]
+            variable = variable.sel(lat=slice(north, south) if descending else slice(south, north),
+                                    lon=slice(west, east))
+        return variable
+
+    def time_series(self, start_date=None, end_date=None, bbox=None, freq='D'):
+        # Area-weighted mean per period; dask reduces each time chunk before the next is read
+        variable = self.select(start_date, end_date, bbox)
+        weights = np.cos(np.deg2rad(variable['lat']))
+        series = variable.weighted(weights).mean(['lat', 'lon']).resample(time=freq).mean()
+        return series.compute().to_series()
+
+    def time_mean_map(self, start_date=None, end_date=None, bbox=None, max_cells=GRIDDED_MAP_MAX_CELLS):
+        variable = self.select(start_date, end_date, bbox)
+        factors = {dim: int(np.ceil(variable.sizes[dim] / max_cells)) for dim in ('lat', 'lon')}
+        mean = variable.mean('time')
+        if any(factor > 1 for factor in factors.values()):
+            mean = mean.coarsen(factors, boundary='trim').mean()
+        return mean.compute()
+
+    def climatology(self, bbox=None):
+        # Mean for each calendar month across all years
+        variable = self.select(bbox=bbox)
+        weights = np.cos(np.deg2rad(variable['lat']))
+        return variable.weighted(weights).mean(['lat', 'lon']).groupby('time.month').mean().compute().to_series()
+
+
+def load_gridded_dataset(name, data_dir=None):
+    # Open datasets are kept per analysis type and reopened when the file changes
+    path = dataset_path(name, data_dir)
+    if path is None:
+        return None
+    dataset = datasets.get(name)
+    if dataset is None or dataset.signature != (path, dataset_mtime(path)):
+        start_time = time.time()
+        dataset = GriddedDataset(name, path)
+        datasets[name] = dataset
+        print(f"Time taken to open {path}: {time.time() - start_time} seconds")
+    return dataset
+
+
+def cached_aggregate(dataset, method, *args):
+    # LRU over aggregate results, keyed by the dataset file version so edits invalidate old results
+    key = (dataset.signature, method) + args
+    with _lock:
+        if key in _aggregate_cache:
+            _aggregate_cache.move_to_end(key)
+            return _aggregate_cache[key]
+    start_time = time.time()
+    result = getattr(dataset, method)(*args)
+    print(f"Time taken to compute {dataset.name} {method}: {time.time() - start_time} seconds")
+    with _lock:
+        _aggregate_cache[key] = result
+        while len(_aggregate_cache) > GRIDDED_CACHE_SIZE:
+            _aggregate_cache.popitem(last=False)
+    return result
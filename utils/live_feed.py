@@ -0,0 +1,171 @@
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_storage import normalize_frame
+
+# Drop directory standing in for the FIRMS NRT feed: new or growing *.csv files and new *.parquet files
+LIVE_FEED_DIR = os.environ.get('LIVE_FEED_DIR', 'data/live')
+LIVE_FEED_POLL_SECONDS = float(os.environ.get('LIVE_FEED_POLL_SECONDS', 5))
+# Detections kept for clients that connect later; older ones are dropped from the buffer (not from the files)
+LIVE_FEED_MAX_POINTS = int(os.environ.get('LIVE_FEED_MAX_POINTS', 50_000))
+LIVE_FEED_COLUMNS = ['LATITUDE', 'LONGITUDE', 'BRIGHTNESS', 'FRP', 'ACQ_DATE', 'ACQ_TIME', 'SATELLITE']
+
+live_feed = None
+
+
+class LiveFeed:
+    # Polls the drop directory on a daemon thread and parses only what is new: CSV files from the byte offset
+    # reached last time (up to the last complete line), Parquet files once their size stops changing.
+    # Every row is identified by its source (file name, row number within the file), so each server process
+    # numbers the same detection the same way. A client cursor maps file name -> rows already received and
+    # can be answered by any worker: one that has read less of a file returns nothing new for it and leaves
+    # the client's position there untouched. Drop files are append-only; a truncated CSV starts over under the
+    # same name, so clients already past its old length only see rows beyond it.
+
+    def __init__(self, directory=LIVE_FEED_DIR, poll_seconds=LIVE_FEED_POLL_SECONDS, max_points=LIVE_FEED_MAX_POINTS):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self.max_points = max_points
+        self.offsets = {}   # CSV path -> (byte offset, header line, data rows before the offset)
+        self.pending = {}   # Parquet path -> (size, mtime) seen on the previous poll
+        self.done = set()
+        self.progress = {}  # file name -> rows ingested from it
+        self.frame = pd.DataFrame(columns=LIVE_FEED_COLUMNS + ['FILE', 'ROW'])
+        self.files_read = 0
+        self.last_poll = None
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def detections(self):
+        # Rows ingested from the drop directory so far
+        return sum(self.progress.values())
+
+    def subscribe(self, listener):
+        # listener(df) is called with every ingested batch (normalized to the archive schema)
+        self.listeners.append(listener)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-feed', daemon=True)
+                self._thread.start()
+                print(f"Watching {os.path.abspath(self.directory)} for new fire detections (pid {os.getpid()})")
+        return self
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Live feed poll failed: {e}")
+            time.sleep(self.poll_seconds)
+
+    def _read_csv(self, path, size):
+        offset, header, rows = self.offsets.get(path, (0, b'', 0))
+        if size < offset:
+            # Truncated or replaced: start over
+            offset, header, rows = 0, b'', 0
+        if size == offset:
+            return None, rows
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(size - offset)
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return None, rows
+        data = data[:end]
+        if not header:
+            newline = data.index(b'\n') + 1
+            header, data = data[:newline], data[newline:]
+        df = pd.read_csv(io.BytesIO(header + data)) if data else None
+        self.offsets[path] = (offset + end, header, rows + (0 if df is None else len(df)))
+        return df, rows
+
+    def _read_parquet(self, path, stat):
+        # Only once the file has stopped growing between two polls
+        signature = (stat.st_size, stat.st_mtime)
+        if self.pending.get(path) != signature:
+            self.pending[path] = signature
+            return None, 0
+        del self.pending[path]
+        self.done.add(path)
+        return pd.read_parquet(path), 0
+
+    def poll(self):
+        # One pass over the drop directory; returns the number of new detections
+        self.last_poll = time.time()
+        if not os.path.isdir(self.directory):
+            return 0
+        batches = []
+        for entry in sorted(os.scandir(self.directory), key=lambda entry: entry.name):
+            if entry.path in self.done or not entry.is_file():
+                continue
+            stat = entry.stat()
+            if entry.name.endswith('.csv'):
+                df, first_row = self._read_csv(entry.path, stat.st_size)
+            elif entry.name.endswith('.parquet'):
+                df, first_row = self._read_parquet(entry.path, stat)
+            else:
+                continue
+            if df is not None and len(df):
+                df = normalize_frame(df)
+                df['FILE'] = entry.name
+                df['ROW'] = np.arange(first_row, first_row + len(df), dtype=np.int64)
+                batches.append(df)
+                self.files_read += 1
+        if not batches:
+            return 0
+        batch = pd.concat(batches, ignore_index=True)
+        self.ingest(batch)
+        return len(batch)
+
+    def ingest(self, batch):
+        # batch carries FILE and ROW (the detection's source position) next to the archive columns
+        columns = LIVE_FEED_COLUMNS + ['FILE', 'ROW']
+        with self._lock:
+            # Concatenating onto the empty initial frame would turn every column into object dtype
+            frame = pd.concat([self.frame, batch[columns]], ignore_index=True) if len(self.frame) else \
+                batch[columns].reset_index(drop=True)
+            self.frame = frame.iloc[max(len(frame) - self.max_points, 0):].reset_index(drop=True)
+            for name, last_row in batch.groupby('FILE')['ROW'].max().items():
+                self.progress[name] = max(self.progress.get(name, 0), int(last_row) + 1)
+        for listener in self.listeners:
+            listener(batch.drop(columns=['FILE', 'ROW']))
+
+    def since(self, cursor):
+        # (rows past the cursor still in the buffer, new cursor); a None cursor means a new client
+        cursor = dict(cursor or {})
+        with self._lock:
+            seen = self.frame['FILE'].map(cursor).fillna(0).to_numpy(dtype=np.int64)
+            rows = self.frame[self.frame['ROW'].to_numpy() >= seen]
+            for name, count in self.progress.items():
+                cursor[name] = max(cursor.get(name, 0), count)
+        return rows[LIVE_FEED_COLUMNS], cursor
+
+
+def load_live_feed():
+    # Shared feed; the watcher thread is started per server process by start_live_feed / register_live_feed
+    global live_feed
+    if live_feed is None:
+        live_feed = LiveFeed()
+    return live_feed
+
+
+def start_live_feed():
+    return load_live_feed().start()
+
+
+def register_live_feed(server):
+    # Starts the watcher in the process that serves requests (each gunicorn worker, after the fork) rather than
+    # at import, where it would run in the preloading master or in tools that only import the pages
+    @server.before_request
+    def ensure_live_feed():
+        if load_live_feed()._thread is None:
+            start_live_feed()
@@ -0,0 +1,179 @@
+import functools
+import threading
+import time
+
+import flask
+
+from utils.profiler import finish_profile, start_profile
+
+# Latency buckets (seconds) and payload buckets (bytes)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PAYLOAD_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        with _lock:
+            self.values[tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.values = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with _lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+
+_lock = threading.Lock()
+_local = threading.local()
+
+callback_wall_seconds = Histogram('dash_callback_wall_seconds', 'Wall-clock time spent in a Dash callback.')
+callback_cpu_seconds = Histogram('dash_callback_cpu_seconds', 'CPU time spent in a Dash callback thread.')
+callback_payload_bytes = Histogram('dash_callback_payload_bytes', 'Serialized size of a callback response body.',
+                                   buckets=PAYLOAD_BUCKETS)
+callback_errors = Counter('dash_callback_errors_total', 'Callbacks that raised an exception.')
+figure_seconds = Histogram('dash_figure_seconds', 'Time spent building an individual figure.')
+api_calls = Counter('outbound_api_calls_total', 'Outbound API requests made while serving callbacks.')
+fire_data_load_seconds = Gauge('fire_data_load_seconds', 'Time taken to load the fire archive.')
+
+_metrics = [callback_wall_seconds, callback_cpu_seconds, callback_payload_bytes, callback_errors, figure_seconds,
+            api_calls, fire_data_load_seconds]
+_collectors = []
+
+
+def register_collector(collector):
+    # collector() returns a list of (name, type, documentation, value) samples rendered at scrape time
+    _collectors.append(collector)
+
+
+def current_callback():
+    return getattr(_local, 'callback', None)
+
+
+def count_api_call(provider, endpoint):
+    api_calls.inc(provider=provider, endpoint=endpoint, callback=current_callback() or 'none')
+
+
+def instrument_callback(name):
+    # Records wall time and CPU time for a Dash callback and profiles it on request; the response size is
+    # recorded by the register_payload_metrics hook once Dash has serialized the outputs
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = current_callback()
+            _local.callback = name
+            if flask.has_request_context():
+                flask.g.dash_callback = name
+            profile = start_profile(name)
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                callback_errors.inc(callback=name)
+                raise
+            finally:
+                callback_wall_seconds.observe(time.perf_counter() - wall_start, callback=name)
+                callback_cpu_seconds.observe(time.thread_time() - cpu_start, callback=name)
+                _local.callback = previous
+                if profile is not None:
+                    finish_profile(profile, name)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def register_payload_metrics(server, paths=('/_dash-update-component',)):
+    # Size of each callback response as Dash serialized it, read from the response rather than serializing again.
+    # Register after register_compression: after_request hooks run last-registered first, so this sees the
+    # uncompressed body.
+    @server.after_request
+    def record_payload_size(response):
+        if flask.request.path.endswith(paths) and response.status_code == 200:
+            size = response.calculate_content_length()
+            if size is None:
+                size = response.content_length
+            if size is not None:
+                callback_payload_bytes.observe(size, callback=flask.g.get('dash_callback', 'none'))
+        return response
+
+
+class FigureTimer:
+    # Call lap(figure) after building each figure to record the time since the previous lap
+    def __init__(self, callback):
+        self.callback = callback
+        self.last = time.perf_counter()
+
+    def lap(self, figure):
+        now = time.perf_counter()
+        figure_seconds.observe(now - self.last, callback=self.callback, figure=figure)
+        self.last = now
+
+
+def render_metrics():
+    lines = []
+    with _lock:
+        for metric in _metrics:
+            lines.extend(metric.render())
+    for collector in _collectors:
+        for name, metric_type, documentation, value in collector():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,497 @@
+import heapq
+import math
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+# Path to an OSM extract (.osm) or a preprocessed graph (.npz)
+OFFLINE_ROUTING_GRAPH = os.environ.get('OFFLINE_ROUTING_GRAPH', 'data/road_network.npz')
+
+# Free-flow speeds (km/h) used when a way has no usable maxspeed tag
+HIGHWAY_SPEEDS_KPH = {
+    'motorway': 110, 'motorway_link': 60,
+    'trunk': 90, 'trunk_link': 50,
+    'primary': 70, 'primary_link': 45,
+    'secondary': 60, 'secondary_link': 40,
+    'tertiary': 50, 'tertiary_link': 35,
+    'unclassified': 40, 'residential': 30,
+    'living_street': 15, 'service': 20,
+}
+
+# Points farther than this from every road node of the extract are not routed (instead of snapping far away)
+OFFLINE_ROUTING_MAX_SNAP_M = float(os.environ.get('OFFLINE_ROUTING_MAX_SNAP_M', 2000))
+# Options the local graph can honour: free-flow car routing, fastest or shortest; there are no tags for avoidances
+OFFLINE_ROUTE_TYPES = ('fastest', 'short')
+OFFLINE_TRAVEL_MODES = ('car',)
+
+# Witness searches give up after settling this many nodes (adds a few redundant shortcuts, never wrong routes)
+WITNESS_SETTLE_LIMIT = 60
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371000.0 * np.arcsin(np.sqrt(a))
+
+
+def _parse_maxspeed(value, default):
+    if not value:
+        return default
+    try:
+        if value.endswith('mph'):
+            return float(value[:-3].strip()) * 1.609
+        return float(value.split()[0])
+    except ValueError:
+        return default
+
+
+def load_osm_extract(path):
+    # Stream an OSM XML extract and return the drivable road network as edge arrays
+    node_coords = {}
+    src, dst, speeds = [], [], []
+
+    for _, elem in ET.iterparse(path, events=('end',)):
+        if elem.tag == 'node':
+            node_coords[int(elem.get('id'))] = (float(elem.get('lat')), float(elem.get('lon')))
+            elem.clear()
+        elif elem.tag == 'way':
+            tags = {tag.get('k'): tag.get('v') for tag in elem.iter('tag')}
+            highway = tags.get('highway')
+            if highway in HIGHWAY_SPEEDS_KPH:
+                refs = [int(nd.get('ref')) for nd in elem.iter('nd')]
+                speed = _parse_maxspeed(tags.get('maxspeed'), HIGHWAY_SPEEDS_KPH[highway])
+                oneway = tags.get('oneway')
+                if oneway is None and (highway == 'motorway' or tags.get('junction') == 'roundabout'):
+                    oneway = 'yes'
+                if oneway == '-1':
+                    refs.reverse()
+                for a, b in zip(refs[:-1], refs[1:]):
+                    src.append(a)
+                    dst.append(b)
+                    speeds.append(speed)
+                    if oneway not in ('yes', 'true', '1', '-1'):
+                        src.append(b)
+                        dst.append(a)
+                        speeds.append(speed)
+            elem.clear()
+
+    # Keep only nodes referenced by drivable ways and renumber them 0..n-1
+    used = [ref for ref in dict.fromkeys(src + dst) if ref in node_coords]
+    index = {ref: i for i, ref in enumerate(used)}
+    lat = np.array([node_coords[ref][0] for ref in used])
+    lon = np.array([node_coords[ref][1] for ref in used])
+
+    keep = [i for i, (a, b) in enumerate(zip(src, dst)) if a in index and b in index]
+    src = np.array([index[src[i]] for i in keep], dtype=np.int64)
+    dst = np.array([index[dst[i]] for i in keep], dtype=np.int64)
+    speeds = np.array([speeds[i] for i in keep])
+
+    lengths = haversine_m(lat[src], lon[src], lat[dst], lon[dst])
+    weights = lengths / (speeds / 3.6)
+    return lat, lon, src, dst, weights, lengths
+
+
+def _to_csr(num_nodes, src, dst, *columns):
+    order = np.lexsort((dst, src))
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.add.at(indptr, src + 1, 1)
+    return (np.cumsum(indptr), dst[order]) + tuple(column[order] for column in columns)
+
+
+class ContractionHierarchy:
+    # Road graph preprocessed into upward forward/backward CSR arrays for bidirectional Dijkstra (fastest routes),
+    # plus the original edges for A* on length (shortest routes), which the travel-time shortcuts cannot answer
+
+    def __init__(self, lat, lon, rank, forward, backward, edges=None):
+        self.lat = lat
+        self.lon = lon
+        self.rank = rank
+        # Each direction is (indptr, indices, weights, lengths, middle); middle == -1 marks an original edge
+        self.forward = forward
+        self.backward = backward
+        # Original edges as (indptr, indices, weights, lengths); None for graphs preprocessed without them
+        self.edges = edges
+        self._forward_lists = [np.asarray(array).tolist() for array in forward]
+        self._backward_lists = [np.asarray(array).tolist() for array in backward]
+        self._edge_lists = [np.asarray(array).tolist() for array in edges] if edges is not None else None
+        self._radians = (np.radians(lat).tolist(), np.radians(lon).tolist())
+        self._rank_list = rank.tolist()
+        lat0 = np.radians(np.mean(lat)) if len(lat) else 0.0
+        self._lon_scale = np.cos(lat0)
+        self._tree = cKDTree(np.column_stack([lat, lon * self._lon_scale]))
+
+    @classmethod
+    def build(cls, lat, lon, src, dst, weights, lengths):
+        num_nodes = len(lat)
+        edges = _to_csr(num_nodes, src, dst, weights, lengths)
+        out_edges = [dict() for _ in range(num_nodes)]
+        in_edges = [dict() for _ in range(num_nodes)]
+        for u, w, weight, length in zip(src.tolist(), dst.tolist(), weights.tolist(), lengths.tolist()):
+            if u == w:
+                continue
+            if w not in out_edges[u] or weight < out_edges[u][w][0]:
+                out_edges[u][w] = (weight, length, -1)
+                in_edges[w][u] = (weight, length, -1)
+
+        contracted = [False] * num_nodes
+        deleted_neighbors = [0] * num_nodes
+
+        def witness_distances(source, skip, max_weight, targets):
+            dist = {source: 0.0}
+            heap = [(0.0, source)]
+            remaining = set(targets)
+            settled = 0
+            while heap and remaining:
+                d, u = heapq.heappop(heap)
+                if d > dist[u]:
+                    continue
+                if d > max_weight or settled >= WITNESS_SETTLE_LIMIT:
+                    break
+                settled += 1
+                remaining.discard(u)
+                for w, (weight, _, _) in out_edges[u].items():
+                    if w == skip or contracted[w]:
+                        continue
+                    nd = d + weight
+                    if nd < dist.get(w, float('inf')):
+                        dist[w] = nd
+                        heapq.heappush(heap, (nd, w))
+            return dist
+
+        def shortcuts_for(v):
+            shortcuts = []
+            outgoing = out_edges[v]
+            if not outgoing:
+                return shortcuts
+            max_out = max(weight for weight, _, _ in outgoing.values())
+            for u, (w_in, l_in, _) in in_edges[v].items():
+                targets = [w for w in outgoing if w != u]
+                if not targets:
+                    continue
+                dist = witness_distances(u, v, w_in + max_out, targets)
+                for w in targets:
+                    w_out, l_out, _ = outgoing[w]
+                    via = w_in + w_out
+                    if dist.get(w, float('inf')) > via:
+                        shortcuts.append((u, w, via, l_in + l_out))
+            return shortcuts
+
+        def priority(v):
+            return len(shortcuts_for(v)) - len(in_edges[v]) - len(out_edges[v]) + deleted_neighbors[v]
+
+        heap = [(priority(v), v) for v in range(num_nodes)]
+        heapq.heapify(heap)
+        rank = np.zeros(num_nodes, dtype=np.int64)
+        forward_rows, backward_rows = [], []
+        order = 0
+        while heap:
+            _, v = heapq.heappop(heap)
+            if contracted[v]:
+                continue
+            # Lazy update: re-evaluate and defer if the node is no longer the cheapest
+            current = priority(v)
+            if heap and current > heap[0][0]:
+                heapq.heappush(heap, (current, v))
+                continue
+
+            for u, w, weight, length in shortcuts_for(v):
+                existing = out_edges[u].get(w)
+                if existing is None or weight < existing[0]:
+                    out_edges[u][w] = (weight, length, v)
+                    in_edges[w][u] = (weight, length, v)
+
+            # Every remaining neighbour will be ranked above v, so its edges are upward edges
+            for w, (weight, length, middle) in out_edges[v].items():
+                forward_rows.append((v, w, weight, length, middle))
+                del in_edges[w][v]
+                deleted_neighbors[w] += 1
+            for u, (weight, length, middle) in in_edges[v].items():
+                backward_rows.append((v, u, weight, length, middle))
+                del out_edges[u][v]
+                deleted_neighbors[u] += 1
+            out_edges[v] = {}
+            in_edges[v] = {}
+            contracted[v] = True
+            rank[v] = order
+            order += 1
+
+        def pack(rows):
+            if rows:
+                columns = [np.array(column) for column in zip(*rows)]
+            else:
+                columns = [np.zeros(0, dtype=np.int64)] * 2 + [np.zeros(0)] * 2 + [np.zeros(0, dtype=np.int64)]
+            return _to_csr(num_nodes, columns[0].astype(np.int64), columns[1].astype(np.int64),
+                           columns[2].astype(np.float64), columns[3].astype(np.float64),
+                           columns[4].astype(np.int64))
+
+        return cls(lat, lon, rank, pack(forward_rows), pack(backward_rows), edges)
+
+    def save(self, path):
+        arrays = {'lat': self.lat, 'lon': self.lon, 'rank': self.rank}
+        for prefix, csr in (('fwd', self.forward), ('bwd', self.backward), ('edge', self.edges or ())):
+            for name, array in zip(('indptr', 'indices', 'weights', 'lengths', 'middle'), csr):
+                arrays[f'{prefix}_{name}'] = array
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        names = ('indptr', 'indices', 'weights', 'lengths', 'middle')
+        forward = tuple(data[f'fwd_{name}'] for name in names)
+        backward = tuple(data[f'bwd_{name}'] for name in names)
+        edges = tuple(data[f'edge_{name}'] for name in names[:4]) if 'edge_indptr' in data else None
+        return cls(data['lat'], data['lon'], data['rank'], forward, backward, edges)
+
+    @classmethod
+    def from_path(cls, path):
+        if path.endswith('.npz'):
+            return cls.load(path)
+        # Reuse the preprocessed graph saved next to the extract unless the extract is newer
+        npz_path = os.path.splitext(path)[0] + '.npz'
+        if os.path.exists(npz_path) and os.path.getmtime(npz_path) >= os.path.getmtime(path):
+            ch = cls.load(npz_path)
+            # Graphs preprocessed before shortest routing was supported are rebuilt with their original edges
+            if ch.edges is not None:
+                return ch
+        start_time = time.time()
+        ch = cls.build(*load_osm_extract(path))
+        print(f"Time taken to preprocess road network: {time.time() - start_time} seconds")
+        ch.save(npz_path)
+        return ch
+
+    @property
+    def supports_shortest(self):
+        return self.edges is not None
+
+    def nearest_node(self, lat, lon, max_distance_m=OFFLINE_ROUTING_MAX_SNAP_M):
+        # Closest road node, or None when it is farther than max_distance_m (e.g. a point outside the extract)
+        if not len(self.lat):
+            return None
+        _, node = self._tree.query([lat, lon * self._lon_scale])
+        node = int(node)
+        if haversine_m(lat, lon, self.lat[node], self.lon[node]) > max_distance_m:
+            return None
+        return node
+
+    def _search_step(self, heap, dist, parent, lists):
+        indptr, indices, weights, _, _ = lists
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            return None
+        for i in range(indptr[u], indptr[u + 1]):
+            w = indices[i]
+            nd = d + weights[i]
+            if nd < dist.get(w, float('inf')):
+                dist[w] = nd
+                parent[w] = u
+                heapq.heappush(heap, (nd, w))
+        return u, d
+
+    def shortest_path(self, source, target):
+        # Returns (node path, travel time in seconds, length in metres), or (None, None, None) when unreachable
+        if source == target:
+            return [source], 0.0, 0.0
+        dist_f, dist_b = {source: 0.0}, {target: 0.0}
+        parent_f, parent_b = {source: -1}, {target: -1}
+        heap_f, heap_b = [(0.0, source)], [(0.0, target)]
+        best, meet = float('inf'), -1
+
+        while heap_f or heap_b:
+            top_f = heap_f[0][0] if heap_f else float('inf')
+            top_b = heap_b[0][0] if heap_b else float('inf')
+            if min(top_f, top_b) >= best:
+                break
+            if top_f <= top_b:
+                settled = self._search_step(heap_f, dist_f, parent_f, self._forward_lists)
+                other = dist_b
+            else:
+                settled = self._search_step(heap_b, dist_b, parent_b, self._backward_lists)
+                other = dist_f
+            if settled is not None:
+                u, d = settled
+                if u in other and d + other[u] < best:
+                    best, meet = d + other[u], u
+
+        if meet < 0:
+            return None, None, None
+
+        up_path = []
+        node = meet
+        while node != -1:
+            up_path.append(node)
+            node = parent_f[node]
+        up_path.reverse()
+        node = parent_b[meet]
+        while node != -1:
+            up_path.append(node)
+            node = parent_b[node]
+
+        path, length = [up_path[0]], 0.0
+        for a, b in zip(up_path[:-1], up_path[1:]):
+            segment, segment_length = self._unpack(a, b)
+            path.extend(segment)
+            length += segment_length
+        return path, best, length
+
+    def shortest_length_path(self, source, target):
+        # A* over the original edges by length, with the great-circle distance to the target as the (admissible)
+        # heuristic; returns (node path, travel time in seconds, length in metres) like shortest_path
+        if source == target:
+            return [source], 0.0, 0.0
+        indptr, indices, weights, lengths = self._edge_lists
+        lat, lon = self._radians
+        target_lat, target_lon = lat[target], lon[target]
+        cos_target = math.cos(target_lat)
+
+        def remaining(node):
+            a = (math.sin((target_lat - lat[node]) / 2) ** 2 +
+                 math.cos(lat[node]) * cos_target * math.sin((target_lon - lon[node]) / 2) ** 2)
+            return 2 * 6371000.0 * math.asin(math.sqrt(min(a, 1.0)))
+
+        dist, seconds, parent = {source: 0.0}, {source: 0.0}, {source: -1}
+        heap = [(remaining(source), 0.0, source)]
+        closed = set()
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u in closed:
+                continue
+            if u == target:
+                break
+            closed.add(u)
+            for i in range(indptr[u], indptr[u + 1]):
+                w = indices[i]
+                nd = d + lengths[i]
+                if nd < dist.get(w, float('inf')):
+                    dist[w] = nd
+                    seconds[w] = seconds[u] + weights[i]
+                    parent[w] = u
+                    heapq.heappush(heap, (nd + remaining(w), nd, w))
+        if target not in dist:
+            return None, None, None
+
+        path, node = [], target
+        while node != -1:
+            path.append(node)
+            node = parent[node]
+        path.reverse()
+        return path, seconds[target], dist[target]
+
+    def _edge(self, a, b):
+        # Upward edges are stored at their lower-ranked endpoint
+        if self._rank_list[a] < self._rank_list[b]:
+            indptr, indices, _, lengths, middle = self._forward_lists
+            low, high = a, b
+        else:
+            indptr, indices, _, lengths, middle = self._backward_lists
+            low, high = b, a
+        for i in range(indptr[low], indptr[low + 1]):
+            if indices[i] == high:
+                return lengths[i], middle[i]
+        raise KeyError((a, b))
+
+    def _unpack(self, a, b):
+        # Expand a (possibly shortcut) edge into original nodes, excluding a
+        nodes, length = [], 0.0
+        stack = [(a, b)]
+        while stack:
+            u, w = stack.pop()
+            edge_length, middle = self._edge(u, w)
+            if middle < 0:
+                nodes.append(w)
+                length += edge_length
+            else:
+                stack.append((middle, w))
+                stack.append((u, middle))
+        return nodes, length
+
+    def route(self, origin, destination, route_type='fastest'):
+        # (coords, travel time in seconds, length in metres), or None when an endpoint is off the network or
+        # the endpoints are not connected; route_type 'short' minimises length instead of travel time
+        source = self.nearest_node(*origin)
+        target = self.nearest_node(*destination)
+        if source is None or target is None:
+            return None
+        if route_type == 'short':
+            path, seconds, length = self.shortest_length_path(source, target)
+        else:
+            path, seconds, length = self.shortest_path(source, target)
+        if path is None:
+            return None
+        coords = list(zip(self.lat[path].tolist(), self.lon[path].tolist()))
+        return coords, seconds, length
+
+
+_router = None
+
+
+def get_offline_router(path=None):
+    global _router
+    if _router is None:
+        start_time = time.time()
+        _router = ContractionHierarchy.from_path(path or OFFLINE_ROUTING_GRAPH)
+        print(f"Time taken to load road network: {time.time() - start_time} seconds")
+    return _router
+
+
+def _parse_coords(coords):
+    if isinstance(coords, str):
+        coords = coords.split(',')
+    return tuple(float(value) for value in coords)
+
+
+def unsupported_offline_options(route_type=None, travel_mode=None, avoid=None, router=None):
+    # Descriptions of the requested options the local road network cannot honour (empty when all can be)
+    unsupported = []
+    if route_type and route_type not in OFFLINE_ROUTE_TYPES:
+        unsupported.append(f"route type '{route_type}'")
+    elif route_type == 'short' and not (router or get_offline_router()).supports_shortest:
+        unsupported.append("shortest routes (re-run `python -m utils.offline_routing` on the extract)")
+    if travel_mode and travel_mode not in OFFLINE_TRAVEL_MODES:
+        unsupported.append(f"travel mode '{travel_mode}'")
+    if avoid:
+        unsupported.append(f"avoiding {avoid}")
+    return unsupported
+
+
+def calculate_offline_routes(start_coords, end_coords, depart_at=None, route_type='fastest', travel_mode=None,
+                             avoid=None):
+    # Same shape as page1.calculate_routes: [(eta, travel time in hours, [(lat, lon), ...])]
+    unsupported = unsupported_offline_options(route_type, travel_mode, avoid)
+    if unsupported:
+        raise ValueError(f"Offline routing does not support {', '.join(unsupported)}")
+    result = get_offline_router().route(_parse_coords(start_coords), _parse_coords(end_coords), route_type or 'fastest')
+    if result is None:
+        return []
+    coords, seconds, _ = result
+    departure = datetime.fromisoformat(depart_at) if depart_at else datetime.now()
+    eta = (departure + timedelta(seconds=seconds)).isoformat(timespec='seconds')
+    return [(eta, seconds / 3600, coords)]
+
+
+def get_offline_directions(origin_coords, destination_coords):
+    # Same shape as page2.get_directions: [([(lat, lon), ...], distance text, duration text)]
+    result = get_offline_router().route(_parse_coords(origin_coords), _parse_coords(destination_coords))
+    if result is None:
+        return []
+    coords, seconds, length = result
+    return [(coords, f"{length / 1000:.1f} km", f"{round(seconds / 60)} mins")]
+
+
+if __name__ == "__main__":
+    # python -m utils.offline_routing extract.osm [graph.npz]
+    source_path = sys.argv[1]
+    output_path = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source_path)[0] + '.npz'
+    start_time = time.time()
+    arrays = load_osm_extract(source_path)
+    print(f"Loaded {len(arrays[0])} nodes and {len(arrays[2])} edges in {time.time() - start_time:.1f} seconds")
+    start_time = time.time()
+    hierarchy = ContractionHierarchy.build(*arrays)
+    print(f"Contracted graph in {time.time() - start_time:.1f} seconds "
+          f"({len(hierarchy.forward[1]) + len(hierarchy.backward[1])} upward edges)")
+    hierarchy.save(output_path)
+    print(f"Saved {output_path}")
@@ -0,0 +1,214 @@
+import collections
+import hmac
+import json
+import os
+import re
+import sys
+import sysconfig
+import threading
+import time
+
+import flask
+
+# Profiling is off unless an admin token is configured; requests carrying it in PROFILER_HEADER have every
+# instrumented callback they trigger profiled, and /profiler/arm profiles the next calls of one callback
+PROFILER_TOKEN = os.environ.get('PROFILER_TOKEN')
+PROFILER_HEADER = 'X-Profiler-Token'
+PROFILER_DIR = os.environ.get('PROFILER_DIR', 'cache/profiles')
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))
+PROFILER_KEEP = int(os.environ.get('PROFILER_KEEP', 50))
+
+# Top-level packages grouped for the breakdown; a sample counts towards the group of its outermost such frame
+# below the callback, so numpy called from pandas is pandas time and the socket read under requests is HTTP time
+LIBRARY_GROUPS = {
+    'pandas': 'pandas',
+    'statsmodels': 'statsmodels',
+    'datashader': 'datashader',
+    'requests': 'http', 'urllib3': 'http', 'http': 'http', 'socket': 'http', 'ssl': 'http', 'googlemaps': 'http',
+    'plotly': 'plotly',
+    'numpy': 'numpy',
+}
+
+_library_paths = sorted({os.path.realpath(path) + os.sep for path in
+                         (sysconfig.get_paths()['purelib'], sysconfig.get_paths()['platlib'],
+                          sysconfig.get_paths()['stdlib'])}, key=len, reverse=True)
+_armed = {}
+_armed_lock = threading.Lock()
+_code_labels = {}
+
+
+def _short_path(filename):
+    # Path inside site-packages/stdlib, else relative to the working directory
+    path = os.path.realpath(filename)
+    for prefix in _library_paths:
+        if path.startswith(prefix):
+            return path[len(prefix):]
+    return os.path.relpath(path)
+
+
+def _describe(code):
+    # (flamegraph frame label, library group) per code object, memoised since the same few hundred recur
+    described = _code_labels.get(code)
+    if described is None:
+        path = _short_path(code.co_filename)
+        package = re.split(r'[/\\.]', path, maxsplit=1)[0]
+        described = (f"{code.co_name} ({path}:{code.co_firstlineno})".replace(';', ':'),
+                     LIBRARY_GROUPS.get(package))
+        _code_labels[code] = described
+    return described
+
+
+class StackSampler:
+    # Samples one thread's Python stack above root every interval from a helper thread (sys._current_frames),
+    # so the profiled callback runs unmodified; the cost is the helper taking the GIL briefly once per interval
+
+    def __init__(self, thread_id, root, interval=PROFILER_INTERVAL):
+        self.thread_id = thread_id
+        self.root = root
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self.started = time.time()
+        self.wall_start = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            codes = []
+            while frame is not None and frame is not self.root:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            if codes:
+                self.stacks[tuple(codes)] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.wall_seconds = time.perf_counter() - self.wall_start
+        return self
+
+    def folded(self):
+        # Brendan Gregg's folded format (root first, one stack per line) for flamegraph.pl or speedscope
+        lines = collections.Counter()
+        for codes, count in self.stacks.items():
+            lines[';'.join(_describe(code)[0] for code in reversed(codes))] += count
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(lines.items()))
+
+    def breakdown(self):
+        # Estimated seconds per library group, from each group's share of the samples
+        samples = collections.Counter()
+        for codes, count in self.stacks.items():
+            groups = (_describe(code)[1] for code in reversed(codes))
+            samples[next((group for group in groups if group), 'app')] += count
+        total = sum(samples.values())
+        return {group: {'samples': count, 'share': count / total, 'seconds': self.wall_seconds * count / total}
+                for group, count in samples.most_common()}
+
+
+def _valid_token(token):
+    return bool(PROFILER_TOKEN) and token is not None and hmac.compare_digest(token, PROFILER_TOKEN)
+
+
+def start_profile(callback):
+    # A running StackSampler when this call should be profiled, else None (the common, cheap path)
+    if not PROFILER_TOKEN:
+        return None
+    requested = flask.has_request_context() and _valid_token(flask.request.headers.get(PROFILER_HEADER))
+    if not requested and _armed:
+        with _armed_lock:
+            if _armed.get(callback, 0) > 0:
+                _armed[callback] -= 1
+                if not _armed[callback]:
+                    del _armed[callback]
+                requested = True
+    if not requested:
+        return None
+    # Stacks are cut at the caller (the instrument_callback wrapper), leaving the server frames out
+    return StackSampler(threading.get_ident(), sys._getframe(1)).start()
+
+
+def finish_profile(sampler, callback):
+    sampler.stop()
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S', time.localtime(sampler.started))}-{callback}-{threading.get_ident()}"
+    summary = {
+        'id': profile_id,
+        'callback': callback,
+        'started': sampler.started,
+        'wall_seconds': sampler.wall_seconds,
+        'interval': sampler.interval,
+        'samples': sum(sampler.stacks.values()),
+        'breakdown': sampler.breakdown(),
+    }
+    try:
+        os.makedirs(PROFILER_DIR, exist_ok=True)
+        with open(os.path.join(PROFILER_DIR, f'{profile_id}.folded'), 'w') as f:
+            f.write(sampler.folded())
+        with open(os.path.join(PROFILER_DIR, f'{profile_id}.json'), 'w') as f:
+            json.dump(summary, f, indent=2)
+        _prune()
+    except OSError as e:
+        print(f"Could not store profile {profile_id}: {e}")
+    return summary
+
+
+def _prune():
+    summaries = sorted(name for name in os.listdir(PROFILER_DIR) if name.endswith('.json'))
+    for name in summaries[:max(len(summaries) - PROFILER_KEEP, 0)]:
+        for extension in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(PROFILER_DIR, name[:-len('.json')] + extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILER_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILER_DIR), reverse=True):
+        if name.endswith('.json'):
+            with open(os.path.join(PROFILER_DIR, name)) as f:
+                profiles.append(json.load(f))
+    return profiles
+
+
+def register_profiler(server):
+    # POST /profiler/arm?callback=page1.update_map&count=1   profile the next calls of a callback (this process)
+    # GET  /profiler/profiles                                stored profiles with their library breakdown
+    # GET  /profiler/profiles/<id>.folded                    flamegraph input
+    # All need the admin token in the X-Profiler-Token header or a token= parameter
+    def authorize():
+        if not _valid_token(flask.request.headers.get(PROFILER_HEADER) or flask.request.args.get('token')):
+            flask.abort(404)
+
+    @server.route('/profiler/arm', methods=['POST'])
+    def arm_profiler():
+        authorize()
+        callback = flask.request.args.get('callback')
+        if not callback:
+            flask.abort(400, description='callback is required, e.g. sub_page3a.update_summary')
+        try:
+            count = max(int(flask.request.args.get('count', 1)), 0)
+        except ValueError:
+            flask.abort(400, description='count must be an integer')
+        with _armed_lock:
+            if count:
+                _armed[callback] = count
+            else:
+                _armed.pop(callback, None)
+            return flask.jsonify(dict(_armed))
+
+    @server.route('/profiler/profiles')
+    def profiles():
+        authorize()
+        return flask.jsonify(list_profiles())
+
+    @server.route('/profiler/profiles/<profile_id>.folded')
+    def folded_profile(profile_id):
+        authorize()
+        return flask.send_from_directory(os.path.abspath(PROFILER_DIR), f'{profile_id}.folded', mimetype='text/plain')
@@ -0,0 +1,169 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_data import load_fire_data
+from utils.regions import assign_regions, load_region_index
+
+# Relative accuracy of every quantile answered from the sketches (0.01 = within 1% of the true value)
+SKETCH_RELATIVE_ACCURACY = float(os.environ.get('SKETCH_RELATIVE_ACCURACY', 0.01))
+# Smallest value told apart from zero, per sketched column; anything at or below it shares the first bucket
+SKETCH_COLUMNS = {'BRIGHTNESS': 200.0, 'FRP': 0.01}
+
+distribution_sketches = None
+
+
+class LogBuckets:
+    # DDSketch-style bucketing: bucket k holds (min_value * gamma**(k-1), min_value * gamma**k], so any value
+    # reported for a bucket is within alpha of every value in it and sketches merge by adding counts
+
+    def __init__(self, alpha=SKETCH_RELATIVE_ACCURACY, min_value=1.0, max_value=1e5):
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.min_value = min_value
+        self.n_buckets = self.key(np.array([max_value]))[0] + 1
+
+    def key(self, values):
+        ratio = np.maximum(np.asarray(values, dtype=np.float64) / self.min_value, 1.0)
+        return np.ceil(np.log(ratio) / np.log(self.gamma)).astype(np.int64)
+
+    def value(self, keys):
+        # Representative value of each bucket: its upper bound shrunk by (1 - alpha)
+        return self.min_value * self.gamma ** np.asarray(keys, dtype=np.float64) * 2 / (self.gamma + 1)
+
+    def edges(self):
+        return self.min_value * self.gamma ** np.arange(-1, self.n_buckets)
+
+    def quantiles(self, counts, qs):
+        total = counts.sum()
+        if not total:
+            return np.full(len(qs), np.nan)
+        ranks = np.asarray(qs, dtype=np.float64) * (total - 1)
+        return self.value(np.searchsorted(np.cumsum(counts), ranks, side='right'))
+
+
+class DistributionSketches:
+    # Bucket counts per (day, region, bucket) for each sketched column, kept as sorted sparse entries, plus
+    # cumulative per-month totals: whole months in a range cost one subtraction, the partial months at either
+    # end one bincount over a contiguous run of daily entries
+
+    def __init__(self, region_names, first_day, columns=SKETCH_COLUMNS, alpha=SKETCH_RELATIVE_ACCURACY):
+        self.region_names = region_names
+        self.first_day = first_day
+        self.buckets = {column: LogBuckets(alpha, min_value) for column, min_value in columns.items()}
+        self.first_month = first_day.astype('datetime64[M]')
+        self.entries = {column: (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)) for column in columns}
+        self.monthly = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df, codes, region_names, **kwargs):
+        sketches = cls(region_names, df['ACQ_DATE'].values.astype('datetime64[D]').min(), **kwargs)
+        sketches.update(df, codes)
+        return sketches
+
+    def _encode(self, column, days, codes, buckets):
+        return (days * len(self.region_names) + codes) * self.buckets[column].n_buckets + buckets
+
+    def update(self, df, codes):
+        # Merge new detections (e.g. an ingested batch) into the existing sketches
+        days = (df['ACQ_DATE'].values.astype('datetime64[D]') - self.first_day).astype(np.int64)
+        valid = days >= 0
+        for column, buckets in self.buckets.items():
+            values = df[column].values
+            keep = valid & ~np.isnan(values)
+            keys = self._encode(column, days[keep], np.asarray(codes)[keep].astype(np.int64),
+                                np.minimum(buckets.key(values[keep]), buckets.n_buckets - 1))
+            new_keys, new_counts = np.unique(keys, return_counts=True)
+            with self._lock:
+                old_keys, old_counts = self.entries[column]
+                merged_keys, inverse = np.unique(np.concatenate([old_keys, new_keys]), return_inverse=True)
+                merged_counts = np.bincount(inverse, weights=np.concatenate([old_counts, new_counts]))
+                self.entries[column] = (merged_keys, merged_counts.astype(np.int64))
+                self.monthly[column] = self._rollup(column)
+
+    def _rollup(self, column):
+        # Cumulative (month, region, bucket) counts; row m holds everything before month m
+        keys, counts = self.entries[column]
+        n_buckets, n_regions = self.buckets[column].n_buckets, len(self.region_names)
+        days = keys // (n_regions * n_buckets)
+        months = ((self.first_day + days.astype('timedelta64[D]')).astype('datetime64[M]') -
+                  self.first_month).astype(np.int64)
+        n_months = int(months.max()) + 1 if len(months) else 0
+        totals = np.bincount(months * (n_regions * n_buckets) + keys % (n_regions * n_buckets), weights=counts,
+                             minlength=n_months * n_regions * n_buckets)
+        cumulative = np.zeros((n_months + 1, n_regions, n_buckets))
+        np.cumsum(totals.reshape(n_months, n_regions, n_buckets), axis=0, out=cumulative[1:])
+        return cumulative
+
+    def day_of(self, date):
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.first_day).astype(np.int64))
+
+    def month_start(self, month):
+        return int(((self.first_month + np.timedelta64(month, 'M')).astype('datetime64[D]') -
+                    self.first_day).astype(np.int64))
+
+    def _daily(self, column, start_day, end_day, codes):
+        # Bucket counts from the daily entries for days start_day..end_day - 1
+        keys, counts = self.entries[column]
+        n_buckets = self.buckets[column].n_buckets
+        per_day = len(self.region_names) * n_buckets
+        start, end = np.searchsorted(keys, [start_day * per_day, end_day * per_day])
+        keys, counts = keys[start:end], counts[start:end]
+        if codes is not None:
+            wanted = np.isin((keys // n_buckets) % len(self.region_names), codes)
+            keys, counts = keys[wanted], counts[wanted]
+        return np.bincount(keys % n_buckets, weights=counts, minlength=n_buckets)
+
+    def histogram(self, column, start_date=None, end_date=None, regions=None):
+        # Merged bucket counts for start_date..end_date inclusive, over the named regions (all when None)
+        cumulative = self.monthly[column]
+        n_months = len(cumulative) - 1
+        start_day = 0 if start_date is None else self.day_of(start_date)
+        end_day = self.month_start(n_months) if end_date is None else self.day_of(end_date) + 1
+        codes = [self.region_names.index(region) for region in regions] if regions else None
+        # Whole months inside the range: first month starting on or after start_day up to the last ending by end_day
+        first = int(np.clip(((self.first_day + np.timedelta64(start_day - 1, 'D')).astype('datetime64[M]') -
+                             self.first_month).astype(np.int64) + 1, 0, n_months))
+        last = int(np.clip(((self.first_day + np.timedelta64(end_day, 'D')).astype('datetime64[M]') -
+                            self.first_month).astype(np.int64), 0, n_months))
+        if first >= last:
+            return self._daily(column, start_day, end_day, codes)
+        months = cumulative[last] - cumulative[first]
+        counts = months.sum(axis=0) if codes is None else months[codes].sum(axis=0)
+        return (counts + self._daily(column, start_day, self.month_start(first), codes) +
+                self._daily(column, self.month_start(last), end_day, codes))
+
+    def month_histogram(self, column, month, regions=None):
+        # Merged bucket counts for one calendar month (1-12) of every year, from the per-month totals
+        cumulative = self.monthly[column]
+        n_months = len(cumulative) - 1
+        selected = np.nonzero((self.first_month.astype(np.int64) + np.arange(n_months)) % 12 == month - 1)[0]
+        months = (cumulative[selected + 1] - cumulative[selected]).sum(axis=0)
+        if regions:
+            months = months[[self.region_names.index(region) for region in regions]]
+        return months.sum(axis=0)
+
+    def quantiles(self, column, qs, start_date=None, end_date=None, regions=None):
+        return self.buckets[column].quantiles(self.histogram(column, start_date, end_date, regions), qs)
+
+
+def load_distribution_sketches():
+    global distribution_sketches
+    if distribution_sketches is None:
+        start_time = time.time()
+        region_index = load_region_index()
+        distribution_sketches = DistributionSketches.from_frame(load_fire_data(), region_index.codes,
+                                                                region_index.names)
+        print(f"Time taken to build distribution sketches: {time.time() - start_time} seconds")
+    return distribution_sketches
+
+
+def ingest_batch(batch):
+    # Live-feed listener: fold newly ingested detections into the sketches if they have been built
+    if distribution_sketches is not None and len(batch):
+        codes, _ = assign_regions(batch['LATITUDE'].values, batch['LONGITUDE'].values)
+        distribution_sketches.update(batch, codes)
@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import datashader as ds
+import datashader.transfer_functions as tf
+import xarray as xr
+from colorcet import fire
+
+from utils.fire_data import source_signature
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Directory holding one memory-mapped (period, y, x) count stack per period frequency
+RASTER_STACK_DIR = os.environ.get('RASTER_STACK_DIR', 'data/raster_stack')
+RASTER_WIDTH = 800
+RASTER_HEIGHT = 600
+PERIOD_UNITS = {'year': 'Y', 'month': 'M'}
+
+raster_stacks = {}
+_raster_stack_locks = {freq: threading.Lock() for freq in PERIOD_UNITS}
+
+
+class RasterStack:
+    # Datashader count grids for every period, stored on disk and shaded one slice at a time
+
+    def __init__(self, counts, metadata):
+        self.counts = counts
+        self.metadata = metadata
+        self.periods = metadata['periods']
+        height, width = counts.shape[1:]
+        x0, x1 = metadata['x_range']
+        y0, y1 = metadata['y_range']
+        # Pixel centers, matching the coordinates datashader gives its aggregates
+        self.x = x0 + (np.arange(width) + 0.5) * (x1 - x0) / width
+        self.y = y0 + (np.arange(height) + 0.5) * (y1 - y0) / height
+
+    @classmethod
+    def build(cls, df, freq, path, width=RASTER_WIDTH, height=RASTER_HEIGHT):
+        start_time = time.time()
+        unit = PERIOD_UNITS[freq]
+        periods, codes = np.unique(df['ACQ_DATE'].values.astype(f'datetime64[{unit}]'), return_inverse=True)
+        order = np.argsort(codes, kind='stable')
+        offsets = np.searchsorted(codes[order], np.arange(len(periods) + 1))
+        points = df[['LONGITUDE', 'LATITUDE']].iloc[order].reset_index(drop=True)
+
+        # Every slice shares one canvas so frames line up when stepping through periods
+        x_range = (float(points['LONGITUDE'].min()), float(points['LONGITUDE'].max()))
+        y_range = (float(points['LATITUDE'].min()), float(points['LATITUDE'].max()))
+        cvs = ds.Canvas(plot_width=width, plot_height=height, x_range=x_range, y_range=y_range)
+
+        # Written to temporary files and renamed into place, so a reader never maps a partially written stack
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        counts = np.lib.format.open_memmap(temporary_path + '.npy', mode='w+', dtype=np.uint32,
+                                           shape=(len(periods), height, width))
+        for i in range(len(periods)):
+            counts[i] = cvs.points(points.iloc[offsets[i]:offsets[i + 1]], 'LONGITUDE', 'LATITUDE').values
+        counts.flush()
+
+        metadata = {
+            'freq': freq,
+            'periods': periods.astype(str).tolist(),
+            'x_range': x_range,
+            'y_range': y_range,
+            'max_count': int(counts.max()) if len(periods) else 0,
+            'source': source_signature(df),
+        }
+        with open(temporary_path + '.json', 'w') as f:
+            json.dump(metadata, f)
+        del counts
+        os.replace(temporary_path + '.npy', path + '.npy')
+        os.replace(temporary_path + '.json', path + '.json')
+        print(f"Time taken to build {freq} raster stack: {time.time() - start_time} seconds")
+        return cls(np.load(path + '.npy', mmap_mode='r'), metadata)
+
+    @classmethod
+    def load(cls, path):
+        with open(path + '.json') as f:
+            metadata = json.load(f)
+        return cls(np.load(path + '.npy', mmap_mode='r'), metadata)
+
+    def shade(self, index):
+        # Fixed span across the stack so colors are comparable between frames
+        agg = xr.DataArray(self.counts[index], coords=[('y', self.y), ('x', self.x)])
+        return tf.shade(agg, cmap=fire, how='log', span=[1, max(self.metadata['max_count'], 2)])
+
+
+def load_raster_stack(df, freq='year'):
+    # Stack for the given frequency, rebuilt only when the archive it was built from changed. A per-frequency
+    # thread lock and a file lock beside the stack make concurrent threads and workers wait for a single build;
+    # `python -m utils.raster_stack` builds them ahead of time.
+    with _raster_stack_locks[freq]:
+        if freq not in raster_stacks:
+            path = os.path.join(RASTER_STACK_DIR, freq)
+            os.makedirs(RASTER_STACK_DIR, exist_ok=True)
+            with open(path + '.lock', 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                stack = None
+                if os.path.exists(path + '.json') and os.path.exists(path + '.npy'):
+                    stack = RasterStack.load(path)
+                    if stack.metadata.get('source') != source_signature(df):
+                        stack = None
+                raster_stacks[freq] = stack or RasterStack.build(df, freq, path)
+        return raster_stacks[freq]
+
+
+if __name__ == "__main__":
+    # python -m utils.raster_stack [year|month ...]
+    # Build the stacks ahead of time so the playback view never builds one inside a request
+    from utils.fire_data import load_fire_data
+
+    df = load_fire_data()
+    for freq in sys.argv[1:] or list(PERIOD_UNITS):
+        stack = load_raster_stack(df, freq)
+        print(f"{freq}: {len(stack.periods)} periods, {stack.counts.nbytes / 1e6:.0f} MB")
@@ -0,0 +1,119 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_data import load_fire_data
+
+# Optional polygon layer (any format geopandas reads) replacing the default regions
+REGIONS_SHAPEFILE = os.environ.get('REGIONS_SHAPEFILE')
+REGIONS_NAME_FIELD = os.environ.get('REGIONS_NAME_FIELD', 'NAME')
+
+# Default regions as (name, south, west, north, east); the first matching box wins
+DEFAULT_REGIONS = [
+    ('Pacific Northwest', 42.0, -125.0, 49.5, -116.5),
+    ('California', 32.0, -125.0, 42.0, -114.0),
+    ('Southwest', 31.0, -114.0, 37.0, -103.0),
+    ('Rocky Mountains', 37.0, -116.5, 49.5, -102.0),
+    ('Great Plains', 25.0, -103.0, 49.5, -95.0),
+    ('Midwest', 36.5, -95.0, 49.5, -80.5),
+    ('South', 24.0, -95.0, 36.5, -75.0),
+    ('Northeast', 36.5, -80.5, 47.5, -66.5),
+]
+OTHER_REGION = 'Other'
+
+region_index = None
+
+
+def assign_box_regions(lat, lon, regions=DEFAULT_REGIONS):
+    conditions = [(lat >= south) & (lat < north) & (lon >= west) & (lon < east)
+                  for _, south, west, north, east in regions]
+    codes = np.select(conditions, np.arange(len(regions)), default=len(regions))
+    return codes.astype(np.int16), [name for name, *_ in regions] + [OTHER_REGION]
+
+
+def assign_polygon_regions(lat, lon, path, name_field=REGIONS_NAME_FIELD):
+    # Vectorized point-in-polygon: bounding-box prefilter, then shapely.contains_xy on the candidates
+    import geopandas as gpd
+    import shapely
+
+    shapes = gpd.read_file(path).to_crs(epsg=4326)
+    names = shapes[name_field].astype(str).tolist()
+    # Region names become categories, so they must be unique
+    names = [name if names.count(name) == 1 else f"{name} ({i})" for i, name in enumerate(names)]
+    codes = np.full(len(lat), len(names), dtype=np.int16)
+    for code, geometry in enumerate(shapes.geometry):
+        west, south, east, north = geometry.bounds
+        candidates = np.nonzero((codes == len(names)) & (lat >= south) & (lat <= north) &
+                                (lon >= west) & (lon <= east))[0]
+        if len(candidates):
+            shapely.prepare(geometry)
+            inside = shapely.contains_xy(geometry, lon[candidates], lat[candidates])
+            codes[candidates[inside]] = code
+    return codes, names + [OTHER_REGION]
+
+
+def assign_regions(lat, lon, shapefile=REGIONS_SHAPEFILE):
+    if shapefile:
+        return assign_polygon_regions(lat, lon, shapefile)
+    return assign_box_regions(lat, lon)
+
+
+class RegionIndex:
+    # Region code per detection plus cumulative (day x region) totals for O(regions) date-range aggregates
+
+    def __init__(self, codes, names, days, first_day, brightness, frp):
+        self.codes = codes
+        self.names = names
+        self.first_day = first_day
+        n_days = int(days.max()) + 1 if len(days) else 1
+        n_regions = len(names)
+        flat = days * n_regions + codes
+        size = n_days * n_regions
+        self._cumulative = {
+            'count': np.bincount(flat, minlength=size),
+            'brightness': np.bincount(flat, weights=brightness, minlength=size),
+            'frp': np.bincount(flat, weights=frp, minlength=size),
+        }
+        for name, totals in self._cumulative.items():
+            cumulative = np.zeros((n_days + 1, n_regions), dtype=totals.dtype)
+            np.cumsum(totals.reshape(n_days, n_regions), axis=0, out=cumulative[1:])
+            self._cumulative[name] = cumulative
+        self.n_days = n_days
+
+    @classmethod
+    def from_frame(cls, df, shapefile=REGIONS_SHAPEFILE):
+        codes, names = assign_regions(df['LATITUDE'].values, df['LONGITUDE'].values, shapefile)
+        dates = df['ACQ_DATE'].values.astype('datetime64[D]')
+        first_day = dates.min()
+        days = (dates - first_day).astype(np.int64)
+        return cls(codes, names, days, first_day, df['BRIGHTNESS'].values, df['FRP'].values)
+
+    def day_of(self, date):
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.first_day).astype(np.int64))
+
+    def aggregate(self, start_date=None, end_date=None):
+        # Count, mean brightness and mean FRP per region for start_date..end_date inclusive
+        start = 0 if start_date is None else min(max(self.day_of(start_date), 0), self.n_days)
+        end = self.n_days if end_date is None else min(max(self.day_of(end_date) + 1, 0), self.n_days)
+        end = max(end, start)
+        totals = {name: cumulative[end] - cumulative[start] for name, cumulative in self._cumulative.items()}
+        counts = totals['count']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = pd.DataFrame({
+                'Region': self.names,
+                'counts': counts,
+                'mean_brightness': totals['brightness'] / counts,
+                'mean_frp': totals['frp'] / counts,
+            })
+        return result[result['counts'] > 0].reset_index(drop=True)
+
+
+def load_region_index():
+    global region_index
+    if region_index is None:
+        start_time = time.time()
+        region_index = RegionIndex.from_frame(load_fire_data())
+        print(f"Time taken to assign regions: {time.time() - start_time} seconds")
+    return region_index
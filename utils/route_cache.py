@@ -0,0 +1,170 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Cache settings (overridable through the environment)
+ROUTE_CACHE_ENABLED = os.environ.get('ROUTE_CACHE_ENABLED', '1') != '0'
+ROUTE_CACHE_PATH = os.environ.get('ROUTE_CACHE_PATH', 'cache/routes.sqlite')
+ROUTE_CACHE_MAX_ENTRIES = int(os.environ.get('ROUTE_CACHE_MAX_ENTRIES', 2048))
+ROUTE_CACHE_TTL = int(os.environ.get('ROUTE_CACHE_TTL', 15 * 60))
+ROUTE_CACHE_PERSISTENT_TTL = int(os.environ.get('ROUTE_CACHE_PERSISTENT_TTL', 24 * 60 * 60))
+ROUTE_CACHE_BUCKET_MINUTES = int(os.environ.get('ROUTE_CACHE_BUCKET_MINUTES', 15))
+ROUTE_CACHE_COORD_DECIMALS = int(os.environ.get('ROUTE_CACHE_COORD_DECIMALS', 4))
+# Routes priced on live traffic go stale within minutes: short buckets from the current time, memory tier only
+ROUTE_CACHE_LIVE_TTL = int(os.environ.get('ROUTE_CACHE_LIVE_TTL', 5 * 60))
+ROUTE_CACHE_LIVE_BUCKET_MINUTES = int(os.environ.get('ROUTE_CACHE_LIVE_BUCKET_MINUTES', 5))
+LIVE_TRAFFIC = {'live', 'best_guess'}
+
+
+def round_coords(coords, decimals=ROUTE_CACHE_COORD_DECIMALS):
+    # Accept both "lat,lon" strings (TomTom) and (lat, lon) tuples (Google)
+    if isinstance(coords, str):
+        coords = coords.split(',')
+    lat, lon = (float(value) for value in coords)
+    return f"{round(lat, decimals):.{decimals}f},{round(lon, decimals):.{decimals}f}"
+
+
+def is_live_traffic(traffic):
+    return traffic in LIVE_TRAFFIC
+
+
+def departure_bucket(depart_at, bucket_minutes=ROUTE_CACHE_BUCKET_MINUTES, live=False):
+    now = datetime.now()
+    if not depart_at:
+        depart_at = now
+    elif isinstance(depart_at, str):
+        try:
+            depart_at = datetime.fromisoformat(depart_at)
+        except ValueError:
+            # e.g. TomTom's departAt=now
+            depart_at = now
+    if live:
+        # A departure already past (e.g. a bare date, read as midnight) is priced on the traffic right now
+        depart_at = max(depart_at.replace(tzinfo=None), now)
+        bucket_minutes = ROUTE_CACHE_LIVE_BUCKET_MINUTES
+    minutes = depart_at.hour * 60 + depart_at.minute
+    bucket_start = minutes - minutes % bucket_minutes
+    return f"{depart_at:%Y-%m-%d}T{bucket_start // 60:02}:{bucket_start % 60:02}"
+
+
+def make_route_key(provider, origin, destination, route_type=None, traffic=None, travel_mode=None, avoid=None,
+                   vehicle_commercial=None, depart_at=None):
+    parts = [
+        provider,
+        round_coords(origin),
+        round_coords(destination),
+        route_type or '',
+        traffic or '',
+        travel_mode or '',
+        avoid or '',
+        'commercial' if vehicle_commercial else 'private',
+        departure_bucket(depart_at, live=is_live_traffic(traffic)),
+    ]
+    return '|'.join(parts)
+
+
+class RouteCache:
+    # Two-tier route cache: an in-memory LRU in front of a SQLite table that survives restarts
+
+    def __init__(self, path=ROUTE_CACHE_PATH, max_entries=ROUTE_CACHE_MAX_ENTRIES, ttl=ROUTE_CACHE_TTL,
+                 persistent_ttl=ROUTE_CACHE_PERSISTENT_TTL, enabled=ROUTE_CACHE_ENABLED):
+        self.enabled = enabled
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persistent_ttl = persistent_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.stats = {'hits': 0, 'persistent_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'sets': 0}
+
+    def _connection(self):
+        if self._db is None and self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS routes (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._memory[key]
+                self.stats['expirations'] += 1
+
+            db = self._connection()
+            if db is not None:
+                row = db.execute("SELECT value, expires FROM routes WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if row[1] > now:
+                        value = json.loads(row[0])
+                        self._remember(key, value, min(row[1], now + self.ttl))
+                        self.stats['persistent_hits'] += 1
+                        return value
+                    db.execute("DELETE FROM routes WHERE key = ?", (key,))
+                    db.commit()
+                    self.stats['expirations'] += 1
+
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, value, live=False):
+        # Live-traffic routes stay in memory for ROUTE_CACHE_LIVE_TTL and are never persisted
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now + (min(self.ttl, ROUTE_CACHE_LIVE_TTL) if live else self.ttl))
+            self.stats['sets'] += 1
+            db = self._connection()
+            if db is not None and not live:
+                db.execute(
+                    "INSERT OR REPLACE INTO routes (key, value, expires) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), now + self.persistent_ttl)
+                )
+                db.commit()
+
+    def _remember(self, key, value, expires):
+        self._memory[key] = (value, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            for key in [key for key, (_, expires) in self._memory.items() if expires <= now]:
+                del self._memory[key]
+                self.stats['expirations'] += 1
+            db = self._connection()
+            if db is not None:
+                db.execute("DELETE FROM routes WHERE expires <= ?", (now,))
+                db.commit()
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['persistent_hits'] + self.stats['misses']
+            hit_ratio = (self.stats['hits'] + self.stats['persistent_hits']) / lookups if lookups else 0.0
+            return dict(self.stats, entries=len(self._memory), hit_ratio=hit_ratio)
+
+
+# Shared cache used by the routing pages
+route_cache = RouteCache()
@@ -0,0 +1,119 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from utils.fire_data import FIRE_PARQUET_PATH, load_fire_data
+from utils.spatial_index import GridIndex
+
+# Detections within ROUTE_HAZARD_BUFFER_KM of a route, in the ROUTE_HAZARD_DAYS up to the departure date
+# (or the end of the archive, whichever is earlier), mark the route segment as hazardous
+ROUTE_HAZARD_BUFFER_KM = float(os.environ.get('ROUTE_HAZARD_BUFFER_KM', 5))
+ROUTE_HAZARD_DAYS = int(os.environ.get('ROUTE_HAZARD_DAYS', 7))
+# Route points are resampled this finely before the nearest-point test
+ROUTE_HAZARD_STEP_KM = float(os.environ.get('ROUTE_HAZARD_STEP_KM', 0.25))
+ROUTE_HAZARD_MAX_MARKERS = 500
+KM_PER_DEGREE = 111.32
+
+hazard_index = None
+
+
+class HazardIndex:
+    # Detections bucketed by GridIndex cell; a route only touches the cells its corridor covers
+
+    def __init__(self, lat, lon, dates, frp):
+        self.grid = GridIndex(lat, lon)
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        self.last_day = dates.max()
+        self.days = dates[self.grid.order]
+        self.frp = np.asarray(frp)[self.grid.order]
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df['LATITUDE'].values, df['LONGITUDE'].values, df['ACQ_DATE'].values, df['FRP'].values)
+
+    def window(self, depart_at=None, days=ROUTE_HAZARD_DAYS):
+        end = self.last_day
+        if depart_at:
+            end = min(end, np.datetime64(pd.Timestamp(depart_at).date(), 'D'))
+        return end - np.timedelta64(days - 1, 'D'), end
+
+    def corridor_candidates(self, samples_lat, samples_lon, buffer_km):
+        # Sorted positions of detections in every grid cell within buffer_km of a route sample
+        grid = self.grid
+        cos_lat = max(np.cos(np.deg2rad(np.abs(samples_lat).max())), 0.01)
+        row_radius = int(np.ceil(buffer_km / KM_PER_DEGREE / grid.cell_size))
+        col_radius = int(np.ceil(buffer_km / (KM_PER_DEGREE * cos_lat) / grid.cell_size))
+        rows = ((samples_lat - grid.lat0) // grid.cell_size).astype(np.int64)
+        cols = ((samples_lon - grid.lon0) // grid.cell_size).astype(np.int64)
+        row_steps, col_steps = np.meshgrid(np.arange(-row_radius, row_radius + 1),
+                                           np.arange(-col_radius, col_radius + 1), indexing='ij')
+        rows = (rows[:, None] + row_steps.ravel()).ravel()
+        cols = (cols[:, None] + col_steps.ravel()).ravel()
+        inside = (rows >= 0) & (rows < grid.n_rows) & (cols >= 0) & (cols < grid.n_cols)
+        cells = np.unique(rows[inside] * grid.n_cols + cols[inside])
+        starts, ends = grid.offsets[cells], grid.offsets[cells + 1]
+        nonempty = ends > starts
+        starts, ends = starts[nonempty], ends[nonempty]
+        if not len(starts):
+            return np.zeros(0, dtype=np.int64)
+        # Concatenated ranges starts[i]:ends[i] without a Python loop: unit steps, jumping at each range start
+        steps = np.ones(int((ends - starts).sum()), dtype=np.int64)
+        steps[0] = starts[0]
+        steps[np.cumsum(ends - starts)[:-1]] = starts[1:] - ends[:-1] + 1
+        return np.cumsum(steps)
+
+    def check_route(self, route_coords, depart_at=None, buffer_km=ROUTE_HAZARD_BUFFER_KM, days=ROUTE_HAZARD_DAYS,
+                    step_km=ROUTE_HAZARD_STEP_KM):
+        points = np.asarray(route_coords, dtype=np.float64)
+        start_day, end_day = self.window(depart_at, days)
+        n_segments = max(len(points) - 1, 0)
+        result = {'segments': np.zeros(n_segments, dtype=bool), 'detections': 0, 'max_frp': 0.0,
+                  'lat': np.zeros(0), 'lon': np.zeros(0), 'start': start_day, 'end': end_day}
+        if n_segments == 0:
+            return result
+
+        # Local equirectangular km coordinates, accurate to well under the buffer over a route's extent
+        cos_ref = np.cos(np.deg2rad(points[:, 0].mean()))
+
+        def to_km(lat, lon):
+            return np.column_stack([lon * KM_PER_DEGREE * cos_ref, lat * KM_PER_DEGREE])
+
+        xy = to_km(points[:, 0], points[:, 1])
+        lengths = np.hypot(*(xy[1:] - xy[:-1]).T)
+        pieces = np.maximum(np.ceil(lengths / step_km).astype(np.int64), 1)
+        segment_of = np.repeat(np.arange(n_segments), pieces)
+        fraction = (np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)) / np.repeat(pieces, pieces)
+        samples = points[segment_of] + (points[segment_of + 1] - points[segment_of]) * fraction[:, None]
+        samples = np.vstack([samples, points[-1:]])
+        # Samples on an interior vertex also belong to the segment ending there
+        vertex = (fraction == 0) & (segment_of > 0)
+        previous = np.append(np.where(vertex, segment_of - 1, segment_of), n_segments - 1)
+        segment_of = np.append(segment_of, n_segments - 1)
+
+        candidates = self.corridor_candidates(samples[:, 0], samples[:, 1], buffer_km)
+        candidates = candidates[(self.days[candidates] >= start_day) & (self.days[candidates] <= end_day)]
+        if not len(candidates):
+            return result
+        lat, lon = self.grid.lat[candidates], self.grid.lon[candidates]
+        sample_xy, detection_xy = to_km(samples[:, 0], samples[:, 1]), to_km(lat, lon)
+        near = np.isfinite(cKDTree(sample_xy).query(detection_xy, distance_upper_bound=buffer_km)[0])
+        # A segment is hazardous when any detection lies within the buffer of it, not only its nearest one
+        hazardous = cKDTree(detection_xy[near]).query_ball_point(sample_xy, buffer_km, return_length=True) > 0
+        result['segments'][np.unique(np.concatenate([segment_of[hazardous], previous[hazardous]]))] = True
+        result['detections'] = int(near.sum())
+        result['max_frp'] = float(self.frp[candidates[near]].max()) if near.any() else 0.0
+        result['lat'], result['lon'] = lat[near][:ROUTE_HAZARD_MAX_MARKERS], lon[near][:ROUTE_HAZARD_MAX_MARKERS]
+        return result
+
+
+def load_hazard_index():
+    # None when no fire archive is available; routing then works without the hazard check
+    global hazard_index
+    if hazard_index is None and os.path.exists(FIRE_PARQUET_PATH):
+        start_time = time.time()
+        hazard_index = HazardIndex.from_frame(load_fire_data())
+        print(f"Time taken to build route hazard index: {time.time() - start_time} seconds")
+    return hazard_index
@@ -0,0 +1,73 @@
+import gzip
+
+import plotly.io as pio
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Only compress responses larger than this many bytes
+COMPRESSION_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Dash serializes callback responses with plotly's to_json_plotly; the orjson engine
+# encodes NumPy arrays natively instead of converting every figure array to Python lists
+if orjson is not None:
+    pio.json.config.default_engine = 'orjson'
+
+
+def _accepted_encodings(header):
+    encodings = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+
+def choose_encoding(accept_encoding):
+    accepted = _accepted_encodings(accept_encoding or '')
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def register_compression(server, paths=('/_dash-update-component',)):
+    # Compress callback responses with brotli or gzip, whichever the client accepts
+    from flask import request
+
+    @server.after_request
+    def compress_response(response):
+        if not request.path.endswith(paths) or response.status_code != 200:
+            return response
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+        data = response.get_data()
+        if encoding is None or len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress(data, encoding))
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Base cell size in degrees (~5 km) and how many times the aggregate pyramid doubles it
+GRID_CELL_DEGREES = 0.05
+PYRAMID_LEVELS = 7
+
+
+class GridIndex:
+    # Uniform lat/lon grid over point data stored CSR-style: points sorted by cell, plus cell offsets
+
+    def __init__(self, lat, lon, values=None, cell_size=GRID_CELL_DEGREES):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.cell_size = cell_size
+        self.lat0 = np.floor(lat.min() / cell_size) * cell_size if len(lat) else 0.0
+        self.lon0 = np.floor(lon.min() / cell_size) * cell_size if len(lon) else 0.0
+        self.n_rows = int((lat.max() - self.lat0) // cell_size) + 1 if len(lat) else 1
+        self.n_cols = int((lon.max() - self.lon0) // cell_size) + 1 if len(lon) else 1
+
+        cells = self.cell_of(lat, lon)
+        self.order = np.argsort(cells, kind='stable')
+        self.offsets = np.searchsorted(cells[self.order], np.arange(self.n_rows * self.n_cols + 1))
+        self.lat = lat[self.order]
+        self.lon = lon[self.order]
+
+        counts = np.diff(self.offsets)
+        sums = np.bincount(cells, weights=values, minlength=len(counts)) if values is not None else None
+        self.pyramid = self._build_pyramid(counts, sums)
+
+    def cell_of(self, lat, lon):
+        rows = np.clip(((lat - self.lat0) // self.cell_size).astype(np.int64), 0, self.n_rows - 1)
+        cols = np.clip(((lon - self.lon0) // self.cell_size).astype(np.int64), 0, self.n_cols - 1)
+        return rows * self.n_cols + cols
+
+    def _build_pyramid(self, counts, sums):
+        # Level k merges 2**k x 2**k base cells; only non-empty cells are kept
+        levels = []
+        counts = counts.reshape(self.n_rows, self.n_cols)
+        sums = sums.reshape(self.n_rows, self.n_cols) if sums is not None else None
+        for level in range(PYRAMID_LEVELS):
+            factor = 2 ** level
+            rows, cols = -(-self.n_rows // factor), -(-self.n_cols // factor)
+            padded = np.zeros((rows * factor, cols * factor))
+            padded[:self.n_rows, :self.n_cols] = counts
+            level_counts = padded.reshape(rows, factor, cols, factor).sum(axis=(1, 3))
+            if sums is not None:
+                padded[:self.n_rows, :self.n_cols] = sums
+                level_sums = padded.reshape(rows, factor, cols, factor).sum(axis=(1, 3))
+            r, c = np.nonzero(level_counts)
+            size = self.cell_size * factor
+            levels.append({
+                'cell_size': size,
+                'lat': self.lat0 + (r + 0.5) * size,
+                'lon': self.lon0 + (c + 0.5) * size,
+                'count': level_counts[r, c],
+                'mean': level_sums[r, c] / level_counts[r, c] if sums is not None else None,
+            })
+        return levels
+
+    def _cell_ranges(self, south, west, north, east):
+        # Contiguous slices of the sorted points covering the bounding box, one per grid row
+        if north < self.lat0 or east < self.lon0:
+            return []
+        row0, row1 = (np.clip(int((value - self.lat0) // self.cell_size), 0, self.n_rows - 1) for value in (south, north))
+        col0, col1 = (np.clip(int((value - self.lon0) // self.cell_size), 0, self.n_cols - 1) for value in (west, east))
+        starts = np.arange(row0, row1 + 1) * self.n_cols + col0
+        return list(zip(self.offsets[starts], self.offsets[starts + (col1 - col0) + 1]))
+
+    def estimate_bbox(self, south, west, north, east):
+        # Upper bound on points in the box, from whole-cell counts only
+        return int(sum(end - start for start, end in self._cell_ranges(south, west, north, east)))
+
+    def query_bbox(self, south, west, north, east):
+        # Positions (into the original arrays) of points inside the box
+        ranges = self._cell_ranges(south, west, north, east)
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        sorted_positions = np.concatenate([np.arange(start, end) for start, end in ranges])
+        lat, lon = self.lat[sorted_positions], self.lon[sorted_positions]
+        inside = (lat >= south) & (lat <= north) & (lon >= west) & (lon <= east)
+        return self.order[sorted_positions[inside]]
+
+    def aggregate_bbox(self, south, west, north, east, budget):
+        # Finest pyramid level whose visible non-empty cells fit within the budget
+        for level in self.pyramid:
+            half = level['cell_size'] / 2
+            visible = ((level['lat'] + half >= south) & (level['lat'] - half <= north) &
+                       (level['lon'] + half >= west) & (level['lon'] - half <= east))
+            if visible.sum() <= budget or level is self.pyramid[-1]:
+                mean = level['mean'][visible] if level['mean'] is not None else None
+                return level['cell_size'], level['lat'][visible], level['lon'][visible], level['count'][visible], mean
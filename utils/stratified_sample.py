@@ -0,0 +1,79 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_data import load_fire_data
+
+# Preview sample size and the finest spatial part of the strata (strata are calendar month x cell); cells are
+# doubled until there are at most FIRE_SAMPLE_ROWS_PER_STRATUM sampled rows per stratum on average
+FIRE_SAMPLE_SIZE = int(os.environ.get('FIRE_SAMPLE_SIZE', 50_000))
+FIRE_SAMPLE_CELL_DEGREES = float(os.environ.get('FIRE_SAMPLE_CELL_DEGREES', 1.0))
+FIRE_SAMPLE_ROWS_PER_STRATUM = 5
+FIRE_SAMPLE_SEED = 0
+
+fire_sample = None
+
+
+class StratifiedSample:
+    # Rows drawn without replacement from every (month, cell) stratum in proportion to its size, at least two
+    # per stratum so sparse areas and quiet months still show up and every stratum has a variance estimate;
+    # each row carries weight N_h / n_h
+
+    def __init__(self, df, size=FIRE_SAMPLE_SIZE, cell_size=FIRE_SAMPLE_CELL_DEGREES, seed=FIRE_SAMPLE_SEED):
+        months = df['ACQ_DATE'].values.astype('datetime64[M]').astype(np.int64)
+        while True:
+            rows = np.floor(df['LATITUDE'].values / cell_size).astype(np.int64)
+            cols = np.floor(df['LONGITUDE'].values / cell_size).astype(np.int64)
+            _, strata = np.unique((months * 4096 + rows + 2048) * 4096 + cols + 2048, return_inverse=True)
+            if strata.max(initial=0) < size / FIRE_SAMPLE_ROWS_PER_STRATUM or cell_size >= 360:
+                break
+            cell_size *= 2
+        self.cell_size = cell_size
+        self.population = np.bincount(strata)
+        # Proportional allocation; strata held at the floor take budget from the rest, so the total stays near size
+        rate = min(size / max(len(df), 1), 1.0)
+        for _ in range(3):
+            self.allocation = np.minimum(np.maximum(np.round(self.population * rate), 2),
+                                         self.population).astype(np.int64)
+            floor = self.allocation <= 2
+            rate = min(max(size - floor.sum(), 0) / max(self.population[~floor].sum(), 1), 1.0)
+
+        # Random order within each stratum; the first n_h rows of each are taken
+        priority = np.random.default_rng(seed).random(len(df))
+        order = np.lexsort((priority, strata))
+        starts = np.cumsum(self.population) - self.population
+        rank = np.arange(len(order)) - starts[strata[order]]
+        self.positions = np.sort(order[rank < self.allocation[strata[order]]])
+        self.strata = strata[self.positions]
+        self.weights = (self.population / self.allocation)[self.strata]
+        self.total = len(df)
+        self.frame = df.iloc[self.positions].assign(WEIGHT=self.weights)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def estimate_counts(self, keys):
+        # Estimated row count per key value (keys aligned with the sample rows) and its standard error,
+        # from the stratified variance sum_h N_h^2 (1 - n_h/N_h) s_h^2 / n_h of each key's indicator
+        counts = pd.DataFrame({'key': np.asarray(keys), 'stratum': self.strata}).value_counts().reset_index(name='c')
+        population = self.population[counts['stratum'].values]
+        allocation = self.allocation[counts['stratum'].values]
+        c = counts['c'].values
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(allocation > 1, c * (1 - c / allocation) / (allocation - 1), 0.0)
+            counts['estimate'] = population / allocation * c
+            counts['variance'] = population ** 2 * (1 - allocation / population) * variance / allocation
+        result = counts.groupby('key')[['estimate', 'variance']].sum()
+        result['std_error'] = np.sqrt(result.pop('variance'))
+        return result
+
+
+def load_fire_sample():
+    global fire_sample
+    if fire_sample is None:
+        start_time = time.time()
+        fire_sample = StratifiedSample(load_fire_data())
+        print(f"Time taken to draw stratified sample: {time.time() - start_time} seconds")
+    return fire_sample
@@ -0,0 +1,178 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.fire_data import load_fire_data, source_signature
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Spatial bin of the summed-area table; boxes are snapped outward to these bins. The grid covers the bounding box
+# of the detections, so the tables take (days + 1) x (lat bins + 1) x (lon bins + 1) x 20 bytes (int32 counts,
+# float64 brightness and FRP sums): ~75 MB for ten years over CONUS at 1°, ~40 times that for a global archive
+SUMMED_AREA_CELL_DEGREES = float(os.environ.get('SUMMED_AREA_CELL_DEGREES', 1.0))
+SUMMED_AREA_COLUMNS = ['BRIGHTNESS', 'FRP']
+# Tables are built once, written here and memory-mapped read-only, so every worker shares one copy
+SUMMED_AREA_DIR = os.environ.get('SUMMED_AREA_DIR', 'data/summed_area')
+
+summed_area_table = None
+_summed_area_lock = threading.Lock()
+
+
+class SummedAreaTable:
+    # Inclusive prefix sums over (day, lat bin, lon bin) with a zero plane in front of each axis, so the total
+    # for any day range and bin rectangle is eight lookups (inclusion-exclusion over the corners)
+
+    def __init__(self, tables, cell_size, first_day, lat0, lon0):
+        self.tables = tables
+        self.cell_size = cell_size
+        self.first_day = np.datetime64(first_day, 'D')
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.n_days, self.n_rows, self.n_cols = (size - 1 for size in tables['count'].shape)
+
+    @classmethod
+    def build(cls, lat, lon, dates, values, cell_size=SUMMED_AREA_CELL_DEGREES):
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        first_day = dates.min()
+        n_days = int((dates.max() - first_day).astype(np.int64)) + 1
+        lat0 = np.floor(lat.min() / cell_size) * cell_size
+        lon0 = np.floor(lon.min() / cell_size) * cell_size
+        n_rows = int((lat.max() - lat0) // cell_size) + 1
+        n_cols = int((lon.max() - lon0) // cell_size) + 1
+
+        days = (dates - first_day).astype(np.int64)
+        rows = ((lat - lat0) // cell_size).astype(np.int64)
+        cols = ((lon - lon0) // cell_size).astype(np.int64)
+        flat = (days * n_rows + rows) * n_cols + cols
+        shape = (n_days, n_rows, n_cols)
+        # Prefix counts never exceed the number of detections
+        count_dtype = np.int32 if len(flat) < 2 ** 31 else np.int64
+        tables = {'count': cls._prefix(np.bincount(flat, minlength=np.prod(shape)).reshape(shape), count_dtype)}
+        for name, column in values.items():
+            # Float sums stay float64: box totals are differences of large prefix sums, where float32 loses the digits
+            tables[name] = cls._prefix(np.bincount(flat, weights=column, minlength=np.prod(shape)).reshape(shape),
+                                       np.float64)
+        return cls(tables, cell_size, first_day, lat0, lon0)
+
+    @staticmethod
+    def _prefix(totals, dtype):
+        prefix = np.zeros(tuple(size + 1 for size in totals.shape), dtype=dtype)
+        prefix[1:, 1:, 1:] = totals
+        for axis in range(3):
+            np.cumsum(prefix, axis=axis, out=prefix)
+        return prefix
+
+    @classmethod
+    def from_frame(cls, df, columns=SUMMED_AREA_COLUMNS, **kwargs):
+        return cls.build(df['LATITUDE'].values, df['LONGITUDE'].values, df['ACQ_DATE'].values,
+                         {column.lower(): df[column].values for column in columns}, **kwargs)
+
+    def save(self, directory, source=None):
+        # One .npy per table plus metadata, each written to a temporary file and renamed into place
+        os.makedirs(directory, exist_ok=True)
+        suffix = f'.{os.getpid()}.tmp'
+        for name, table in self.tables.items():
+            np.save(os.path.join(directory, name + suffix + '.npy'), table)
+            os.replace(os.path.join(directory, name + suffix + '.npy'), os.path.join(directory, name + '.npy'))
+        metadata = {'cell_size': self.cell_size, 'first_day': str(self.first_day), 'lat0': self.lat0,
+                    'lon0': self.lon0, 'tables': list(self.tables), 'source': source}
+        with open(os.path.join(directory, 'metadata.json' + suffix), 'w') as f:
+            json.dump(metadata, f)
+        os.replace(os.path.join(directory, 'metadata.json' + suffix), os.path.join(directory, 'metadata.json'))
+
+    @classmethod
+    def load(cls, directory):
+        # Tables memory-mapped read-only; pages are shared by every process mapping the same files
+        with open(os.path.join(directory, 'metadata.json')) as f:
+            metadata = json.load(f)
+        tables = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode='r') for name in metadata['tables']}
+        return cls(tables, metadata['cell_size'], metadata['first_day'], metadata['lat0'], metadata['lon0']), metadata
+
+    @property
+    def nbytes(self):
+        return sum(table.nbytes for table in self.tables.values())
+
+    def day_of(self, date):
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.first_day).astype(np.int64))
+
+    def date_of(self, day):
+        return self.first_day + np.timedelta64(int(day), 'D')
+
+    def _day_bounds(self, start_day, end_day):
+        # Prefix-table planes for days start_day..end_day inclusive
+        start = 0 if start_day is None else min(max(start_day, 0), self.n_days)
+        end = self.n_days if end_day is None else min(max(end_day + 1, 0), self.n_days)
+        return start, max(start, end)
+
+    def _box_bounds(self, bbox):
+        # Bin edges covering (south, west, north, east), snapped outward
+        if bbox is None:
+            return 0, self.n_rows, 0, self.n_cols
+        south, west, north, east = bbox
+        row0 = int(np.clip((south - self.lat0) // self.cell_size, 0, self.n_rows))
+        row1 = int(np.clip((north - self.lat0) // self.cell_size + 1, row0, self.n_rows))
+        col0 = int(np.clip((west - self.lon0) // self.cell_size, 0, self.n_cols))
+        col1 = int(np.clip((east - self.lon0) // self.cell_size + 1, col0, self.n_cols))
+        return row0, row1, col0, col1
+
+    def snapped_bbox(self, bbox):
+        row0, row1, col0, col1 = self._box_bounds(bbox)
+        return (self.lat0 + row0 * self.cell_size, self.lon0 + col0 * self.cell_size,
+                self.lat0 + row1 * self.cell_size, self.lon0 + col1 * self.cell_size)
+
+    def query(self, start_day=None, end_day=None, bbox=None):
+        # Totals for the day range and box: {'count': ..., 'brightness': ..., 'frp': ...}
+        t0, t1 = self._day_bounds(start_day, end_day)
+        r0, r1, c0, c1 = self._box_bounds(bbox)
+        return {name: (table[t1, r1, c1] - table[t0, r1, c1] - table[t1, r0, c1] - table[t1, r1, c0] +
+                       table[t0, r0, c1] + table[t0, r1, c0] + table[t1, r0, c0] - table[t0, r0, c0]).item()
+                for name, table in self.tables.items()}
+
+    def daily(self, name, start_day=None, end_day=None, bbox=None):
+        # Per-day totals inside the box, from the box sums of consecutive day planes
+        t0, t1 = self._day_bounds(start_day, end_day)
+        r0, r1, c0, c1 = self._box_bounds(bbox)
+        table = self.tables[name]
+        boxes = table[t0:t1 + 1, r1, c1] - table[t0:t1 + 1, r0, c1] - table[t0:t1 + 1, r1, c0] + table[t0:t1 + 1, r0, c0]
+        return np.diff(boxes)
+
+    def grid(self, name, start_day=None, end_day=None):
+        # Per-bin totals for the day range: the difference of two day planes, then of neighbouring bins
+        t0, t1 = self._day_bounds(start_day, end_day)
+        table = self.tables[name]
+        plane = table[t1] - table[t0]
+        return np.diff(np.diff(plane, axis=0), axis=1)
+
+
+def load_summed_area_table(directory=SUMMED_AREA_DIR):
+    # Tables mapped from directory, built (by one process at a time, under a file lock) when missing or built
+    # from a different archive or cell size
+    global summed_area_table
+    with _summed_area_lock:
+        if summed_area_table is None:
+            start_time = time.time()
+            df = load_fire_data()
+            source = dict(source_signature(df), cell_size=SUMMED_AREA_CELL_DEGREES)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, '.lock'), 'w') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                table = None
+                if os.path.exists(os.path.join(directory, 'metadata.json')):
+                    table, metadata = SummedAreaTable.load(directory)
+                    if metadata.get('source') != source:
+                        table = None
+                if table is None:
+                    SummedAreaTable.from_frame(df).save(directory, source)
+                    table, _ = SummedAreaTable.load(directory)
+            summed_area_table = table
+            print(f"Time taken to load summed-area table ({summed_area_table.nbytes / 1e6:.0f} MB, memory-mapped): "
+                  f"{time.time() - start_time} seconds")
+        return summed_area_table